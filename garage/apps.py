@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GarageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'garage'
+
+    def ready(self):
+        from garage import jobs, signals  # noqa: F401
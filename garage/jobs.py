@@ -0,0 +1,57 @@
+from datetime import date
+
+from garage.services.exports import ExportSpec, stream_csv, stream_xlsx
+from garage.services.jobs import job_handler, media_path
+from garage.services.payroll import STATEMENT_HEADER, payroll_statement, statement_filename
+from garage.services.receipt_export import export_bills, export_progress, stream_merged_pdf, stream_zip
+from garage.services.spreadsheet_import import import_companies, import_models, import_vehicle_types
+
+IMPORTERS = {
+    'companies': import_companies,
+    'vehicle_types': import_vehicle_types,
+    'models': import_models,
+}
+
+
+@job_handler('import_vehicle_masters')
+def import_vehicle_masters(context):
+    """params: target (companies, vehicle_types or models), upload."""
+    importer = IMPORTERS[context.params['target']]
+    with open(media_path(context.params['upload']), 'rb') as fh:
+        return importer(context.job.client_garage, fh)
+
+
+@job_handler('export_bill_pdfs')
+def export_bill_pdfs(context):
+    """params: from, to (YYYY-MM-DD), format (zip or pdf)."""
+    client_garage = context.job.client_garage
+    start_date = date.fromisoformat(context.params['from'])
+    end_date = date.fromisoformat(context.params['to'])
+    export_format = context.params.get('format', 'zip')
+    export_id = f"job-{context.job.pk}"
+    stream = stream_zip if export_format == 'zip' else stream_merged_pdf
+
+    with open(context.result_path(f"bills_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{export_format}"), 'wb') as fh:
+        for chunk in stream(client_garage, export_bills(client_garage, start_date, end_date), export_id):
+            fh.write(chunk)
+            progress = export_progress(client_garage.pk, export_id)
+            if progress and progress['total']:
+                context.progress(progress['done'] * 100 // progress['total'])
+    progress = export_progress(client_garage.pk, export_id) or {}
+    return {'bills': progress.get('done', 0)}
+
+
+@job_handler('payroll_statement')
+def payroll_statement_file(context):
+    """params: user_ids, start_date, end_date (YYYY-MM-DD), format (csv or xlsx)."""
+    start_date = date.fromisoformat(context.params['start_date'])
+    end_date = date.fromisoformat(context.params['end_date'])
+    export_format = context.params.get('format', 'csv')
+    rows = payroll_statement(context.job.client_garage, context.params['user_ids'], start_date, end_date)
+    spec = ExportSpec(STATEMENT_HEADER, [[row[column] for column in STATEMENT_HEADER] for row in rows])
+    chunks = stream_csv(spec) if export_format == 'csv' else stream_xlsx(spec)
+    context.save_file(
+        f"{statement_filename(start_date, end_date)}.{export_format}",
+        (chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks)
+    )
+    return {'staff': len(rows)}
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from garage.models import ClientGarage
+from garage.services.sales_rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollup from the bills.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--garage', type=int, help='Only rebuild this ClientGarage id')
+
+    def handle(self, *args, **options):
+        client_garage = None
+        if options['garage']:
+            try:
+                client_garage = ClientGarage.objects.get(pk=options['garage'])
+            except ClientGarage.DoesNotExist:
+                raise CommandError(f"ClientGarage {options['garage']} does not exist")
+        rows = rebuild(client_garage)
+        scope = client_garage.name if client_garage else 'all garages'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily sales rows for {scope}'))
@@ -0,0 +1,51 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+
+from garage.services.jobs import claim, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a thread or process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Jobs to run at the same time (default 2)')
+        parser.add_argument('--processes', action='store_true', help='Use a process pool instead of threads')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no queued job is due')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if options['processes']:
+            # Spawned children open their own database connections. Forked
+            # ones would inherit the socket claim() keeps open in the parent.
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers)
+
+        self.stdout.write(f"Job worker {worker_id} started with {workers} {'processes' if options['processes'] else 'threads'}")
+        running = {}
+        try:
+            with pool:
+                while True:
+                    claimed = claim(worker_id, workers - len(running)) if len(running) < workers else []
+                    for job_id in claimed:
+                        running[pool.submit(run_job, job_id)] = job_id
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    done, _ = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        if future.exception():
+                            self.stderr.write(f"Job {job_id} crashed: {future.exception()}")
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping job worker')
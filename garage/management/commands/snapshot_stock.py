@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from garage.models import ClientGarage
+from garage.services.stock import take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Record each part's closing stock for a day, so stock-as-of queries start from it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to snapshot, YYYY-MM-DD (default yesterday)')
+        parser.add_argument('--garage', type=int, help='Only snapshot this ClientGarage id')
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else timezone.localdate() - timedelta(days=1)
+        except ValueError:
+            raise CommandError('--date must be YYYY-MM-DD')
+        client_garage = None
+        if options['garage']:
+            try:
+                client_garage = ClientGarage.objects.get(pk=options['garage'])
+            except ClientGarage.DoesNotExist:
+                raise CommandError(f"ClientGarage {options['garage']} does not exist")
+        try:
+            rows = take_snapshots(day, client_garage)
+        except ValueError as e:
+            raise CommandError(str(e))
+        scope = client_garage.name if client_garage else 'all garages'
+        self.stdout.write(self.style.SUCCESS(f'Recorded {rows} stock snapshots for {day} ({scope})'))
@@ -0,0 +1,15 @@
+from garage.services.tenant_context import attach_tenant_context
+
+
+class TenantContextMiddleware:
+    """
+    Resolve the user's garage, fiscal year and tax setting once per request
+    from the per-process tenant cache. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        attach_tenant_context(request)
+        return self.get_response(request)
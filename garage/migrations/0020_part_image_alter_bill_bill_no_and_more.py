@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0019_user_average_rating_user_base_salary_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='part',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to='part_images/'),
+        ),
+        migrations.AlterField(
+            model_name='bill',
+            name='bill_no',
+            field=models.CharField(max_length=30, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='purchaseorder',
+            name='purchase_no',
+            field=models.CharField(max_length=30, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='serviceorder',
+            name='order_no',
+            field=models.CharField(max_length=30, unique=True),
+        ),
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('bill', 'Bill'), ('service_order', 'Service Order'), ('purchase_order', 'Purchase Order')], max_length=20)),
+                ('next_value', models.PositiveBigIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client_fiscal_year', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='garage.clientfiscalyear')),
+                ('client_garage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_sequences', to='garage.clientgarage')),
+            ],
+            options={
+                'unique_together': {('client_garage', 'client_fiscal_year', 'doc_type')},
+            },
+        ),
+    ]
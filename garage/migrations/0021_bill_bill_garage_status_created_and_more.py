@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0020_part_image_alter_bill_bill_no_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['client_garage', 'status', 'created_at'], name='bill_garage_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['client_garage', 'created_at'], name='bill_garage_created'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['client_garage', 'phone'], name='customer_garage_phone'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['client_garage', 'name'], name='customer_garage_name'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['client_garage', 'client_fiscal_year', 'name'], name='part_garage_fy_name'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['client_garage', 'updated_at'], name='part_garage_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['client_garage', 'status', 'date'], name='po_garage_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceorder',
+            index=models.Index(fields=['client_garage', 'status', 'created_date'], name='so_garage_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceorder',
+            index=models.Index(fields=['client_garage', 'created_date'], name='so_garage_date'),
+        ),
+        migrations.AddIndex(
+            model_name='servicetype',
+            index=models.Index(fields=['client_garage', 'name'], name='svc_garage_name'),
+        ),
+        migrations.AddIndex(
+            model_name='servicetype',
+            index=models.Index(fields=['client_garage', 'updated_at'], name='svc_garage_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='staffattendance',
+            index=models.Index(fields=['client_garage', 'date'], name='attendance_garage_date'),
+        ),
+        migrations.AddIndex(
+            model_name='staffpayroll',
+            index=models.Index(fields=['client_garage', 'payment_date'], name='payroll_garage_date'),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=models.Index(fields=['client_garage', 'client_fiscal_year', 'name'], name='supplier_garage_fy_name'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:06
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Frozen copies of the sales_rollup rules as of this migration, so later
+# changes to that module do not change what the backfill does.
+COUNTED_STATUSES = ('Completed', 'Credit')
+AMOUNTS = ('gross', 'discount', 'tax', 'credit', 'total')
+CENT = Decimal('0.01')
+
+
+def contribution(bill):
+    total = Decimal(str(bill['total'] or 0))
+    tax = Decimal(str(bill['tax'] or 0))
+    value = Decimal(str(bill['discount_value'] or 0))
+    if bill['discount_type'] == 'percentage':
+        gross = (total - tax) * 100 / (100 - value) if value < 100 else total - tax
+        discount = gross * value / 100
+    else:
+        gross = total - tax + value
+        discount = value
+    return {
+        'gross': gross.quantize(CENT),
+        'discount': discount.quantize(CENT),
+        'tax': tax.quantize(CENT),
+        'credit': Decimal(str(bill['credit_amount'] or 0)).quantize(CENT),
+        'total': total.quantize(CENT),
+    }
+
+
+def backfill_rollup(apps, schema_editor):
+    Bill = apps.get_model('garage', 'Bill')
+    DailySalesRollup = apps.get_model('garage', 'DailySalesRollup')
+    totals = defaultdict(lambda: dict({name: Decimal('0.00') for name in AMOUNTS}, bill_count=0))
+    bills = Bill.objects.filter(status__in=COUNTED_STATUSES, created_at__isnull=False).values(
+        'client_garage_id', 'total', 'tax', 'discount_type', 'discount_value', 'credit_amount', 'payment_mode', 'created_at'
+    )
+    for bill in bills.iterator(chunk_size=2000):
+        amounts = contribution(bill)
+        row = totals[(bill['client_garage_id'], timezone.localdate(bill['created_at']), bill['payment_mode'] or 'cash')]
+        row['bill_count'] += 1
+        for name in AMOUNTS:
+            row[name] += amounts[name]
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(client_garage_id=garage_id, date=day, payment_mode=payment_mode, **values)
+        for (garage_id, day, payment_mode), values in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0021_bill_bill_garage_status_created_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_mode', models.CharField(max_length=20)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('gross', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('discount', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('credit', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client_garage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='garage.clientgarage')),
+            ],
+            options={
+                'unique_together': {('client_garage', 'date', 'payment_mode')},
+            },
+        ),
+        migrations.RunPython(backfill_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    Part = apps.get_model('garage', 'Part')
+    StockMovement = apps.get_model('garage', 'StockMovement')
+    batch = []
+    for part_id, garage_id, in_stock in Part.objects.filter(in_stock__gt=0).values_list('id', 'client_garage_id', 'in_stock').iterator(chunk_size=2000):
+        batch.append(StockMovement(
+            client_garage_id=garage_id, part_id=part_id, movement_type='adjusted',
+            quantity=in_stock, balance_after=in_stock, reference='Opening balance'
+        ))
+        if len(batch) >= 1000:
+            StockMovement.objects.bulk_create(batch)
+            batch = []
+    StockMovement.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0023_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_type', models.CharField(choices=[('added', 'Added'), ('sold', 'Sold'), ('used', 'Used'), ('returned', 'Returned'), ('adjusted', 'Adjusted')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('balance_after', models.IntegerField()),
+                ('reference', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('client_garage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='garage.clientgarage')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='garage.part')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['part', 'created_at'], name='movement_part_created'), models.Index(fields=['client_garage', 'created_at'], name='movement_garage_created')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('closes_at', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('client_garage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='garage.clientgarage')),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='garage.part')),
+            ],
+            options={
+                'unique_together': {('part', 'date')},
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def raise_alerts(apps, schema_editor):
+    Part = apps.get_model('garage', 'Part')
+    LowStockAlert = apps.get_model('garage', 'LowStockAlert')
+    batch = []
+    for part_id, garage_id, in_stock, min_stock in Part.objects.filter(in_stock__lte=F('min_stock')).values_list(
+        'id', 'client_garage_id', 'in_stock', 'min_stock'
+    ).iterator(chunk_size=2000):
+        batch.append(LowStockAlert(
+            client_garage_id=garage_id, part_id=part_id, in_stock=in_stock, min_stock=min_stock,
+            status='out-of-stock' if in_stock == 0 else 'low-stock'
+        ))
+        if len(batch) >= 1000:
+            LowStockAlert.objects.bulk_create(batch)
+            batch = []
+    LowStockAlert.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0024_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('in_stock', models.PositiveIntegerField()),
+                ('min_stock', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('low-stock', 'Low Stock'), ('out-of-stock', 'Out of Stock')], max_length=20)),
+                ('raised_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client_garage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='garage.clientgarage')),
+                ('part', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alert', to='garage.part')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client_garage', 'raised_at'], name='alert_garage_raised')],
+            },
+        ),
+        migrations.RunPython(raise_alerts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:23
+
+import datetime
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    PurchaseOrder = apps.get_model('garage', 'PurchaseOrder')
+    Supplier = apps.get_model('garage', 'Supplier')
+    SupplierPayment = apps.get_model('garage', 'SupplierPayment')
+    SupplierLedgerEntry = apps.get_model('garage', 'SupplierLedgerEntry')
+
+    PurchaseOrder.objects.exclude(payment_mode='credit').update(amount_paid=F('total'))
+    linked = dict(
+        SupplierPayment.objects.filter(purchase_order__isnull=False).order_by()
+        .values('purchase_order').annotate(total=Sum('amount')).values_list('purchase_order', 'total')
+    )
+    unlinked = dict(
+        SupplierPayment.objects.filter(purchase_order__isnull=True).order_by()
+        .values('supplier').annotate(total=Sum('amount')).values_list('supplier', 'total')
+    )
+    # Payments made against an order settle it; the rest settle the oldest orders first.
+    for order in PurchaseOrder.objects.filter(payment_mode='credit').order_by('supplier_id', 'date', 'id').iterator(chunk_size=2000):
+        paid = min(linked.get(order.pk) or Decimal('0'), order.total)
+        spare = unlinked.get(order.supplier_id) or Decimal('0')
+        extra = min(order.total - paid, spare)
+        if extra > 0:
+            unlinked[order.supplier_id] = spare - extra
+            paid += extra
+        if paid:
+            PurchaseOrder.objects.filter(pk=order.pk).update(amount_paid=paid)
+
+    SupplierLedgerEntry.objects.bulk_create([
+        SupplierLedgerEntry(
+            client_garage_id=garage_id, supplier_id=supplier_id, entry_type='opening',
+            amount=current_credit, balance_after=current_credit
+        )
+        for supplier_id, garage_id, current_credit in Supplier.objects.exclude(current_credit=0).values_list(
+            'id', 'client_garage_id', 'current_credit'
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0025_low_stock_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('opening', 'Opening Balance'), ('purchase', 'Credit Purchase'), ('payment', 'Payment')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date', models.DateField(default=datetime.date.today)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['supplier', 'date'], name='po_supplier_date'),
+        ),
+        migrations.AddField(
+            model_name='supplierledgerentry',
+            name='client_garage',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_ledger_entries', to='garage.clientgarage'),
+        ),
+        migrations.AddField(
+            model_name='supplierledgerentry',
+            name='payment',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entry', to='garage.supplierpayment'),
+        ),
+        migrations.AddField(
+            model_name='supplierledgerentry',
+            name='purchase_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='garage.purchaseorder'),
+        ),
+        migrations.AddField(
+            model_name='supplierledgerentry',
+            name='supplier',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='garage.supplier'),
+        ),
+        migrations.AddIndex(
+            model_name='supplierledgerentry',
+            index=models.Index(fields=['supplier', 'created_at'], name='ledger_supplier_created'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+import json
+
+from django.db import migrations
+
+
+def decode_items(apps, schema_editor):
+    """Intake bills stored json.dumps(items) in the JSONField; store the list itself."""
+    Bill = apps.get_model('garage', 'Bill')
+    for pk, items in Bill.objects.values_list('pk', 'items').iterator(chunk_size=2000):
+        if not isinstance(items, str):
+            continue
+        try:
+            decoded = json.loads(items)
+        except ValueError:
+            continue
+        Bill.objects.filter(pk=pk).update(items=decoded)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0026_supplier_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(decode_items, migrations.RunPython.noop),
+    ]
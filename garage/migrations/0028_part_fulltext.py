@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def add_fulltext(apps, schema_editor):
+    """FULLTEXT(name, code) for part_search.FulltextBackend; MySQL/MariaDB only."""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE `garage_part` ADD FULLTEXT INDEX `part_name_code_ft` (`name`, `code`)')
+
+
+def drop_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE `garage_part` DROP INDEX `part_name_code_ft`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('garage', '0027_decode_bill_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext, drop_fulltext),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.utils import timezone
 from datetime import date
 
 from django.forms import ValidationError
@@ -225,6 +226,12 @@ class ServiceType(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'name'], name='svc_garage_name'),
+            models.Index(fields=['client_garage', 'updated_at'], name='svc_garage_updated'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.client_garage.name}"
 
@@ -288,6 +295,12 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'phone'], name='customer_garage_phone'),
+            models.Index(fields=['client_garage', 'name'], name='customer_garage_name'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.client_garage.name}"
 
@@ -316,7 +329,7 @@ class ServiceOrder(models.Model):
         ('normal', 'Normal'),
     )
     client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='service_orders')
-    order_no = models.CharField(max_length=10, unique=True)
+    order_no = models.CharField(max_length=30, unique=True)
     vehicle = models.ForeignKey('Vehicle', on_delete=models.CASCADE)
     customer = models.ForeignKey('Customer', on_delete=models.SET_NULL, null=True, blank=True)
     complaint = models.TextField()
@@ -334,6 +347,12 @@ class ServiceOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'status', 'created_date'], name='so_garage_status_date'),
+            models.Index(fields=['client_garage', 'created_date'], name='so_garage_date'),
+        ]
+
     def __str__(self):
         return f"{self.order_no} - {self.client_garage.name}"
     
@@ -348,7 +367,7 @@ class Bill(models.Model):
         ('Credit', 'Credit'),
     )
     client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='bills')
-    bill_no = models.CharField(max_length=10, unique=True)
+    bill_no = models.CharField(max_length=30, unique=True)
     service_order = models.ForeignKey('ServiceOrder', on_delete=models.CASCADE, null=True, blank=True)
     discount_type = models.CharField(max_length=20, default='percentage')
     discount_value = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
@@ -363,6 +382,12 @@ class Bill(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'status', 'created_at'], name='bill_garage_status_created'),
+            models.Index(fields=['client_garage', 'created_at'], name='bill_garage_created'),
+        ]
+
     def __str__(self):
         return f"{self.bill_no} - {self.client_garage.name}"
 
@@ -395,6 +420,12 @@ class Part(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'client_fiscal_year', 'name'], name='part_garage_fy_name'),
+            models.Index(fields=['client_garage', 'updated_at'], name='part_garage_updated'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.client_garage.name}"
 
@@ -429,6 +460,11 @@ class Supplier(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'client_fiscal_year', 'name'], name='supplier_garage_fy_name'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.client_garage.name}"
 
@@ -441,7 +477,7 @@ class PurchaseOrder(models.Model):
     client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='purchase_orders')
     client_fiscal_year = models.ForeignKey('ClientFiscalYear', on_delete=models.SET_NULL, null=True, blank=True)
     supplier = models.ForeignKey('Supplier', on_delete=models.CASCADE, related_name='purchase_orders')
-    purchase_no = models.CharField(max_length=20, unique=True)
+    purchase_no = models.CharField(max_length=30, unique=True)
     date = models.DateField(default=date.today)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
     tax = models.DecimalField(max_digits=10, decimal_places=2)
@@ -453,9 +489,16 @@ class PurchaseOrder(models.Model):
     ])
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     due_date = models.DateField(null=True, blank=True)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # maintained by garage.services.supplier_ledger
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'status', 'date'], name='po_garage_status_date'),
+            models.Index(fields=['supplier', 'date'], name='po_supplier_date'),
+        ]
+
     def __str__(self):
         return f"{self.purchase_no} - {self.client_garage.name}"
 
@@ -544,6 +587,11 @@ class StaffPayroll(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'payment_date'], name='payroll_garage_date'),
+        ]
+
     def __str__(self):
         return f"Payroll {self.id} - {self.user.username}"
 
@@ -564,6 +612,163 @@ class StaffAttendance(models.Model):
 
     class Meta:
         unique_together = ('user', 'date')
+        indexes = [
+            models.Index(fields=['client_garage', 'date'], name='attendance_garage_date'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.date}"
+
+class DocumentSequence(models.Model):
+    DOC_TYPES = (
+        ('bill', 'Bill'),
+        ('service_order', 'Service Order'),
+        ('purchase_order', 'Purchase Order'),
+    )
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='document_sequences')
+    client_fiscal_year = models.ForeignKey('ClientFiscalYear', on_delete=models.CASCADE, null=True, blank=True)
+    doc_type = models.CharField(max_length=20, choices=DOC_TYPES)
+    next_value = models.PositiveBigIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('client_garage', 'client_fiscal_year', 'doc_type')
+
+    def __str__(self):
+        return f"{self.doc_type} #{self.next_value} - {self.client_garage.name}"
+
+class DailySalesRollup(models.Model):
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='daily_sales')
+    date = models.DateField()
+    payment_mode = models.CharField(max_length=20)
+    bill_count = models.IntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    credit = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('client_garage', 'date', 'payment_mode')
+
+    def __str__(self):
+        return f"{self.date} {self.payment_mode} - {self.client_garage.name}"
+
+class BackgroundJob(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='background_jobs', null=True, blank=True)
+    created_by = models.ForeignKey('User', on_delete=models.SET_NULL, related_name='background_jobs', null=True, blank=True)
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.CharField(max_length=255, blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after'),
+            models.Index(fields=['client_garage', 'created_at'], name='job_garage_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+class StockMovement(models.Model):
+    MOVEMENT_TYPES = (
+        ('added', 'Added'),
+        ('sold', 'Sold'),
+        ('used', 'Used'),
+        ('returned', 'Returned'),
+        ('adjusted', 'Adjusted'),
+    )
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='stock_movements')
+    part = models.ForeignKey('Part', on_delete=models.CASCADE, related_name='movements')
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
+    quantity = models.IntegerField()  # signed change in stock
+    balance_after = models.IntegerField()
+    reference = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['part', 'created_at'], name='movement_part_created'),
+            models.Index(fields=['client_garage', 'created_at'], name='movement_garage_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.movement_type} {self.quantity:+d} {self.part_id}"
+
+class StockSnapshot(models.Model):
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='stock_snapshots')
+    part = models.ForeignKey('Part', on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    closes_at = models.DateTimeField()  # start of the next local day; movements before it are included
+    quantity = models.IntegerField()
+
+    class Meta:
+        unique_together = ('part', 'date')
+
+    def __str__(self):
+        return f"{self.part_id} @ {self.date}: {self.quantity}"
+
+class LowStockAlert(models.Model):
+    """A part at or below its min_stock; kept in step with stock changes by garage.services.stock_alerts."""
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='stock_alerts')
+    part = models.OneToOneField('Part', on_delete=models.CASCADE, related_name='low_stock_alert')
+    in_stock = models.PositiveIntegerField()
+    min_stock = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=[
+        ('low-stock', 'Low Stock'),
+        ('out-of-stock', 'Out of Stock')
+    ])
+    raised_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_garage', 'raised_at'], name='alert_garage_raised'),
+        ]
+
+    def __str__(self):
+        return f"{self.part_id}: {self.in_stock}/{self.min_stock}"
+
+class SupplierLedgerEntry(models.Model):
+    ENTRY_TYPES = (
+        ('opening', 'Opening Balance'),
+        ('purchase', 'Credit Purchase'),
+        ('payment', 'Payment'),
+    )
+    client_garage = models.ForeignKey('ClientGarage', on_delete=models.CASCADE, related_name='supplier_ledger_entries')
+    supplier = models.ForeignKey('Supplier', on_delete=models.CASCADE, related_name='ledger_entries')
+    purchase_order = models.ForeignKey('PurchaseOrder', on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    payment = models.OneToOneField('SupplierPayment', on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entry')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)  # signed: purchases add to what is owed, payments subtract
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    date = models.DateField(default=date.today)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['supplier', 'created_at'], name='ledger_supplier_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} ({self.supplier_id})"
@@ -0,0 +1,122 @@
+"""
+Bill listing queries and serializers shared by get_bills and get_bill.
+
+``bill_queryset`` joins the customer, vehicle and service order and
+prefetches bill lines plus the order's service charges, so a page of bills
+costs the same handful of queries whatever its size.
+"""
+import uuid
+
+from django.db.models import Prefetch, Q
+
+from garage.models import Bill, BillItem, ServiceOrderItem
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+
+# Keyset order for cursor pagination: newest first, id breaks ties.
+BILL_KEYS = [('created_at', True), ('id', True)]
+
+
+def bill_queryset(client_garage):
+    return with_listing_relations(Bill.objects.filter(client_garage=client_garage))
+
+
+def with_listing_relations(bills):
+    return bills.select_related(
+        'customer', 'vehicle', 'service_order'
+    ).prefetch_related(
+        Prefetch('bill_items', queryset=BillItem.objects.order_by('id')),
+        Prefetch('service_order__service_items', queryset=ServiceOrderItem.objects.select_related('service_type').order_by('id')),
+    )
+
+
+def filter_bills(bills, status_filter='all', search_query=''):
+    if status_filter != 'all':
+        statuses = status_filter.split(',')
+        normalized_statuses = [s if s != 'in-progress' else 'Generated (In Progress)' for s in statuses]
+        bills = bills.filter(Q(status__in=normalized_statuses))
+
+    if search_query:
+        bills = bills.filter(
+            Q(bill_no__icontains=search_query) |
+            Q(customer__name__icontains=search_query) |
+            Q(vehicle__vehicle_number__icontains=search_query) |
+            Q(service_order__order_no__icontains=search_query)
+        )
+    return bills
+
+
+def bill_lines(bill, icons=False):
+    """Bill lines plus the service order's charges not already on the bill."""
+    lines = []
+    for bi in bill.bill_items.all():
+        line = {
+            'id': f"service-{bi.service_type_id}" if bi.service_type_id else bi.item_id if bi.item_id else f"temp-{uuid.uuid4().hex[:8]}",
+            'name': bi.name,
+            'price': float(bi.price),
+            'quantity': bi.quantity,
+            'isService': bi.service_type_id is not None
+        }
+        if icons:
+            line['image'] = 'fa-tools' if bi.service_type_id else 'fa-cogs'
+        lines.append(line)
+
+    if bill.service_order:
+        present = {line['id'] for line in lines}
+        for service_item in bill.service_order.service_items.all():
+            key = f"service-{service_item.service_type_id}"
+            if key in present:
+                continue
+            present.add(key)
+            line = {
+                'id': key,
+                'name': service_item.service_type.name,
+                'price': float(service_item.price),
+                'quantity': 1,
+                'isService': True
+            }
+            if icons:
+                line['image'] = 'fa-tools'
+            lines.append(line)
+    return lines
+
+
+def bill_summary(bill):
+    """Row shape used by the bill list."""
+    return {
+        'id': bill.id,
+        'bill_no': bill.bill_no,
+        'customer_id': bill.customer_id,
+        'customer_name': bill.customer.name if bill.customer else 'Anonymous',
+        'customer_phone': bill.customer.phone if bill.customer else '',
+        'vehicle_id': bill.vehicle_id,
+        'vehicle_number': bill.vehicle.vehicle_number if bill.vehicle else 'N/A',
+        'order_no': bill.service_order.order_no if bill.service_order else None,
+        'total': float(bill.total),
+        'status': 'in-progress' if bill.status == 'Generated (In Progress)' else bill.status.lower(),
+        'date': bill.created_at.strftime('%Y-%m-%d'),
+        'items': bill_lines(bill)
+    }
+
+
+def bill_detail(bill):
+    """Full bill shape used when a bill is opened in the POS."""
+    return {
+        'id': bill.id,
+        'bill_no': bill.bill_no,
+        'order_no': bill.service_order.order_no if bill.service_order else None,
+        'customer_id': bill.customer_id,
+        'customer_name': bill.customer.name if bill.customer else 'Anonymous',
+        'customer_phone': bill.customer.phone if bill.customer else '',
+        'vehicle_id': bill.vehicle_id,
+        'vehicle_number': bill.vehicle.vehicle_number if bill.vehicle else '',
+        'items': bill_lines(bill, icons=True),
+        'total': float(bill.total),
+        'discount_type': bill.discount_type,
+        'discount_value': float(bill.discount_value),
+        'tax': float(bill.tax),
+        'credit_amount': float(bill.credit_amount),
+        'payment_mode': bill.payment_mode,
+        'date': bill.created_at.strftime('%Y-%m-%d')
+    }
@@ -0,0 +1,169 @@
+"""
+Set-based bill persistence shared by generate_bill and save_bill.
+
+A bill commit resolves every referenced part and service in one query per
+table, validates all lines in memory, takes stock for the whole bill with a
+single conditional UPDATE and writes the lines with bulk_create, all inside
+one transaction. Stock changes go through the stock ledger
+(garage/services/stock.py).
+"""
+import logging
+
+from django.db import connection, transaction
+
+from garage.models import BillItem, Part, ServiceOrderItem, ServiceType
+from garage.services import sales_rollup, stock
+from garage.services.stock import InsufficientStockError
+
+logger = logging.getLogger(__name__)
+
+
+def _service_id(item):
+    raw = str(item.get('id') or '').replace('service-', '')
+    return int(raw) if raw.isdigit() else None
+
+
+def _part_id(item):
+    raw = str(item.get('id') or '')
+    return int(raw) if raw.isdigit() else None
+
+
+def _is_valid(item):
+    return item.get('name') and isinstance(item.get('price'), (int, float)) and isinstance(item.get('quantity'), int)
+
+
+def merge_service_order_items(service_order, items):
+    """Append the order's service charges that the client did not send."""
+    if not service_order:
+        return items
+    present = {item.get('id') for item in items}
+    for service_item in ServiceOrderItem.objects.filter(service_order=service_order).select_related('service_type'):
+        key = f"service-{service_item.service_type_id}"
+        if key not in present:
+            present.add(key)
+            items.append({
+                'id': key,
+                'name': service_item.service_type.name,
+                'price': float(service_item.price),
+                'quantity': 1,
+                'isService': True
+            })
+    return items
+
+
+def _create_temporary_services(client_garage, items):
+    services = [
+        ServiceType(client_garage=client_garage, name=item['name'], category='Temporary', base_price=float(item['price']))
+        for item in items
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return ServiceType.objects.bulk_create(services)
+    for service in services:
+        service.save()
+    return services
+
+
+def resolve_bill_lines(client_garage, items, skip_invalid=False):
+    """
+    Turn posted bill items into unsaved BillItem rows.
+
+    Parts and services are fetched with one ``id__in`` query each; services
+    the client made up on the spot are created as 'Temporary' service types.
+    Lines for unknown parts are dropped, as before.
+    """
+    if skip_invalid:
+        for item in items:
+            if not _is_valid(item):
+                logger.warning(f"Skipping invalid item: {item}")
+        items = [item for item in items if _is_valid(item)]
+
+    service_ids = {_service_id(item) for item in items if item.get('isService', False)} - {None}
+    part_ids = {_part_id(item) for item in items if not item.get('isService', False)} - {None}
+    services = ServiceType.objects.filter(client_garage=client_garage, id__in=service_ids).in_bulk() if service_ids else {}
+    parts = Part.objects.filter(client_garage=client_garage, id__in=part_ids).in_bulk() if part_ids else {}
+
+    unknown_services = [item for item in items if item.get('isService', False) and _service_id(item) not in services]
+    created = iter(_create_temporary_services(client_garage, unknown_services)) if unknown_services else iter(())
+
+    lines = []
+    for item in items:
+        part = None
+        service_type = None
+        if item.get('isService', False):
+            service_type = services.get(_service_id(item)) or next(created)
+        else:
+            part = parts.get(_part_id(item))
+            if not part:
+                logger.warning(f"Part not found for item ID {item.get('id')}")
+                continue
+        line = BillItem(
+            item=part,
+            service_type=service_type,
+            name=item['name'],
+            price=float(item['price']),
+            quantity=int(item['quantity'])
+        )
+        # Relations were resolved above; skip the per-FK existence queries.
+        line.full_clean(exclude=['bill', 'item', 'service_type'])
+        lines.append(line)
+    return lines
+
+
+def take_stock(client_garage, lines, reference=''):
+    """
+    Take stock for every part on the bill through the stock ledger.
+
+    Raises InsufficientStockError (rolling back the surrounding transaction)
+    if any part cannot cover its total quantity.
+    """
+    wanted = {}
+    for line in lines:
+        if line.item is not None:
+            wanted[line.item.pk] = wanted.get(line.item.pk, 0) - line.quantity
+    try:
+        stock.apply_movements(client_garage, wanted, 'sold', reference=reference)
+    except InsufficientStockError as e:
+        logger.error(f"Insufficient stock for part {e.part.name} (ID: {e.part.pk})")
+        raise
+
+
+def lines_to_json(lines):
+    return [
+        {
+            'id': f"service-{line.service_type.pk}" if line.service_type else line.item.pk,
+            'name': line.name,
+            'price': float(line.price),
+            'quantity': line.quantity,
+            'isService': line.service_type is not None
+        }
+        for line in lines
+    ]
+
+
+def commit_bill(bill, client_garage, items, decrement_stock=False, skip_invalid=False):
+    """Save ``bill`` and replace its lines in a single transaction; returns the lines."""
+    with transaction.atomic():
+        before = sales_rollup.bill_state(bill.pk) if bill.pk else None
+        lines = resolve_bill_lines(client_garage, items, skip_invalid=skip_invalid)
+        if decrement_stock:
+            take_stock(client_garage, lines, reference=bill.bill_no)
+        bill.items = lines_to_json(lines)
+        bill.save()
+        bill.bill_items.all().delete()
+        for line in lines:
+            line.bill = bill
+        BillItem.objects.bulk_create(lines)
+        sales_rollup.record_change(before, sales_rollup.state_of(bill))
+    return lines
+
+
+def delete_bill_and_restock(bill):
+    """Delete ``bill``, return its parts to stock and take it out of the sales rollup."""
+    with transaction.atomic():
+        before = sales_rollup.bill_state(bill.pk)
+        returned = {}
+        for part_id, quantity in bill.bill_items.filter(item__isnull=False).values_list('item_id', 'quantity'):
+            returned[part_id] = returned.get(part_id, 0) + quantity
+        stock.apply_movements(bill.client_garage, returned, 'returned', reference=bill.bill_no)
+        bill.delete()
+        sales_rollup.record_change(before, None)
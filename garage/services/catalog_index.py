@@ -0,0 +1,449 @@
+"""
+In-memory POS catalog index.
+
+Each garage gets one index holding its parts and services in parallel
+arrays. Item search is answered from memory (prefix or substring), and the
+index keeps itself current with change stamps taken from ``updated_at``:
+a sync runs one MAX/COUNT probe per table and pulls only the rows that
+changed since the last stamp.
+
+``rank_parts`` is the in-memory engine behind garage.services.part_search:
+part matches scored by where the query hits (code, name start, word start,
+anywhere). Part codes are also kept in a separate haystack, so a code
+typed with one or two typos still matches.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from garage.models import Part, ServiceType
+
+logger = logging.getLogger(__name__)
+
+KIND_PART = 0
+KIND_SERVICE = 1
+SERVICE_STOCK = 9999
+
+# Rows are re-read from slightly before the last stamp so a transaction that
+# committed late with an older updated_at is still picked up.
+SYNC_OVERLAP_SECONDS = 5
+
+# Typo matches are added only when fewer direct matches than this exist
+# and none of them is the exact code.
+FUZZY_BELOW = 10
+# A typo search skips query pieces found in more codes than this.
+FUZZY_PIECE_LIMIT = 2000
+_CODE_NOISE = re.compile(r'[\s\-_/.]+')
+
+# rank_parts scores, best first.
+SCORE_CODE = 5
+SCORE_CODE_PREFIX = 4
+SCORE_NAME_PREFIX = 3
+SCORE_WORD_PREFIX = 2
+SCORE_SUBSTRING = 1
+SCORE_FUZZY_CODE = 0
+
+
+def _stamp(dt):
+    return dt.timestamp() if dt else 0.0
+
+
+def code_key(code):
+    """Part code without case, spaces or separators ("bp-10 2" -> "bp102")."""
+    return _CODE_NOISE.sub('', (code or '').lower())
+
+
+def _within_edits(a, b, limit):
+    """True when ``a`` and ``b`` are at most ``limit`` edits apart."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class CatalogIndex:
+    def __init__(self, garage_id):
+        self.garage_id = garage_id
+        self._lock = threading.Lock()
+        self._last_probe = 0.0
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._rows = {}
+        self._kinds = array('b')
+        self._ids = array('q')
+        self._prices = array('d')
+        self._stock = array('q')
+        self._stamps = array('d')
+        self._codes = []
+        self._names = []
+        self._categories = []
+        self._images = []
+        self._part_count = 0
+        self._service_count = 0
+        self._part_stamp = 0.0
+        self._service_stamp = 0.0
+        self._dirty = True
+        self._haystack = ''
+        self._offsets = array('q')
+        self._tokens = []
+        self._code_keys = {}
+        self._code_haystack = ''
+        self._code_offsets = array('q')
+        self._code_rows = array('q')
+
+    # --- loading -------------------------------------------------------
+
+    def _part_rows(self, since=None):
+        parts = Part.objects.filter(client_garage_id=self.garage_id)
+        if since:
+            parts = parts.filter(updated_at__gte=since)
+        return parts.values('id', 'code', 'name', 'selling_price', 'in_stock', 'image', 'category__name', 'updated_at')
+
+    def _service_rows(self, since=None):
+        services = ServiceType.objects.filter(client_garage_id=self.garage_id)
+        if since:
+            services = services.filter(updated_at__gte=since)
+        return services.values('id', 'name', 'base_price', 'updated_at')
+
+    def _upsert(self, kind, row_id, code, name, price, in_stock, category, image, stamp):
+        key = (kind, row_id)
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._ids)
+            self._rows[key] = row
+            self._kinds.append(kind)
+            self._ids.append(row_id)
+            self._prices.append(price)
+            self._stock.append(in_stock)
+            self._stamps.append(stamp)
+            self._codes.append(code)
+            self._names.append(name)
+            self._categories.append(category)
+            self._images.append(image)
+            if kind == KIND_PART:
+                self._part_count += 1
+            else:
+                self._service_count += 1
+            self._dirty = True
+            return
+        if self._names[row] != name or self._codes[row] != code:
+            self._dirty = True
+        self._prices[row] = price
+        self._stock[row] = in_stock
+        self._stamps[row] = stamp
+        self._codes[row] = code
+        self._names[row] = name
+        self._categories[row] = category
+        self._images[row] = image
+
+    def _load_parts(self, since=None):
+        storage = Part._meta.get_field('image').storage
+        for p in self._part_rows(since).iterator(chunk_size=2000):
+            stamp = _stamp(p['updated_at'])
+            self._upsert(
+                KIND_PART, p['id'], p['code'], p['name'], float(p['selling_price']), p['in_stock'],
+                p['category__name'] or 'Uncategorized',
+                storage.url(p['image']) if p['image'] else None,
+                stamp,
+            )
+            self._part_stamp = max(self._part_stamp, stamp)
+
+    def _load_services(self, since=None):
+        for s in self._service_rows(since).iterator(chunk_size=2000):
+            stamp = _stamp(s['updated_at'])
+            self._upsert(
+                KIND_SERVICE, s['id'], f"SVC-{s['id']}", s['name'], float(s['base_price']), SERVICE_STOCK,
+                'Service', None, stamp,
+            )
+            self._service_stamp = max(self._service_stamp, stamp)
+
+    def _rebuild(self):
+        self._reset()
+        self._load_parts()
+        self._load_services()
+        self._built = True
+        logger.info(f"Built POS catalog index for garage {self.garage_id}: {self._part_count} parts, {self._service_count} services")
+
+    def _since(self, stamp):
+        return datetime.fromtimestamp(max(stamp - SYNC_OVERLAP_SECONDS, 0), tz=dt_timezone.utc)
+
+    def sync(self, force=False):
+        """Bring the index up to date with the database."""
+        interval = getattr(settings, 'POS_CATALOG_SYNC_INTERVAL', 2)
+        now = time.monotonic()
+        with self._lock:
+            if self._built and not force and now - self._last_probe < interval:
+                return
+            self._last_probe = now
+            if not self._built:
+                self._rebuild()
+                return
+
+            part_state = Part.objects.filter(client_garage_id=self.garage_id).aggregate(stamp=Max('updated_at'), count=Count('id'))
+            service_state = ServiceType.objects.filter(client_garage_id=self.garage_id).aggregate(stamp=Max('updated_at'), count=Count('id'))
+
+            if _stamp(part_state['stamp']) > self._part_stamp or part_state['count'] != self._part_count:
+                self._load_parts(self._since(self._part_stamp))
+            if _stamp(service_state['stamp']) > self._service_stamp or service_state['count'] != self._service_count:
+                self._load_services(self._since(self._service_stamp))
+
+            # A count that still disagrees after the delta means rows were
+            # deleted; updated_at cannot tell us which, so start over.
+            if part_state['count'] != self._part_count or service_state['count'] != self._service_count:
+                self._rebuild()
+
+    # --- searching -----------------------------------------------------
+
+    def _search_key(self, row):
+        if self._kinds[row] == KIND_PART:
+            return f"{self._names[row]}\x1f{self._codes[row]}".lower()
+        return self._names[row].lower()
+
+    def _refresh_search_structures(self):
+        if not self._dirty:
+            return
+        offsets = array('q')
+        keys = []
+        position = 0
+        tokens = []
+        code_keys = {}
+        code_offsets = array('q')
+        code_rows = array('q')
+        code_position = 0
+        for row in range(len(self._ids)):
+            key = self._search_key(row)
+            offsets.append(position)
+            keys.append(key)
+            position += len(key) + 1
+            tokens.append((self._names[row].lower(), row))
+            if self._kinds[row] == KIND_PART:
+                tokens.append((self._codes[row].lower(), row))
+                code = code_keys[row] = code_key(self._codes[row])
+                code_offsets.append(code_position)
+                code_rows.append(row)
+                code_position += len(code) + 1
+        self._haystack = '\x00'.join(keys)
+        self._offsets = offsets
+        tokens.sort()
+        self._tokens = tokens
+        self._code_keys = code_keys
+        self._code_haystack = '\x00'.join(code_keys.values())
+        self._code_offsets = code_offsets
+        self._code_rows = code_rows
+        self._dirty = False
+
+    def _substring_rows(self, query):
+        rows = set()
+        haystack = self._haystack
+        offsets = self._offsets
+        start = haystack.find(query)
+        while start != -1:
+            row = bisect.bisect_right(offsets, start) - 1
+            rows.add(row)
+            # Skip to the next entry; one hit per row is enough.
+            next_row = row + 1
+            start = haystack.find(query, offsets[next_row]) if next_row < len(offsets) else -1
+        return rows
+
+    def _prefix_rows(self, query):
+        rows = set()
+        tokens = self._tokens
+        i = bisect.bisect_left(tokens, (query, -1))
+        while i < len(tokens) and tokens[i][0].startswith(query):
+            rows.add(tokens[i][1])
+            i += 1
+        return rows
+
+    def _code_rows_containing(self, piece, cap):
+        """Rows whose code contains ``piece``, or None past ``cap`` rows."""
+        rows = set()
+        haystack = self._code_haystack
+        offsets = self._code_offsets
+        start = haystack.find(piece)
+        while start != -1:
+            position = bisect.bisect_right(offsets, start) - 1
+            rows.add(self._code_rows[position])
+            if len(rows) > cap:
+                return None
+            start = haystack.find(piece, offsets[position + 1]) if position + 1 < len(offsets) else -1
+        return rows
+
+    def _fuzzy_code_rows(self, code, edits):
+        """Part rows whose code (or its start) is within ``edits`` of ``code``."""
+        # Cut the query into edits + 1 pieces: a code that close to it keeps
+        # at least one piece intact, so only codes holding a piece are checked.
+        size = len(code) // (edits + 1)
+        pieces = [code[i * size:(i + 1) * size if i < edits else len(code)] for i in range(edits + 1)]
+        candidates = set()
+        for piece in pieces:
+            rows = self._code_rows_containing(piece, FUZZY_PIECE_LIMIT)
+            if rows is not None:
+                candidates |= rows
+        matches = set()
+        for row in candidates:
+            candidate = self._code_keys[row]
+            if _within_edits(code, candidate, edits) or _within_edits(code, candidate[:len(code)], edits):
+                matches.add(row)
+        return matches
+
+    def _part_score(self, row, query, code):
+        part_code = self._code_keys.get(row, '')
+        if code and part_code == code:
+            return SCORE_CODE
+        if code and part_code.startswith(code):
+            return SCORE_CODE_PREFIX
+        name = self._names[row].lower()
+        if name.startswith(query):
+            return SCORE_NAME_PREFIX
+        if f' {query}' in name:
+            return SCORE_WORD_PREFIX
+        return SCORE_SUBSTRING
+
+    def rank_parts(self, query, limit=None, prefix=False, popularity=None, fuzzy=True):
+        """
+        Ids of the parts matching ``query``, best first: by match score, then
+        by ``popularity`` ({part id: weight}), then by name. When few parts
+        match (see FUZZY_BELOW) and the query looks like a code, parts whose
+        code is one edit away (two for codes of 8+ characters) follow.
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return []
+        code = code_key(query)
+        popularity = popularity or {}
+        with self._lock:
+            self._refresh_search_structures()
+            rows = self._prefix_rows(query) if prefix else self._substring_rows(query)
+            scored = {row: self._part_score(row, query, code) for row in rows if self._kinds[row] == KIND_PART}
+            if fuzzy and len(scored) < FUZZY_BELOW and SCORE_CODE not in scored.values() and len(code) >= 4 and ' ' not in query:
+                for row in self._fuzzy_code_rows(code, 2 if len(code) >= 8 else 1):
+                    # "bp10" for "BP-10" is still an exact code hit.
+                    score = self._part_score(row, query, code)
+                    scored.setdefault(row, score if score >= SCORE_CODE_PREFIX else SCORE_FUZZY_CODE)
+            ordered = sorted(scored, key=lambda row: (
+                -scored[row], -popularity.get(self._ids[row], 0), self._names[row].lower(), self._ids[row]
+            ))
+            if limit:
+                ordered = ordered[:limit]
+            return [self._ids[row] for row in ordered]
+
+    def fuzzy_parts(self, query, limit=10):
+        """Ids of parts whose code is a near miss of ``query`` (see rank_parts)."""
+        code = code_key(query)
+        if len(code) < 4:
+            return []
+        with self._lock:
+            self._refresh_search_structures()
+            rows = sorted(self._fuzzy_code_rows(code, 2 if len(code) >= 8 else 1), key=lambda row: self._ids[row])
+            return [self._ids[row] for row in rows[:limit]]
+
+    def part_items(self, part_ids):
+        """POS items for ``part_ids``, in that order; unknown ids are skipped."""
+        with self._lock:
+            return [self._item(self._rows[(KIND_PART, part_id)]) for part_id in part_ids if (KIND_PART, part_id) in self._rows]
+
+    def service_items(self, query='', mode='substring'):
+        """POS items for the services matching ``query``, in id order."""
+        query = (query or '').strip().lower()
+        with self._lock:
+            if not query:
+                rows = range(len(self._ids))
+            else:
+                self._refresh_search_structures()
+                rows = self._prefix_rows(query) if mode == 'prefix' else self._substring_rows(query)
+            return [self._item(row) for row in self._ordered(rows) if self._kinds[row] == KIND_SERVICE]
+
+    def _item(self, row):
+        if self._kinds[row] == KIND_SERVICE:
+            return {
+                'id': f"service-{self._ids[row]}",
+                'code': self._codes[row],
+                'name': self._names[row],
+                'price': self._prices[row],
+                'category': 'Service',
+                'inStock': SERVICE_STOCK,
+                'image': None,  # Services have no image
+                'isService': True
+            }
+        return {
+            'id': self._ids[row],
+            'code': self._codes[row],
+            'name': self._names[row],
+            'price': self._prices[row],
+            'category': self._categories[row],
+            'inStock': self._stock[row],
+            'image': self._images[row],
+            'isService': False
+        }
+
+    def _ordered(self, rows):
+        # Parts first, then services, each in id order (the order the old
+        # per-request queries returned).
+        return sorted(rows, key=lambda row: (self._kinds[row], self._ids[row]))
+
+    def search(self, query='', mode='substring', limit=None):
+        query = (query or '').strip().lower()
+        with self._lock:
+            if not query:
+                rows = range(len(self._ids))
+            else:
+                self._refresh_search_structures()
+                rows = self._prefix_rows(query) if mode == 'prefix' else self._substring_rows(query)
+            ordered = self._ordered(rows)
+            if limit:
+                ordered = ordered[:limit]
+            return [self._item(row) for row in ordered]
+
+    def changes_since(self, since):
+        """Rows changed at or after ``since`` (epoch seconds) plus the live row count."""
+        with self._lock:
+            cutoff = max(since - SYNC_OVERLAP_SECONDS, 0) if since else None
+            if cutoff is None:
+                rows = range(len(self._ids))
+            else:
+                rows = [row for row in range(len(self._ids)) if self._stamps[row] >= cutoff]
+            return {
+                'items': [self._item(row) for row in self._ordered(rows)],
+                'stamp': max(self._part_stamp, self._service_stamp),
+                'count': len(self._ids),
+                'full': cutoff is None,
+            }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_catalog_index(client_garage):
+    """Return the synced catalog index for ``client_garage`` (instance or id)."""
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    with _indexes_lock:
+        index = _indexes.get(garage_id)
+        if index is None:
+            index = _indexes[garage_id] = CatalogIndex(garage_id)
+    index.sync()
+    return index
+
+
+def invalidate_catalog_index(client_garage):
+    """Force the next access to re-probe the database."""
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    index = _indexes.get(garage_id)
+    if index is not None:
+        index._last_probe = 0.0
@@ -0,0 +1,161 @@
+"""
+Admin dashboard metrics.
+
+All KPI counters are computed in a single query (one correlated subquery per
+counter, annotated on the garage row). The KPIs, the ongoing-services list
+and the recent-activity feed are cached together per garage and date range
+for DASHBOARD_CACHE_TTL seconds (default 30). Bill and service-order writes
+bump the garage's cache version (see garage/signals.py), so the next read
+recomputes. The low-stock counter counts the garage's LowStockAlert rows,
+and alert changes bump the version too (see garage/services/stock_alerts.py).
+"""
+import time as _time
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from garage.models import Bill, ClientGarage, LowStockAlert, ServiceOrder, User, Vehicle
+
+ONGOING_STATUSES = ['in-progress', 'waiting-assignment']
+STAFF_ROLES = ['staff', 'manager', 'cashier', 'mechanic']
+
+
+def date_range(date_filter, today=None):
+    """Start date for the dashboard's today/week/month filter."""
+    today = today or timezone.localdate()
+    if date_filter == 'week':
+        return today - timedelta(days=today.weekday()), today
+    if date_filter == 'month':
+        return today.replace(day=1), today
+    return today, today
+
+
+def _day_bounds(start_date, end_date):
+    # Compare created_at against aware datetimes instead of __date so the
+    # (client_garage, ..., created_at) indexes can be used.
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return start, end
+
+
+def _scalar(queryset, aggregate, output_field):
+    per_garage = queryset.filter(client_garage=OuterRef('pk')).order_by().values('client_garage')
+    return Coalesce(
+        Subquery(per_garage.annotate(value=aggregate).values('value')[:1], output_field=output_field),
+        Value(0, output_field=output_field),
+        output_field=output_field,
+    )
+
+
+def compute_kpis(client_garage, start_date, end_date):
+    """Every dashboard counter for ``client_garage`` in one query."""
+    start, end = _day_bounds(start_date, end_date)
+    counter = IntegerField()
+    money = DecimalField(max_digits=14, decimal_places=2)
+    row = ClientGarage.objects.filter(pk=client_garage.pk).annotate(
+        bikes_today=_scalar(Vehicle.objects.filter(created_at__gte=start, created_at__lt=end), Count('pk'), counter),
+        ongoing_services=_scalar(
+            ServiceOrder.objects.filter(status__in=ONGOING_STATUSES, created_date__gte=start_date, created_date__lte=end_date),
+            Count('pk'), counter
+        ),
+        pending_bills=_scalar(Bill.objects.filter(status='Pending', created_at__gte=start, created_at__lt=end), Count('pk'), counter),
+        low_stock_alerts=_scalar(LowStockAlert.objects.all(), Count('pk'), counter),
+        income_today=_scalar(Bill.objects.filter(status='Completed', created_at__gte=start, created_at__lt=end), Sum('total'), money),
+        active_staff=_scalar(User.objects.filter(is_active=True, role__in=STAFF_ROLES), Count('pk'), counter),
+    ).values('bikes_today', 'ongoing_services', 'pending_bills', 'low_stock_alerts', 'income_today', 'active_staff').get()
+    row['income_today'] = float(row['income_today'] or Decimal('0'))
+    return row
+
+
+def ongoing_services(client_garage, start_date, end_date, limit=3):
+    orders = ServiceOrder.objects.filter(
+        client_garage=client_garage,
+        status__in=ONGOING_STATUSES,
+        created_date__gte=start_date,
+        created_date__lte=end_date
+    ).select_related('vehicle', 'customer').prefetch_related('mechanics', 'service_type')[:limit]
+    return [
+        {
+            'order_no': order.order_no,
+            'status': order.status,
+            'vehicle_number': order.vehicle.vehicle_number,
+            'customer_name': order.customer.name if order.customer else None,
+            'services': [service.name for service in order.service_type.all()],
+            'mechanics': [mechanic.username for mechanic in order.mechanics.all()],
+            'estimated_completion': order.estimated_completion.strftime('%H:%M'),
+        }
+        for order in orders
+    ]
+
+
+def recent_activities(client_garage, start_date, end_date, limit=5):
+    start, end = _day_bounds(start_date, end_date)
+    activities = []
+    recent_bills = Bill.objects.filter(
+        client_garage=client_garage,
+        created_at__gte=start,
+        created_at__lt=end
+    ).order_by('-created_at').only('bill_no', 'total', 'created_at')[:2]
+    for bill in recent_bills:
+        activities.append({
+            'description': f"Bill #{bill.bill_no} paid - {client_garage.currency}{bill.total}",
+            'time': timezone.localtime(bill.created_at).strftime('%I:%M %p'),
+            'color': 'green'
+        })
+
+    recent_service_orders = ServiceOrder.objects.filter(
+        client_garage=client_garage,
+        created_date__gte=start_date,
+        created_date__lte=end_date
+    ).order_by('-created_at').select_related('vehicle')[:2]
+    for so in recent_service_orders:
+        activities.append({
+            'description': f"Vehicle {so.vehicle.vehicle_number} service {'completed' if so.status == 'completed' else 'started'}",
+            'time': timezone.localtime(so.created_at).strftime('%I:%M %p'),
+            'color': 'blue' if so.status != 'completed' else 'green'
+        })
+
+    recent_alerts = LowStockAlert.objects.filter(
+        client_garage=client_garage,
+        updated_at__gte=start,
+        updated_at__lt=end
+    ).select_related('part').only('part__name', 'updated_at').order_by('-updated_at')[:1]
+    for alert in recent_alerts:
+        activities.append({
+            'description': f"Low stock alert: {alert.part.name}",
+            'time': timezone.localtime(alert.updated_at).strftime('%I:%M %p'),
+            'color': 'yellow'
+        })
+    return sorted(activities, key=lambda x: x['time'], reverse=True)[:limit]
+
+
+def _version_key(garage_id):
+    return f"dashboard:version:{garage_id}"
+
+
+def bump_version(garage_id):
+    """Invalidate every cached dashboard snapshot of a garage."""
+    cache.set(_version_key(garage_id), _time.time_ns(), None)
+
+
+def dashboard_snapshot(client_garage, date_filter='today'):
+    """KPIs, ongoing services and recent activity, served from cache when fresh."""
+    start_date, end_date = date_range(date_filter)
+    version = cache.get(_version_key(client_garage.pk), 0)
+    key = f"dashboard:{client_garage.pk}:{version}:{start_date.isoformat()}:{end_date.isoformat()}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = {
+            **compute_kpis(client_garage, start_date, end_date),
+            'ongoing_services_list': ongoing_services(client_garage, start_date, end_date),
+            'recent_activities': recent_activities(client_garage, start_date, end_date),
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+        }
+        cache.set(key, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 30))
+    return snapshot
@@ -0,0 +1,162 @@
+"""
+Streaming CSV and XLSX exports.
+
+An export is described by an ``ExportSpec``: a header row, a values_list
+queryset (or any iterable of rows), and an optional function that formats
+each row. Rows are read
+with ``.iterator(chunk_size=EXPORT_CHUNK_SIZE)``, and related names are
+fetched by the same joined query, so memory use does not grow with the
+table size.
+- CSV is written row by row straight into the StreamingHttpResponse.
+- XLSX uses openpyxl's write-only workbook. It spools rows to a temporary
+  file, and the finished file is streamed in chunks.
+"""
+import csv
+import tempfile
+
+import openpyxl
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from garage.models import Bill, Part, ServiceOrder, VehicleCompany, VehicleModel, VehicleType
+
+EXPORT_CHUNK_SIZE = 2000
+STREAM_CHUNK_SIZE = 64 * 1024
+FORMATS = ('csv', 'xlsx')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class ExportSpec:
+    def __init__(self, header, rows, format_row=None):
+        self.header = header
+        self.rows = rows
+        self.format_row = format_row
+
+    def iter_rows(self):
+        rows = self.rows.iterator(chunk_size=EXPORT_CHUNK_SIZE) if isinstance(self.rows, QuerySet) else self.rows
+        for row in rows:
+            yield self.format_row(row) if self.format_row else row
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(spec):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(spec.header)
+    for row in spec.iter_rows():
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def stream_xlsx(spec):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(spec.header)
+    for row in spec.iter_rows():
+        ws.append(list(row))
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while chunk := tmp.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+def export_format(request, default='csv'):
+    """The requested export format, or None if it is not supported."""
+    requested = request.GET.get('format', default)
+    return requested if requested in FORMATS else None
+
+
+def export_response(spec, export_format, filename):
+    """A streaming download of ``spec`` named ``<filename>.<format>``."""
+    stream = stream_csv(spec) if export_format == 'csv' else stream_xlsx(spec)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+def _local(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def companies_export(client_garage):
+    return ExportSpec(
+        ['Name', 'Description'],
+        VehicleCompany.objects.filter(client_garage=client_garage).order_by('id').values_list('name', 'description'),
+        lambda row: (row[0], row[1] or '')
+    )
+
+
+def vehicle_types_export(client_garage):
+    return ExportSpec(
+        ['Name', 'Description'],
+        VehicleType.objects.filter(client_garage=client_garage).order_by('id').values_list('name', 'description'),
+        lambda row: (row[0], row[1] or '')
+    )
+
+
+def models_export(client_garage):
+    return ExportSpec(
+        ['Name', 'Company', 'Vehicle Type', 'Description'],
+        VehicleModel.objects.filter(client_garage=client_garage).order_by('id').values_list(
+            'name', 'company__name', 'vehicle_type__name', 'description'
+        ),
+        lambda row: (row[0], row[1], row[2], row[3] or '')
+    )
+
+
+def parts_export(client_garage, client_fiscal_year=None):
+    parts = Part.objects.filter(client_garage=client_garage)
+    if client_fiscal_year is not None:
+        parts = parts.filter(client_fiscal_year=client_fiscal_year)
+    return ExportSpec(
+        ['Code', 'Name', 'Category', 'Vehicle Company', 'Vehicle Type', 'Vehicle Model', 'Supplier',
+         'Purchase Price', 'Selling Price', 'In Stock', 'Min Stock', 'Status', 'Last Movement'],
+        parts.order_by('name', 'id').values_list(
+            'code', 'name', 'category__name', 'vehicle_company__name', 'vehicle_type__name', 'vehicle_model__name',
+            'supplier__name', 'purchase_price', 'selling_price', 'in_stock', 'min_stock', 'status', 'last_movement'
+        )
+    )
+
+
+def bills_export(client_garage, start=None, end=None):
+    bills = Bill.objects.filter(client_garage=client_garage)
+    if start is not None:
+        bills = bills.filter(created_at__gte=start)
+    if end is not None:
+        bills = bills.filter(created_at__lt=end)
+    return ExportSpec(
+        ['Bill No', 'Date', 'Customer', 'Phone', 'Vehicle', 'Order No', 'Status', 'Payment Mode',
+         'Discount Type', 'Discount', 'Tax', 'Credit', 'Total'],
+        bills.order_by('created_at', 'id').values_list(
+            'bill_no', 'created_at', 'customer__name', 'customer__phone', 'vehicle__vehicle_number',
+            'service_order__order_no', 'status', 'payment_mode', 'discount_type', 'discount_value',
+            'tax', 'credit_amount', 'total'
+        ),
+        lambda row: (row[0], _local(row[1])) + row[2:]
+    )
+
+
+def service_orders_export(client_garage, start_date=None, end_date=None):
+    orders = ServiceOrder.objects.filter(client_garage=client_garage)
+    if start_date is not None:
+        orders = orders.filter(created_date__gte=start_date)
+    if end_date is not None:
+        orders = orders.filter(created_date__lte=end_date)
+    return ExportSpec(
+        ['Order No', 'Date', 'Vehicle', 'Customer', 'Phone', 'Status', 'Priority', 'Entry Time',
+         'Estimated Completion', 'Progress', 'Total So Far', 'Complaint'],
+        orders.order_by('created_date', 'id').values_list(
+            'order_no', 'created_date', 'vehicle__vehicle_number', 'customer__name', 'customer__phone',
+            'status', 'priority', 'entry_time', 'estimated_completion', 'progress', 'total_so_far', 'complaint'
+        ),
+        lambda row: row[:7] + (row[7].strftime('%H:%M') if row[7] else '', row[8].strftime('%H:%M') if row[8] else '') + row[9:]
+    )
@@ -0,0 +1,241 @@
+"""
+Job intake: creating and editing a service order with its bill.
+
+add_vehicle_and_order and update_service_order share this service.
+- Requested services and mechanics are resolved with one ``__in`` query each.
+- Order items are written with one bulk_create, and the service and mechanic
+  links with one ``add``/``set`` each.
+- The customer, vehicle, order and bill are written in a single transaction.
+- Order and bill numbers are allocated before the transaction, so they come
+  from the cached sequence block (see garage.services.sequences).
+- The bill's ``items`` holds a JSON list, not a JSON-encoded string.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from django.db import transaction
+
+from garage.models import Bill, Customer, ServiceOrder, ServiceOrderItem, ServiceType, User, Vehicle, VehicleCompany, VehicleModel, VehicleType
+from garage.services import sales_rollup
+from garage.services.sequences import BILL, SERVICE_ORDER, next_number
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('vehicleNumber', 'company', 'vehicleModel', 'complaint')
+
+
+class IntakeError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _validate(data):
+    for field_name in REQUIRED_FIELDS:
+        value = data.get(field_name)
+        if not value or (isinstance(value, str) and not value.strip()):
+            logger.error(f"Missing or empty required field: {field_name}")
+            raise IntakeError(f'Missing or empty required field: {field_name}')
+
+
+def _vehicle_master(client_garage, data):
+    try:
+        company = VehicleCompany.objects.get(id=data['company'], client_garage=client_garage)
+    except (VehicleCompany.DoesNotExist, ValueError):
+        logger.error(f"Invalid company ID: {data['company']}")
+        raise IntakeError('Invalid vehicle company')
+    try:
+        model = VehicleModel.objects.get(id=data['vehicleModel'], client_garage=client_garage, company=company)
+    except (VehicleModel.DoesNotExist, ValueError):
+        logger.error(f"Invalid model ID: {data['vehicleModel']}")
+        raise IntakeError('Invalid vehicle model')
+    vehicle_type = None
+    if data.get('vehicleType'):
+        vehicle_type = VehicleType.objects.filter(id=data['vehicleType'], client_garage=client_garage).first()
+        if vehicle_type is None:
+            logger.warning(f"VehicleType {data['vehicleType']} not found, proceeding without type")
+    return company, model, vehicle_type
+
+
+def _services(client_garage, names):
+    """ServiceTypes for ``names`` in request order (repeats kept); unknown names are skipped."""
+    found = {}
+    for service_type in ServiceType.objects.filter(client_garage=client_garage, name__in=set(names)).order_by('-pk'):
+        found[service_type.name] = service_type
+    services = []
+    for name in names:
+        if name in found:
+            services.append(found[name])
+        else:
+            logger.warning(f"ServiceType {name} not found for client_garage {client_garage.id}")
+    return services
+
+
+def _mechanics(client_garage, mechanic_ids):
+    ids = set()
+    for mechanic_id in mechanic_ids:
+        try:
+            ids.add(int(mechanic_id))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid mechanic ID {mechanic_id}")
+    mechanics = list(User.objects.filter(id__in=ids, client_garage=client_garage, is_superuser=False))
+    if len(mechanics) < len(ids):
+        missing = ids - {mechanic.id for mechanic in mechanics}
+        logger.warning(f"Invalid or unauthorized mechanic IDs {sorted(missing)}")
+    return mechanics
+
+
+def _customer(client_garage, data):
+    customer_name = (data.get('customerName') or 'Anonymous').strip()
+    phone = data.get('phone') or ''
+    if customer_name == 'Anonymous' and not phone:
+        return None
+    customer, created = Customer.objects.get_or_create(
+        client_garage=client_garage,
+        phone=phone if phone else None,
+        defaults={'name': customer_name}
+    )
+    if not created and (customer.name != customer_name or customer.phone != phone):
+        customer.name = customer_name
+        customer.phone = phone if phone else None
+        customer.save()
+        logger.info(f"Updated customer {customer_name} (ID: {customer.id}) with new details")
+    return customer
+
+
+def _write_lines(service_order, services, mechanics, replace):
+    """Write the order's items and links; returns (total, bill item dicts)."""
+    if replace:
+        service_order.service_items.all().delete()
+    ServiceOrderItem.objects.bulk_create([
+        ServiceOrderItem(service_order=service_order, service_type=service_type, price=service_type.base_price)
+        for service_type in services
+    ])
+    unique_services = list({service_type.pk: service_type for service_type in services}.values())
+    if replace:
+        service_order.service_type.set(unique_services)
+        service_order.mechanics.set(mechanics)
+    else:
+        service_order.service_type.add(*unique_services)
+        service_order.mechanics.add(*mechanics)
+    total = sum((service_type.base_price for service_type in services), 0)
+    return total, [{'name': service_type.name, 'price': float(service_type.base_price)} for service_type in services]
+
+
+def _bill_status(mechanics):
+    return 'Generated (In Progress)' if mechanics else 'Pending'
+
+
+def create_job(client_garage, client_fiscal_year_id, data):
+    """Register a vehicle visit from the intake form; returns (service_order, bill)."""
+    _validate(data)
+    company, model, vehicle_type = _vehicle_master(client_garage, data)
+    services = _services(client_garage, data.get('commonService', []))
+    mechanics = _mechanics(client_garage, data.get('mechanic_ids', []))
+    order_no = next_number(SERVICE_ORDER, client_garage, client_fiscal_year_id)
+    bill_no = next_number(BILL, client_garage, client_fiscal_year_id)
+    now = datetime.now()
+
+    with transaction.atomic():
+        customer = _customer(client_garage, data)
+        vehicle, created = Vehicle.objects.get_or_create(
+            client_garage=client_garage,
+            vehicle_number=data['vehicleNumber'].strip().upper(),
+            defaults={'customer': customer, 'company': company, 'model': model, 'type': vehicle_type}
+        )
+        logger.info(f"Vehicle {vehicle.vehicle_number} (ID: {vehicle.id}) {'created' if created else 'retrieved'}")
+
+        service_order = ServiceOrder.objects.create(
+            client_garage=client_garage,
+            order_no=order_no,
+            vehicle=vehicle,
+            customer=customer,
+            complaint=data['complaint'].strip(),
+            status='in-progress' if mechanics else 'waiting-assignment',
+            priority=data.get('priority', 'normal'),
+            entry_time=now.time(),
+            estimated_completion=(now + timedelta(hours=int(data.get('estimatedTime', 1)))).time(),
+            created_date=now.date(),
+            progress=0,
+            total_so_far=0,
+            helmet_given=data.get('helmetGiven', False),
+            key_given=data.get('keyGiven', False)
+        )
+        total, bill_items = _write_lines(service_order, services, mechanics, replace=False)
+        ServiceOrder.objects.filter(pk=service_order.pk).update(total_so_far=total)
+        service_order.total_so_far = total
+
+        bill = Bill.objects.create(
+            client_garage=client_garage,
+            bill_no=bill_no,
+            service_order=service_order,
+            customer=customer,
+            vehicle=vehicle,
+            status=_bill_status(mechanics),
+            items=bill_items,
+            total=total
+        )
+        sales_rollup.record_change(None, sales_rollup.state_of(bill))
+    logger.info(f"Created ServiceOrder {order_no} with {len(services)} services and Bill {bill_no}")
+    return service_order, bill
+
+
+def update_job(service_order, client_fiscal_year_id, data):
+    """Apply the edit form to ``service_order`` and its bill; returns (service_order, bill)."""
+    if service_order.status == 'completed':
+        logger.warning(f"Attempt to update completed order {service_order.order_no}")
+        raise IntakeError('Cannot update completed order')
+    _validate(data)
+    client_garage = service_order.client_garage
+    company, model, vehicle_type = _vehicle_master(client_garage, data)
+    services = _services(client_garage, data.get('commonService', []))
+    mechanics = _mechanics(client_garage, data.get('mechanic_ids', []))
+    bill_no = None
+    if not Bill.objects.filter(service_order=service_order).exists():
+        bill_no = next_number(BILL, client_garage, client_fiscal_year_id)
+
+    with transaction.atomic():
+        customer = _customer(client_garage, data)
+        vehicle, created = Vehicle.objects.get_or_create(
+            client_garage=client_garage,
+            vehicle_number=data['vehicleNumber'].strip().upper(),
+            defaults={'customer': customer, 'company': company, 'model': model, 'type': vehicle_type}
+        )
+        if not created and (
+            vehicle.customer_id != (customer.pk if customer else None) or
+            vehicle.company_id != company.pk or
+            vehicle.model_id != model.pk or
+            vehicle.type_id != (vehicle_type.pk if vehicle_type else None)
+        ):
+            vehicle.customer = customer
+            vehicle.company = company
+            vehicle.model = model
+            vehicle.type = vehicle_type
+            vehicle.save()
+            logger.info(f"Updated vehicle {vehicle.vehicle_number} (ID: {vehicle.id}) with new details")
+
+        total, bill_items = _write_lines(service_order, services, mechanics, replace=True)
+        service_order.vehicle = vehicle
+        service_order.customer = customer
+        service_order.complaint = data['complaint'].strip()
+        service_order.priority = data.get('priority', 'normal')
+        service_order.helmet_given = data.get('helmetGiven', False)
+        service_order.key_given = data.get('keyGiven', False)
+        service_order.estimated_completion = (datetime.now() + timedelta(hours=int(data.get('estimatedTime', 1)))).time()
+        service_order.total_so_far = total
+        service_order.status = 'in-progress' if mechanics else 'waiting-assignment'
+        service_order.save()
+
+        bill = Bill.objects.select_for_update().filter(service_order=service_order).order_by('pk').first()
+        before = sales_rollup.state_of(bill) if bill else None
+        if bill is None:
+            bill = Bill(client_garage=client_garage, bill_no=bill_no or next_number(BILL, client_garage, client_fiscal_year_id), service_order=service_order)
+        bill.customer = customer
+        bill.vehicle = vehicle
+        bill.status = _bill_status(mechanics)
+        bill.items = bill_items
+        bill.total = total
+        bill.save()
+        sales_rollup.record_change(before, sales_rollup.state_of(bill))
+    logger.info(f"Updated ServiceOrder {service_order.order_no} with {len(services)} services, bill {bill.bill_no}")
+    return service_order, bill
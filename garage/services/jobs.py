@@ -0,0 +1,217 @@
+"""
+Database-backed background jobs.
+
+A view calls ``enqueue`` and returns at once. The ``run_jobs`` management
+command claims queued jobs and runs them on a thread or process pool.
+
+- Handlers are registered per kind with ``@job_handler`` (see
+  garage/jobs.py). Each one receives a ``JobContext``, through which it
+  reads its params, reports progress and stores a result file under
+  MEDIA_ROOT/jobs/<garage id>/<job id>/. Whatever it returns is saved as
+  the job's JSON result.
+- A failed job is retried after JOB_RETRY_DELAY * 2**(attempt - 1)
+  seconds until it has run max_attempts times. A handler that raises a
+  ValidationError or ValueError (ImportFileError, PurchaseError, ...)
+  rejected its input; running it again cannot help, so the job fails at
+  once.
+- A job left running by a worker that died is claimed again once it has
+  been running for JOB_LOCK_TIMEOUT seconds.
+"""
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.http import JsonResponse
+from django.utils import timezone
+
+from garage.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# Errors that mean the job's input is bad; these are not retried.
+PERMANENT_ERRORS = (ValidationError, ValueError)
+
+
+def job_handler(kind):
+    """Register the decorated function as the handler of ``kind`` jobs."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def _retry_delay():
+    return getattr(settings, 'JOB_RETRY_DELAY', 30)
+
+
+def _lock_timeout():
+    return getattr(settings, 'JOB_LOCK_TIMEOUT', 3600)
+
+
+def wants_background(request):
+    """True when the client asked for the action to run as a background job."""
+    return request.GET.get('background') == '1' or request.POST.get('background') == '1'
+
+
+def queued_response(job):
+    """202 response pointing the client at the job's status endpoint."""
+    return JsonResponse({'status': 'queued', 'job_id': job.pk, 'status_url': f"/admin/jobs/{job.pk}/"}, status=202)
+
+
+def media_path(relative_path):
+    return os.path.join(settings.MEDIA_ROOT, relative_path)
+
+
+def save_upload(uploaded_file, client_garage):
+    """Store an uploaded file for a job; returns its path relative to MEDIA_ROOT."""
+    relative_path = os.path.join('jobs', 'uploads', str(client_garage.pk), f"{uuid.uuid4().hex}-{os.path.basename(uploaded_file.name)}")
+    os.makedirs(os.path.dirname(media_path(relative_path)), exist_ok=True)
+    with open(media_path(relative_path), 'wb') as fh:
+        for chunk in uploaded_file.chunks():
+            fh.write(chunk)
+    return relative_path
+
+
+def enqueue(kind, client_garage=None, user=None, max_attempts=3, cleanup=(), **params):
+    """
+    Queue a ``kind`` job with JSON-serialisable ``params``.
+
+    ``cleanup`` lists files (relative to MEDIA_ROOT) to delete once the job
+    has succeeded or finally failed, e.g. uploads saved with save_upload.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    if cleanup:
+        params['cleanup'] = list(cleanup)
+    return BackgroundJob.objects.create(
+        client_garage=client_garage,
+        created_by=user,
+        kind=kind,
+        params=params,
+        max_attempts=max_attempts,
+    )
+
+
+class JobContext:
+    def __init__(self, job):
+        self.job = job
+        self.result_file = ''
+
+    @property
+    def params(self):
+        return self.job.params
+
+    def progress(self, percent, message=''):
+        percent = max(0, min(int(percent), 100))
+        BackgroundJob.objects.filter(pk=self.job.pk).update(progress=percent, message=message, updated_at=timezone.now())
+
+    def result_path(self, filename):
+        """Absolute path for a result file; the last one written is the job's download."""
+        garage_dir = str(self.job.client_garage_id or 'global')
+        self.result_file = os.path.join('jobs', garage_dir, str(self.job.pk), os.path.basename(filename))
+        path = media_path(self.result_file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def save_file(self, filename, chunks):
+        """Write ``chunks`` (bytes or an iterable of bytes) as the result file."""
+        with open(self.result_path(filename), 'wb') as fh:
+            if isinstance(chunks, bytes):
+                fh.write(chunks)
+            else:
+                for chunk in chunks:
+                    fh.write(chunk)
+
+
+def claim(worker_id, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker_id``; returns their ids."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=_lock_timeout())
+    claimable = Q(status='queued', run_after__lte=now) | Q(status='running', started_at__lt=stale)
+    candidates = list(
+        BackgroundJob.objects.filter(claimable).order_by('run_after', 'id').values_list('id', flat=True)[:limit * 4]
+    )
+    claimed = []
+    for job_id in candidates:
+        # The status condition makes the UPDATE the lock: only one worker's update matches.
+        won = BackgroundJob.objects.filter(claimable, pk=job_id).update(
+            status='running', locked_by=worker_id, started_at=now, attempts=F('attempts') + 1, updated_at=now
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def _cleanup(job):
+    for relative_path in job.params.get('cleanup', []):
+        try:
+            os.remove(media_path(relative_path))
+        except OSError:
+            pass
+
+
+def _finish(job, **fields):
+    BackgroundJob.objects.filter(pk=job.pk).update(finished_at=timezone.now(), updated_at=timezone.now(), **fields)
+
+
+def run_job(job_id):
+    """Run one claimed job and record its outcome."""
+    close_old_connections()
+    try:
+        job = BackgroundJob.objects.select_related('client_garage', 'created_by').get(pk=job_id)
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            _finish(job, status='failed', message=f"Unknown job kind '{job.kind}'")
+            _cleanup(job)
+            return
+        if job.attempts > job.max_attempts:
+            _finish(job, status='failed', message=job.message or 'Job was interrupted too many times')
+            _cleanup(job)
+            return
+
+        context = JobContext(job)
+        try:
+            result = handler(context)
+        except Exception as e:
+            logger.error(f"Job {job.pk} ({job.kind}) failed on attempt {job.attempts}: {str(e)}")
+            if job.attempts < job.max_attempts and not isinstance(e, PERMANENT_ERRORS):
+                retry_at = timezone.now() + timedelta(seconds=_retry_delay() * 2 ** (job.attempts - 1))
+                BackgroundJob.objects.filter(pk=job.pk).update(
+                    status='queued', run_after=retry_at, locked_by='', message=str(e), updated_at=timezone.now()
+                )
+            else:
+                _finish(job, status='failed', message=str(e))
+                _cleanup(job)
+            return
+
+        _finish(job, status='succeeded', progress=100, result=result, result_file=context.result_file, message='')
+        _cleanup(job)
+        logger.info(f"Job {job.pk} ({job.kind}) succeeded")
+    finally:
+        close_old_connections()
+
+
+def job_as_dict(job):
+    return {
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'result': job.result,
+        'has_file': bool(job.result_file),
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,106 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+A page is fetched with ``WHERE (key, id) < (last_key, last_id)`` on the
+endpoint's sort order instead of OFFSET. This costs the same on page 1000
+as on page 1. The cursor is an opaque base64 token holding the last row's
+sort values. Totals are optional: they come from a cached COUNT, so
+scrolling does not pay for a full count on every request.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def per_page_from(request, default, maximum):
+    """Read ``per_page`` from the query string, between 1 and ``maximum``."""
+    try:
+        per_page = int(request.GET.get('per_page', default))
+    except (TypeError, ValueError):
+        per_page = default
+    return max(1, min(per_page, maximum))
+
+
+def wants_cursor(request):
+    """Cursor mode is opt-in: pass ``cursor`` (empty for the first page)."""
+    return 'cursor' in request.GET
+
+
+def _key_value(row, field):
+    value = getattr(row, field)
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_cursor(row, keys):
+    payload = json.dumps([_key_value(row, field) for field, _ in keys], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, keys):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError('cursor does not match the sort keys')
+        return [model._meta.get_field(field).to_python(value) for (field, _), value in zip(keys, values)]
+    except Exception as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+
+def _after(keys, values):
+    """Rows strictly after ``values`` in the (key, ..., id) order."""
+    condition = Q()
+    for i, (field, descending) in enumerate(keys):
+        step = Q(**{f"{field}__{'lt' if descending else 'gt'}": values[i]})
+        for j in range(i):
+            step &= Q(**{keys[j][0]: values[j]})
+        condition |= step
+    return condition
+
+
+def cached_count(queryset, ttl=None):
+    """COUNT(*) for ``queryset``, cached for a short while (approximate total)."""
+    if ttl is None:
+        ttl = getattr(settings, 'PAGINATION_COUNT_CACHE_TTL', 60)
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = 'pagecount:' + hashlib.sha1(f"{sql}|{params}".encode()).hexdigest()
+    total = cache.get(key)
+    if total is None:
+        total = queryset.count()
+        cache.set(key, total, ttl)
+    return total
+
+
+def keyset_page(request, queryset, keys, per_page):
+    """
+    Return ``(rows, meta)`` for the page after ``request.GET['cursor']``.
+
+    ``keys`` is the sort order as ``[(field, descending), ...]`` and must end
+    with a unique field (the id). ``meta`` holds ``next_cursor``, ``has_more``
+    and, unless ``count=none`` is passed, a cached ``total``.
+    """
+    ordering = [f"-{field}" if descending else field for field, descending in keys]
+    page_qs = queryset.order_by(*ordering)
+    token = request.GET.get('cursor', '')
+    if token:
+        page_qs = page_qs.filter(_after(keys, decode_cursor(token, queryset.model, keys)))
+
+    rows = list(page_qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    meta = {
+        'next_cursor': encode_cursor(rows[-1], keys) if has_more else None,
+        'has_more': has_more,
+        'per_page': per_page,
+    }
+    if request.GET.get('count') != 'none':
+        meta['total'] = cached_count(queryset)
+    return rows, meta
@@ -0,0 +1,115 @@
+"""
+Part search shared by the POS item list, the inventory table and the
+purchase-form autocomplete.
+
+``search_parts`` returns part ids best first. The backend is chosen by the
+PART_SEARCH_BACKEND setting (a dotted path):
+- ``garage.services.part_search.CatalogBackend`` (default) ranks parts in
+  memory from the POS catalog index (garage.services.catalog_index). Code
+  hits rank above name hits and name starts above substrings. A code typed
+  with a typo still matches.
+- ``garage.services.part_search.FulltextBackend`` asks the MySQL/MariaDB
+  FULLTEXT index on part name and code (migration 0028) and tops the result
+  up with the same typo-tolerant code lookup.
+
+Within a score, parts that sold more units over the last
+PART_SEARCH_POPULARITY_DAYS days (default 90) come first. Those sales
+counts are cached for PART_SEARCH_POPULARITY_TTL seconds (default 600).
+"""
+import re
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from garage.models import Part, StockMovement
+from garage.services.catalog_index import FUZZY_BELOW, get_catalog_index
+
+DEFAULT_BACKEND = 'garage.services.part_search.CatalogBackend'
+DEFAULT_LIMIT = 10
+
+_WORDS = re.compile(r'\w+')
+
+
+def popularity(garage_id):
+    """{part id: units sold recently} for the garage, cached."""
+    key = f"part_search:popularity:{garage_id}"
+    counts = cache.get(key)
+    if counts is None:
+        since = timezone.now() - timedelta(days=getattr(settings, 'PART_SEARCH_POPULARITY_DAYS', 90))
+        counts = {
+            part_id: -sold
+            for part_id, sold in StockMovement.objects.filter(
+                client_garage_id=garage_id, movement_type='sold', created_at__gte=since
+            ).values('part_id').annotate(sold=Sum('quantity')).values_list('part_id', 'sold')
+        }
+        cache.set(key, counts, getattr(settings, 'PART_SEARCH_POPULARITY_TTL', 600))
+    return counts
+
+
+class CatalogBackend:
+    """Ranks parts from the in-memory POS catalog index."""
+
+    def search(self, garage_id, query, limit=DEFAULT_LIMIT, prefix=False):
+        return get_catalog_index(garage_id).rank_parts(query, limit=limit, prefix=prefix, popularity=popularity(garage_id))
+
+
+class FulltextBackend:
+    """Ranks parts with MATCH ... AGAINST on the FULLTEXT(name, code) index."""
+
+    def __init__(self):
+        if connection.vendor != 'mysql':
+            raise ImproperlyConfigured('FulltextBackend needs MySQL or MariaDB')
+
+    def _expression(self, query):
+        # Every word must appear; the last one may still be being typed.
+        words = _WORDS.findall(query)
+        return ' '.join(f'+{word}' for word in words[:-1]) + f' +{words[-1]}*' if words else ''
+
+    def search(self, garage_id, query, limit=DEFAULT_LIMIT, prefix=False):
+        expression = self._expression(query or '')
+        if not expression:
+            return []
+        relevance = RawSQL('MATCH (`garage_part`.`name`, `garage_part`.`code`) AGAINST (%s IN BOOLEAN MODE)', (expression,))
+        rows = Part.objects.filter(client_garage_id=garage_id).annotate(relevance=relevance).filter(relevance__gt=0)
+        if prefix:
+            rows = rows.filter(name__istartswith=query.strip())
+        rows = rows.order_by('-relevance', 'name', 'id').values_list('id', 'relevance')
+        if limit:
+            rows = rows[:limit]
+        sold = popularity(garage_id)
+        ranked = [part_id for part_id, _ in sorted(rows, key=lambda row: (-row[1], -sold.get(row[0], 0)))]
+        if len(ranked) < FUZZY_BELOW and not prefix:
+            seen = set(ranked)
+            near = [part_id for part_id in get_catalog_index(garage_id).fuzzy_parts(query) if part_id not in seen]
+            ranked += near[:limit - len(ranked)] if limit else near
+        return ranked
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(getattr(settings, 'PART_SEARCH_BACKEND', DEFAULT_BACKEND))()
+        return _backend
+
+
+def search_parts(client_garage, query, limit=DEFAULT_LIMIT, prefix=False):
+    """
+    Ids of the garage's parts matching ``query``, best first. ``limit=None``
+    returns every match; ``prefix`` keeps only names and codes starting with
+    the query.
+    """
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    return get_backend().search(garage_id, query, limit=limit, prefix=prefix)
@@ -0,0 +1,100 @@
+"""
+Payroll statements.
+
+A statement for any number of staff costs three queries: the staff rows,
+one grouped aggregate over StaffPayroll and one grouped count over
+StaffAttendance. Statements are cached per garage, period and staff set
+for PAYROLL_CACHE_TTL seconds (default 300). Payroll, attendance and user
+writes bump the garage's version (see garage/signals.py), which drops
+every cached statement of that garage.
+"""
+import hashlib
+import time as _time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+from garage.models import StaffAttendance, StaffPayroll, User
+
+STATEMENT_HEADER = ['Staff Name', 'Email', 'Role', 'Base Salary', 'Incentives', 'Payments', 'Dues', 'Attendance Days']
+
+
+def statement_period(start_date_str, end_date_str, today=None):
+    """The requested period, or the current month when either date is missing."""
+    if not start_date_str or not end_date_str:
+        today = today or date.today()
+        start_date = date(today.year, today.month, 1)
+        end_date = (start_date + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        return start_date, end_date
+    return datetime.strptime(start_date_str, '%Y-%m-%d').date(), datetime.strptime(end_date_str, '%Y-%m-%d').date()
+
+
+def compute_statement(client_garage, user_ids, start_date, end_date):
+    """One row dict per requested staff member, in the requested order."""
+    user_ids = [int(user_id) for user_id in user_ids]
+    users = {
+        row['id']: row for row in User.objects.filter(pk__in=user_ids, client_garage=client_garage).values(
+            'id', 'username', 'email', 'role', 'base_salary', 'previous_dues'
+        )
+    }
+    missing = [user_id for user_id in user_ids if user_id not in users]
+    if missing:
+        raise User.DoesNotExist(f"Staff not found: {', '.join(str(user_id) for user_id in missing)}")
+
+    payrolls = {
+        row['user_id']: row for row in StaffPayroll.objects.filter(
+            client_garage=client_garage,
+            user_id__in=user_ids,
+            payment_date__range=[start_date, end_date]
+        ).order_by().values('user_id').annotate(incentives=Sum('incentives'), payments=Sum('amount'))
+    }
+    attendance = dict(
+        StaffAttendance.objects.filter(
+            user_id__in=user_ids,
+            date__range=[start_date, end_date],
+            status='present'
+        ).order_by().values('user_id').annotate(days=Count('id')).values_list('user_id', 'days')
+    )
+
+    rows = []
+    for user_id in user_ids:
+        user = users[user_id]
+        paid = payrolls.get(user_id, {})
+        rows.append({
+            'Staff Name': user['username'],
+            'Email': user['email'],
+            'Role': user['role'],
+            'Base Salary': float(user['base_salary'] or 0),
+            'Incentives': float(paid.get('incentives') or 0),
+            'Payments': float(paid.get('payments') or 0),
+            'Dues': float(user['previous_dues'] or 0),
+            'Attendance Days': attendance.get(user_id, 0),
+        })
+    return rows
+
+
+def _version_key(garage_id):
+    return f"payroll:version:{garage_id}"
+
+
+def bump_version(garage_id):
+    """Invalidate every cached payroll statement of a garage."""
+    cache.set(_version_key(garage_id), _time.time_ns(), None)
+
+
+def payroll_statement(client_garage, user_ids, start_date, end_date):
+    """``compute_statement``, served from cache while the garage's payroll data is unchanged."""
+    version = cache.get(_version_key(client_garage.pk), 0)
+    staff = hashlib.sha256(','.join(str(int(user_id)) for user_id in user_ids).encode()).hexdigest()[:16]
+    key = f"payroll:{client_garage.pk}:{version}:{start_date.isoformat()}:{end_date.isoformat()}:{staff}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = compute_statement(client_garage, user_ids, start_date, end_date)
+        cache.set(key, rows, getattr(settings, 'PAYROLL_CACHE_TTL', 300))
+    return rows
+
+
+def statement_filename(start_date, end_date):
+    return f"payroll_statement_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
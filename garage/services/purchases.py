@@ -0,0 +1,237 @@
+"""
+Purchase order ingestion.
+
+``create_purchase_order`` takes any number of lines and resolves them with
+one query per table: parts by code, vehicle companies, types and models by
+name, and the category for new parts. Missing parts and all the order's
+items are written with bulk_create, changed parts with one bulk_update, and
+stock arrives through a single ledger movement per part
+(garage.services.stock). The supplier's balance is booked through
+garage.services.supplier_ledger in the same transaction.
+
+``read_invoice`` turns a supplier's invoice spreadsheet (CSV or XLSX) into
+the same lines, so a restock of hundreds of lines is one upload.
+"""
+import os
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from garage.models import Part, PartCategory, PurchaseOrder, PurchaseOrderItem, VehicleCompany, VehicleModel, VehicleType
+from garage.services import supplier_ledger
+from garage.services.sequences import PURCHASE_ORDER, next_number
+from garage.services.spreadsheet_import import read_csv_rows, read_rows
+from garage.services.stock import apply_movements
+
+INVOICE_COLUMNS = ['Code', 'Name', 'Quantity', 'Rate', 'Selling Price', 'Vehicle Company', 'Vehicle Type', 'Vehicle Model']
+MAX_REPORTED_ERRORS = 100
+
+
+class PurchaseError(ValueError):
+    """The order cannot be created; ``errors`` lists per-line problems."""
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _key(name):
+    return name.casefold()
+
+
+def _line(values, label):
+    """Validate one line dict (the JSON shape of the purchase form)."""
+    try:
+        quantity = int(values.get('quantity') or 0)
+        rate = Decimal(str(values.get('rate') or 0))
+        selling_price = Decimal(str(values.get('sellingPrice') or 0))
+    except (ValueError, InvalidOperation):
+        raise PurchaseError(f"{label}: quantity, rate and selling price must be numbers")
+    if quantity <= 0:
+        raise PurchaseError(f"{label}: quantity must be greater than zero")
+    if rate < 0 or selling_price < 0:
+        raise PurchaseError(f"{label}: prices cannot be negative")
+    code = _text(values.get('code'))
+    name = _text(values.get('name'))
+    if not code and not name:
+        raise PurchaseError(f"{label}: code or name is required")
+    return {
+        'code': code,
+        'name': name or code,
+        'quantity': quantity,
+        'rate': rate,
+        'selling_price': selling_price,
+        'vehicle_company': _text(values.get('vehicle_company')),
+        'vehicle_type': _text(values.get('vehicle_type')),
+        'vehicle_model': _text(values.get('vehicle_model')),
+    }
+
+
+def clean_lines(items):
+    """Validate every line; raises PurchaseError listing all bad lines."""
+    lines, errors = [], []
+    for index, values in enumerate(items, start=1):
+        try:
+            lines.append(_line(values, f"Line {index}"))
+        except PurchaseError as e:
+            errors.append(str(e))
+    if errors:
+        raise PurchaseError(f"{len(errors)} line(s) are invalid", errors[:MAX_REPORTED_ERRORS])
+    if not lines:
+        raise PurchaseError('At least one item is required')
+    return lines
+
+
+def read_invoice(file):
+    """
+    Lines of an invoice spreadsheet with the columns of INVOICE_COLUMNS
+    (header row first). Raises PurchaseError listing every bad row.
+    """
+    rows = read_csv_rows(file) if os.path.splitext(file.name)[1].lower() == '.csv' else read_rows(file)
+    lines, errors = [], []
+    for row_number, values in rows:
+        values = list(values) + [None] * (len(INVOICE_COLUMNS) - len(values))
+        try:
+            lines.append(_line({
+                'code': values[0],
+                'name': values[1],
+                'quantity': _text(values[2]),
+                'rate': _text(values[3]),
+                'sellingPrice': _text(values[4]),
+                'vehicle_company': values[5],
+                'vehicle_type': values[6],
+                'vehicle_model': values[7],
+            }, f"Row {row_number}"))
+        except PurchaseError as e:
+            errors.append(str(e))
+    if errors:
+        raise PurchaseError(f"{len(errors)} row(s) are invalid", errors[:MAX_REPORTED_ERRORS])
+    if not lines:
+        raise PurchaseError('The invoice has no items')
+    return lines
+
+
+def _by_name(model, client_garage, names):
+    """{casefolded name: id} for ``names``; the oldest row wins on duplicates."""
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    found = {}
+    for pk, name in model.objects.filter(client_garage=client_garage, name__in=names).order_by('-pk').values_list('pk', 'name'):
+        found[_key(name)] = pk
+    return found
+
+
+def _default_category(client_garage, supplier):
+    categories = PartCategory.objects.filter(client_garage=client_garage)
+    return categories.filter(name=supplier.category).first() or categories.first()
+
+
+def create_purchase_order(client_garage, client_fiscal_year, supplier, payment_mode, lines, tax_setting=None):
+    """Record a purchase of validated ``lines`` (see clean_lines) and receive its stock."""
+    tax_rate = tax_setting.tax_rate / 100 if tax_setting and tax_setting.include_in_bill else Decimal('0')
+    subtotal = sum((line['quantity'] * line['rate'] for line in lines), Decimal('0'))
+    tax = (subtotal * Decimal(str(tax_rate))).quantize(Decimal('0.01'))
+    total = subtotal + tax
+    if payment_mode == 'credit' and (supplier.current_credit + total) > supplier.credit_limit:
+        raise PurchaseError('Credit limit exceeded')
+
+    due_date = None
+    if payment_mode == 'credit':
+        days = int(supplier.payment_terms.split('-')[0]) if supplier.payment_terms != 'immediate' else 0
+        due_date = timezone.localdate() + timedelta(days=days)
+    # Allocated before the transaction so the number comes from the cached block.
+    purchase_no = next_number(PURCHASE_ORDER, client_garage, client_fiscal_year)
+
+    stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+    for index, line in enumerate(lines, start=1):
+        if not line['code']:
+            line['code'] = f"PART{stamp}{index:03d}"
+
+    with transaction.atomic():
+        purchase_order = PurchaseOrder.objects.create(
+            client_garage=client_garage,
+            client_fiscal_year=client_fiscal_year,
+            supplier=supplier,
+            purchase_no=purchase_no,
+            date=timezone.localdate(),
+            subtotal=subtotal,
+            tax=tax,
+            total=total,
+            payment_mode=payment_mode,
+            status='pending' if payment_mode == 'credit' else 'paid',
+            due_date=due_date
+        )
+
+        companies = _by_name(VehicleCompany, client_garage, (line['vehicle_company'] for line in lines))
+        vehicle_types = _by_name(VehicleType, client_garage, (line['vehicle_type'] for line in lines))
+        models = _by_name(VehicleModel, client_garage, (line['vehicle_model'] for line in lines))
+        # Codes compare case-insensitively, as the MySQL collation does, so
+        # an invoice's "abc12" updates the stored "ABC12".
+        parts = {_key(part.code): part for part in Part.objects.filter(client_garage=client_garage, code__in={line['code'] for line in lines})}
+
+        # The last line of a code decides the part's prices and vehicle, as
+        # when the lines were applied one after another.
+        latest = {_key(line['code']): line for line in lines}
+        now = timezone.now()
+        new_parts = []
+        for code, line in latest.items():
+            part = parts.get(code) or Part(
+                client_garage=client_garage,
+                client_fiscal_year=client_fiscal_year,
+                code=line['code'],
+                name=line['name'],
+                supplier=supplier,
+                in_stock=0,
+                min_stock=5,
+                status='out-of-stock'
+            )
+            part.vehicle_company_id = companies.get(_key(line['vehicle_company']))
+            part.vehicle_type_id = vehicle_types.get(_key(line['vehicle_type']))
+            part.vehicle_model_id = models.get(_key(line['vehicle_model']))
+            part.purchase_price = line['rate']
+            part.selling_price = line['selling_price']
+            part.updated_at = now
+            if part.pk is None:
+                new_parts.append(part)
+        if new_parts:
+            category = _default_category(client_garage, supplier)
+            for part in new_parts:
+                part.category = category
+            Part.objects.bulk_create(new_parts, batch_size=500)
+        if parts:
+            # in_stock, status and the movement fields belong to the stock ledger
+            Part.objects.bulk_update(
+                parts.values(),
+                ['vehicle_company', 'vehicle_type', 'vehicle_model', 'purchase_price', 'selling_price', 'updated_at'],
+                batch_size=500
+            )
+        if new_parts:
+            # MySQL does not return the ids of bulk-created rows.
+            parts.update(
+                (_key(part.code), part)
+                for part in Part.objects.filter(client_garage=client_garage, code__in=[part.code for part in new_parts])
+            )
+
+        received = {}
+        for line in lines:
+            part_id = parts[_key(line['code'])].pk
+            received[part_id] = received.get(part_id, 0) + line['quantity']
+        PurchaseOrderItem.objects.bulk_create([
+            PurchaseOrderItem(
+                purchase_order=purchase_order,
+                part_id=parts[_key(line['code'])].pk,
+                quantity=line['quantity'],
+                rate=line['rate'],
+                amount=line['quantity'] * line['rate']
+            )
+            for line in lines
+        ], batch_size=500)
+        apply_movements(client_garage, received, 'added', reference=purchase_no, require_stock=False)
+        supplier_ledger.record_purchase(purchase_order)
+    return purchase_order
@@ -0,0 +1,177 @@
+"""
+Bulk export of bill receipts for a date range.
+
+Two output formats are supported:
+- ``zip``: one PDF per bill. Receipts missing from the disk cache are
+  rendered in a process pool, a batch at a time. Each batch is written
+  into a zip archive that is streamed to the client while it is built.
+- ``pdf``: every receipt in a single merged document, built in one
+  ReportLab pass with a page break between bills. ReportLab only writes
+  the file once the whole document is built, so this format streams its
+  bytes after that pass.
+
+Progress is kept in the cache under the export id for EXPORT_PROGRESS_TTL
+seconds, for the status endpoint to poll.
+"""
+import io
+import logging
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+from reportlab.platypus import PageBreak
+from reportlab.platypus.flowables import Flowable
+
+from garage.models import BillItem
+from garage.services.receipts import (
+    build_receipt_context, new_receipt_document, receipt_bill_queryset, receipt_cache_path,
+    receipt_flowables, render_receipt, store_receipt
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('zip', 'pdf')
+BATCH_SIZE = 32
+STREAM_CHUNK_SIZE = 64 * 1024
+EXPORT_PROGRESS_TTL = 3600
+
+
+def _progress_key(garage_id, export_id):
+    return f"receipt_export:{garage_id}:{export_id}"
+
+
+def export_progress(garage_id, export_id):
+    """The progress dict of an export, or None if it is unknown or expired."""
+    return cache.get(_progress_key(garage_id, export_id))
+
+
+def _set_progress(garage_id, export_id, **progress):
+    cache.set(_progress_key(garage_id, export_id), progress, EXPORT_PROGRESS_TTL)
+
+
+def export_bills(client_garage, start_date, end_date):
+    """Bills created between the two dates (inclusive), oldest first, with their lines."""
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+    return receipt_bill_queryset().filter(
+        client_garage=client_garage,
+        created_at__gte=start,
+        created_at__lt=end
+    ).prefetch_related(
+        Prefetch('bill_items', queryset=BillItem.objects.order_by('id'))
+    ).order_by('created_at', 'id')
+
+
+def _batches(bills):
+    rows = bills.iterator(chunk_size=BATCH_SIZE)
+    while batch := list(islice(rows, BATCH_SIZE)):
+        yield batch
+
+
+class _StreamSink:
+    """Write-only file object whose written bytes are drained by a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _cached_pdf(path):
+    try:
+        with open(path, 'rb') as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def stream_zip(client_garage, bills, export_id):
+    """Yield a zip archive with one receipt PDF per bill."""
+    total = bills.count()
+    done = 0
+    _set_progress(client_garage.pk, export_id, status='running', format='zip', total=total, done=done)
+    sink = _StreamSink()
+    try:
+        # Receipts are already compressed PDFs; storing them keeps the web worker free.
+        with ProcessPoolExecutor(max_workers=getattr(settings, 'RECEIPT_EXPORT_WORKERS', None)) as pool, \
+                zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for batch in _batches(bills):
+                paths = [receipt_cache_path(bill, client_garage) for bill in batch]
+                pdfs = [_cached_pdf(path) for path in paths]
+                missing = [i for i, pdf in enumerate(pdfs) if pdf is None]
+                contexts = [build_receipt_context(batch[i], client_garage) for i in missing]
+                for i, pdf in zip(missing, pool.map(render_receipt, contexts)):
+                    store_receipt(paths[i], pdf, batch[i])
+                    pdfs[i] = pdf
+                for bill, pdf in zip(batch, pdfs):
+                    info = zipfile.ZipInfo(f"bill_{bill.bill_no}.pdf", timezone.localtime(bill.created_at).timetuple()[:6])
+                    archive.writestr(info, pdf)
+                done += len(batch)
+                _set_progress(client_garage.pk, export_id, status='running', format='zip', total=total, done=done)
+                yield sink.drain()
+        yield sink.drain()
+    except Exception as e:
+        logger.error(f"Receipt export {export_id} failed for garage {client_garage.pk}: {str(e)}")
+        _set_progress(client_garage.pk, export_id, status='failed', format='zip', total=total, done=done, message=str(e))
+        raise
+    _set_progress(client_garage.pk, export_id, status='done', format='zip', total=total, done=done)
+
+
+class _ReceiptEnd(Flowable):
+    """Zero-size marker placed after each receipt of a merged document."""
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        pass
+
+
+def stream_merged_pdf(client_garage, bills, export_id):
+    """Yield one PDF holding every receipt, a new page per bill."""
+    total = bills.count()
+    progress = {'done': 0}
+    _set_progress(client_garage.pk, export_id, status='running', format='pdf', total=total, done=0)
+
+    def after_flowable(flowable):
+        if isinstance(flowable, _ReceiptEnd):
+            progress['done'] += 1
+            if progress['done'] % BATCH_SIZE == 0:
+                _set_progress(client_garage.pk, export_id, status='running', format='pdf', total=total, done=progress['done'])
+
+    try:
+        elements = []
+        for batch in _batches(bills):
+            for bill in batch:
+                if elements:
+                    elements.append(PageBreak())
+                elements.extend(receipt_flowables(build_receipt_context(bill, client_garage)))
+                elements.append(_ReceiptEnd())
+        buffer = io.BytesIO()
+        doc = new_receipt_document(buffer)
+        doc.afterFlowable = after_flowable
+        doc.build(elements)
+    except Exception as e:
+        logger.error(f"Receipt export {export_id} failed for garage {client_garage.pk}: {str(e)}")
+        _set_progress(client_garage.pk, export_id, status='failed', format='pdf', total=total, done=progress['done'], message=str(e))
+        raise
+    _set_progress(client_garage.pk, export_id, status='done', format='pdf', total=total, done=progress['done'])
+
+    buffer.seek(0)
+    while chunk := buffer.read(STREAM_CHUNK_SIZE):
+        yield chunk
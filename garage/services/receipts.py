@@ -0,0 +1,244 @@
+"""
+Bill receipt (PDF) rendering.
+
+Rendering is split in two steps:
+- ``build_receipt_context`` turns a bill into a plain dict of strings and
+  numbers. The dict is picklable, so it can also be rendered in a worker
+  process.
+- ``render_receipt`` lays that dict out with ReportLab. Styles are built
+  once at import time.
+
+``get_receipt_pdf`` adds a content-addressed disk cache under
+MEDIA_ROOT/receipts/<garage id>/. A file's name hashes the bill id, the
+updated_at of the bill, garage, customer, vehicle and service order, and
+the layout version. Any edit to what the receipt prints therefore produces
+a new file. Reprints of an unchanged bill are read from disk
+without running ReportLab.
+"""
+import glob
+import hashlib
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so cached receipts are re-rendered.
+LAYOUT_VERSION = 1
+
+HEADER_BG_COLOR = colors.HexColor('#F0F0F0')
+TABLE_HEADER_BG = colors.HexColor('#212529')
+TABLE_HEADER_TEXT = colors.white
+GRID_COLOR = colors.HexColor('#CCCCCC')
+
+HEADER_STYLE = ParagraphStyle(name='HeaderStyle', fontSize=18, fontName='Helvetica-Bold', alignment=1, spaceAfter=6, textColor=colors.HexColor('#333333'))
+SUBHEADER_STYLE = ParagraphStyle(name='SubheaderStyle', fontSize=10, fontName='Helvetica', alignment=1, spaceAfter=4, textColor=colors.HexColor('#666666'))
+DETAILS_LABEL_STYLE = ParagraphStyle(name='DetailsLabelStyle', fontSize=9, fontName='Helvetica-Bold', leading=11)
+DETAILS_VALUE_STYLE = ParagraphStyle(name='DetailsValueStyle', fontSize=9, fontName='Helvetica', leading=11)
+TABLE_HEADER_STYLE = ParagraphStyle(name='TableHeaderStyle', fontSize=9, fontName='Helvetica-Bold', leading=11, textColor=TABLE_HEADER_TEXT, alignment=1)
+FOOTER_STYLE = ParagraphStyle(name='FooterStyle', fontSize=8, fontName='Helvetica', alignment=1, spaceBefore=12, textColor=colors.HexColor('#666666'))
+NORMAL_STYLE = ParagraphStyle(name='Normal', fontSize=9, leading=11, fontName='Helvetica')
+TOTAL_STYLE = ParagraphStyle(name='TotalStyle', fontSize=11, fontName='Helvetica-Bold', leading=14, textColor=colors.HexColor('#000000'))
+
+DETAILS_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('BACKGROUND', (0, 0), (-1, -1), HEADER_BG_COLOR),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('BOX', (0, 0), (-1, -1), 0.5, GRID_COLOR)
+])
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), TABLE_HEADER_BG),
+    ('TEXTCOLOR', (0, 0), (-1, 0), TABLE_HEADER_TEXT),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('BOX', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+])
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('LINEBELOW', (0, -2), (-1, -2), 1, colors.black),
+    ('LEFTPADDING', (0, 0), (-1, -1), 0),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+])
+
+ITEMS_HEADER_ROW = [
+    Paragraph("<b>Item Description</b>", TABLE_HEADER_STYLE),
+    Paragraph("<b>Qty</b>", TABLE_HEADER_STYLE),
+    Paragraph("<b>Price</b>", TABLE_HEADER_STYLE),
+    Paragraph("<b>Total</b>", TABLE_HEADER_STYLE)
+]
+
+
+def receipt_bill_queryset():
+    """Bills with the relations a receipt prints (lines are loaded on render)."""
+    from garage.models import Bill
+    return Bill.objects.select_related('customer', 'vehicle', 'service_order')
+
+
+def build_receipt_context(bill, client_garage):
+    """Everything the receipt prints, as plain picklable values."""
+    prefetch_related_objects([bill], 'bill_items')
+    lines = [(bi.name, bi.quantity, bi.price) for bi in bill.bill_items.all()]
+    subtotal = sum(price * quantity for _, quantity, price in lines)
+    discount_amount = bill.discount_value if bill.discount_type == 'amount' else (subtotal * bill.discount_value / 100)
+    return {
+        'garage_name': client_garage.name,
+        'garage_address': client_garage.address or 'Kathmandu, Nepal',
+        'garage_contact': client_garage.contact or '',
+        'garage_email': client_garage.email or '',
+        'bill_no': bill.bill_no,
+        'date': bill.created_at.strftime('%Y-%m-%d'),
+        'customer_name': bill.customer.name if bill.customer else 'Anonymous',
+        'customer_phone': bill.customer.phone if bill.customer and bill.customer.phone else '',
+        'vehicle_number': bill.vehicle.vehicle_number if bill.vehicle and bill.vehicle.vehicle_number else '',
+        'order_no': bill.service_order.order_no if bill.service_order else '',
+        'lines': [(name, quantity, float(price), float(price * quantity)) for name, quantity, price in lines],
+        'subtotal': float(subtotal),
+        'discount_label': 'amount' if bill.discount_type == 'amount' else str(bill.discount_value) + '%',
+        'discount_amount': float(discount_amount),
+        'tax': float(bill.tax),
+        'credit_amount': float(bill.credit_amount),
+        'total': float(bill.total),
+        'payment_mode': bill.payment_mode.upper(),
+    }
+
+
+def receipt_flowables(ctx):
+    """The ReportLab flowables for one receipt."""
+    elements = []
+
+    # Header: Garage details with a clean, centered look
+    elements.append(Paragraph(ctx['garage_name'], HEADER_STYLE))
+    elements.append(Paragraph(ctx['garage_address'], SUBHEADER_STYLE))
+    if ctx['garage_contact']:
+        elements.append(Paragraph(f"Contact: {ctx['garage_contact']}", SUBHEADER_STYLE))
+    if ctx['garage_email']:
+        elements.append(Paragraph(f"Email: {ctx['garage_email']}", SUBHEADER_STYLE))
+    elements.append(Spacer(1, 0.2 * inch))
+
+    details_table = Table([
+        [Paragraph(f"<b>Bill No:</b> {ctx['bill_no']}", NORMAL_STYLE), Paragraph(f"<b>Date:</b> {ctx['date']}", NORMAL_STYLE)],
+        [Paragraph(f"<b>Customer:</b> {ctx['customer_name']}", NORMAL_STYLE), Paragraph(f"<b>Phone:</b> {ctx['customer_phone']}", NORMAL_STYLE)],
+        [Paragraph(f"<b>Vehicle:</b> {ctx['vehicle_number']}", NORMAL_STYLE), Paragraph(f"<b>Order No:</b> {ctx['order_no']}", NORMAL_STYLE)]
+    ], colWidths=[3.25*inch, 3.25*inch])
+    details_table.setStyle(DETAILS_TABLE_STYLE)
+    elements.append(details_table)
+    elements.append(Spacer(1, 0.2 * inch))
+
+    data = [ITEMS_HEADER_ROW]
+    for name, quantity, price, line_total in ctx['lines']:
+        data.append([
+            Paragraph(name, NORMAL_STYLE),
+            Paragraph(str(quantity), NORMAL_STYLE),
+            Paragraph(f"NPR {price:.2f}", NORMAL_STYLE),
+            Paragraph(f"NPR {line_total:.2f}", NORMAL_STYLE)
+        ])
+    items_table = Table(data, colWidths=[3.5*inch, 0.8*inch, 1.2*inch, 1.2*inch])
+    items_table.setStyle(ITEMS_TABLE_STYLE)
+    elements.append(items_table)
+    elements.append(Spacer(1, 0.2 * inch))
+
+    summary_table = Table([
+        [Paragraph("<b>Subtotal:</b>", DETAILS_LABEL_STYLE), Paragraph(f"NPR {ctx['subtotal']:.2f}", DETAILS_VALUE_STYLE)],
+        [Paragraph(f"<b>Discount ({ctx['discount_label']}):</b>", DETAILS_LABEL_STYLE), Paragraph(f"NPR {ctx['discount_amount']:.2f}", DETAILS_VALUE_STYLE)],
+        [Paragraph("<b>VAT (13%):</b>", DETAILS_LABEL_STYLE), Paragraph(f"NPR {ctx['tax']:.2f}", DETAILS_VALUE_STYLE)],
+        [Paragraph("<b>Credit:</b>", DETAILS_LABEL_STYLE), Paragraph(f"NPR {ctx['credit_amount']:.2f}", DETAILS_VALUE_STYLE) if ctx['credit_amount'] > 0 else ''],
+        [Paragraph("<b>Total:</b>", TOTAL_STYLE), Paragraph(f"NPR {ctx['total']:.2f}", TOTAL_STYLE)],
+        [Paragraph("<b>Payment Mode:</b>", DETAILS_LABEL_STYLE), Paragraph(ctx['payment_mode'], DETAILS_VALUE_STYLE)]
+    ], colWidths=[3.25*inch, 3.25*inch])
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+    elements.append(summary_table)
+
+    # Footer
+    elements.append(Spacer(1, 0.5 * inch))
+    elements.append(Paragraph("Thank you for your business!", FOOTER_STYLE))
+    elements.append(Paragraph("This is a computer-generated invoice and does not require a signature.", FOOTER_STYLE))
+    return elements
+
+
+def new_receipt_document(buffer):
+    return SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
+
+
+def render_receipt(ctx):
+    """Render one receipt context to PDF bytes."""
+    buffer = io.BytesIO()
+    new_receipt_document(buffer).build(receipt_flowables(ctx))
+    return buffer.getvalue()
+
+
+def _receipt_dir(garage_id):
+    return os.path.join(settings.MEDIA_ROOT, 'receipts', str(garage_id))
+
+
+def _updated(obj):
+    return obj.updated_at.isoformat() if obj is not None else '-'
+
+
+def receipt_cache_path(bill, client_garage):
+    # Every row the receipt prints from is part of the key.
+    stamp = '|'.join([
+        str(bill.pk), _updated(bill), _updated(client_garage), _updated(bill.customer),
+        _updated(bill.vehicle), _updated(bill.service_order), str(LAYOUT_VERSION)
+    ])
+    digest = hashlib.sha256(stamp.encode()).hexdigest()
+    return os.path.join(_receipt_dir(client_garage.pk), f"{bill.pk}-{digest}.pdf")
+
+
+def discard_receipts(bill):
+    """Remove every cached receipt file of ``bill``."""
+    for path in glob.glob(os.path.join(_receipt_dir(bill.client_garage_id), f"{bill.pk}-*.pdf")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def store_receipt(path, pdf, bill):
+    """Write a rendered receipt to the cache, replacing older versions of the bill."""
+    try:
+        discard_receipts(bill)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            fh.write(pdf)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not cache receipt for bill {bill.pk}: {str(e)}")
+
+
+def get_receipt_pdf(bill, client_garage):
+    """PDF bytes for ``bill``, from the disk cache when the bill is unchanged."""
+    path = receipt_cache_path(bill, client_garage)
+    try:
+        with open(path, 'rb') as fh:
+            return fh.read()
+    except OSError:
+        pass
+    pdf = render_receipt(build_receipt_context(bill, client_garage))
+    store_receipt(path, pdf, bill)
+    return pdf
@@ -0,0 +1,305 @@
+"""
+In-memory reception lookup index.
+
+Each garage gets one index of its vehicles and customers, holding
+normalized keys:
+- plates are uppercased with spaces and dashes removed ("ba-1 pa 22" ->
+  "BA1PA22");
+- phones are reduced to their digits;
+- names are lowercased.
+
+Every key is kept in a sorted list for prefix lookup (bisect) and in
+trigram postings for substring lookup. A substring query only checks the
+rows posted under its rarest trigram. One- and two-character queries have
+no trigram, so they scan the in-memory keys instead; the table is never
+scanned.
+
+Like the POS catalog index, it stays current through ``updated_at``
+stamps. A sync runs one MAX/COUNT probe per table every
+RECEPTION_INDEX_SYNC_INTERVAL seconds (default 2) and loads only the rows
+that changed. Vehicle and customer writes in this process force the next
+probe (see garage/signals.py).
+"""
+import bisect
+import itertools
+import logging
+import re
+import threading
+import time
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from garage.models import Customer, Vehicle
+
+logger = logging.getLogger(__name__)
+
+GRAM = 3
+SYNC_OVERLAP_SECONDS = 5
+
+_PLATE_NOISE = re.compile(r'[\s\-]+')
+_NON_DIGITS = re.compile(r'\D+')
+
+
+def plate_key(value):
+    return _PLATE_NOISE.sub('', value or '').upper()
+
+
+def phone_key(value):
+    return _NON_DIGITS.sub('', value or '')
+
+
+def name_key(value):
+    return ' '.join((value or '').lower().split())
+
+
+def _stamp(dt):
+    return dt.timestamp() if dt else 0.0
+
+
+def _grams(key):
+    return {key[i:i + GRAM] for i in range(len(key) - GRAM + 1)}
+
+
+class KeyIndex:
+    """Sorted keys for prefix lookup plus trigram postings for substring lookup."""
+
+    def __init__(self):
+        self.keys = {}
+        self._sorted = []
+        self._postings = {}
+
+    def _post(self, row_id, key):
+        for gram in _grams(key):
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('q')
+            postings.append(row_id)
+
+    def load(self, pairs):
+        """Initial bulk load of ``(row_id, key)`` pairs."""
+        for row_id, key in pairs:
+            self.keys[row_id] = key
+            if key:
+                self._sorted.append((key, row_id))
+                self._post(row_id, key)
+        self._sorted.sort()
+
+    def set(self, row_id, key):
+        old = self.keys.get(row_id)
+        if old == key:
+            return
+        if old:
+            i = bisect.bisect_left(self._sorted, (old, row_id))
+            if i < len(self._sorted) and self._sorted[i] == (old, row_id):
+                del self._sorted[i]
+        # Postings of the old key are left behind; lookups re-check the
+        # current key, and a rebuild drops them.
+        self.keys[row_id] = key
+        if key:
+            bisect.insort(self._sorted, (key, row_id))
+            self._post(row_id, key)
+
+    def prefix(self, query, limit):
+        rows = []
+        i = bisect.bisect_left(self._sorted, (query, -1))
+        while i < len(self._sorted) and len(rows) < limit:
+            key, row_id = self._sorted[i]
+            if not key.startswith(query):
+                break
+            rows.append(row_id)
+            i += 1
+        return rows
+
+    def contains(self, query, limit, exclude=()):
+        if len(query) < GRAM:
+            # Too short for a trigram; scan the keys, stopping at ``limit``.
+            matches = []
+            for row_id, key in self.keys.items():
+                if key and query in key and row_id not in exclude:
+                    matches.append(row_id)
+                    if len(matches) == limit:
+                        break
+            return sorted(matches)
+        shortest = None
+        for gram in _grams(query):
+            found = self._postings.get(gram)
+            if found is None:
+                return []
+            if shortest is None or len(found) < len(shortest):
+                shortest = found
+        # Every match is in the rarest gram's postings; checking those
+        # candidates directly is cheaper than intersecting the other lists.
+        keys = self.keys
+        matches, seen = [], set(exclude)
+        for row_id in shortest:
+            if row_id not in seen and query in (keys.get(row_id) or ''):
+                matches.append(row_id)
+                if len(matches) == limit:
+                    break
+            seen.add(row_id)
+        return sorted(matches)
+
+    def search(self, query, limit):
+        """Prefix matches in key order, then other substring matches in id order."""
+        rows = self.prefix(query, limit)
+        if len(rows) < limit:
+            rows += self.contains(query, limit - len(rows), exclude=set(rows))
+        return rows
+
+
+class ReceptionIndex:
+    def __init__(self, garage_id):
+        self.garage_id = garage_id
+        self._lock = threading.Lock()
+        self._last_probe = 0.0
+        self._built = False
+        self._reset()
+
+    def _reset(self):
+        self._vehicles = {}
+        self._customers = {}
+        self._plates = KeyIndex()
+        self._phones = KeyIndex()
+        self._names = KeyIndex()
+        self._vehicle_stamp = 0.0
+        self._customer_stamp = 0.0
+
+    # --- loading -------------------------------------------------------
+
+    def _vehicle_rows(self, since=None):
+        vehicles = Vehicle.objects.filter(client_garage_id=self.garage_id)
+        if since:
+            vehicles = vehicles.filter(updated_at__gte=since)
+        return vehicles.values_list('id', 'vehicle_number', 'company_id', 'model_id', 'type_id', 'customer_id', 'updated_at')
+
+    def _customer_rows(self, since=None):
+        customers = Customer.objects.filter(client_garage_id=self.garage_id)
+        if since:
+            customers = customers.filter(updated_at__gte=since)
+        return customers.values_list('id', 'name', 'phone', 'updated_at')
+
+    def _load_vehicles(self, since=None):
+        changed = []
+        for row_id, number, company_id, model_id, type_id, customer_id, updated_at in self._vehicle_rows(since).iterator(chunk_size=5000):
+            self._vehicles[row_id] = (number, company_id, model_id, type_id, customer_id)
+            changed.append((row_id, plate_key(number)))
+            self._vehicle_stamp = max(self._vehicle_stamp, _stamp(updated_at))
+        if since is None:
+            self._plates.load(changed)
+        else:
+            for row_id, key in changed:
+                self._plates.set(row_id, key)
+
+    def _load_customers(self, since=None):
+        phones, names = [], []
+        for row_id, name, phone, updated_at in self._customer_rows(since).iterator(chunk_size=5000):
+            self._customers[row_id] = (name, phone)
+            phones.append((row_id, phone_key(phone)))
+            names.append((row_id, name_key(name)))
+            self._customer_stamp = max(self._customer_stamp, _stamp(updated_at))
+        if since is None:
+            self._phones.load(phones)
+            self._names.load(names)
+        else:
+            for row_id, key in phones:
+                self._phones.set(row_id, key)
+            for row_id, key in names:
+                self._names.set(row_id, key)
+
+    def _rebuild(self):
+        self._reset()
+        self._load_vehicles()
+        self._load_customers()
+        self._built = True
+        logger.info(f"Built reception index for garage {self.garage_id}: {len(self._vehicles)} vehicles, {len(self._customers)} customers")
+
+    def _since(self, stamp):
+        return datetime.fromtimestamp(max(stamp - SYNC_OVERLAP_SECONDS, 0), tz=dt_timezone.utc)
+
+    def sync(self, force=False):
+        """Bring the index up to date with the database."""
+        interval = getattr(settings, 'RECEPTION_INDEX_SYNC_INTERVAL', 2)
+        now = time.monotonic()
+        with self._lock:
+            if self._built and not force and now - self._last_probe < interval:
+                return
+            self._last_probe = now
+            if not self._built:
+                self._rebuild()
+                return
+
+            vehicle_state = Vehicle.objects.filter(client_garage_id=self.garage_id).aggregate(stamp=Max('updated_at'), count=Count('id'))
+            customer_state = Customer.objects.filter(client_garage_id=self.garage_id).aggregate(stamp=Max('updated_at'), count=Count('id'))
+
+            if _stamp(vehicle_state['stamp']) > self._vehicle_stamp or vehicle_state['count'] != len(self._vehicles):
+                self._load_vehicles(self._since(self._vehicle_stamp))
+            if _stamp(customer_state['stamp']) > self._customer_stamp or customer_state['count'] != len(self._customers):
+                self._load_customers(self._since(self._customer_stamp))
+
+            # A count that still disagrees after the delta means rows were
+            # deleted; updated_at cannot tell us which, so start over.
+            if vehicle_state['count'] != len(self._vehicles) or customer_state['count'] != len(self._customers):
+                self._rebuild()
+
+    # --- searching -----------------------------------------------------
+
+    def _first_ids(self, rows, limit):
+        return list(itertools.islice(rows, limit))
+
+    def search_vehicles(self, query, limit=10):
+        """Vehicles whose plate starts with or contains ``query``, as search_vehicle rows."""
+        key = plate_key(query)
+        with self._lock:
+            ids = self._plates.search(key, limit) if key else self._first_ids(self._vehicles, limit)
+            results = []
+            for row_id in ids:
+                number, company_id, model_id, type_id, customer_id = self._vehicles[row_id]
+                customer = self._customers.get(customer_id) if customer_id else None
+                results.append({
+                    'id': row_id,
+                    'vehicleNumber': number,
+                    'company': company_id,
+                    'model': model_id,
+                    'type': type_id,
+                    'customerId': customer_id if customer else None,
+                    'customerName': customer[0] if customer else 'Anonymous',
+                    'phone': (customer[1] or '') if customer else ''
+                })
+            return results
+
+    def search_customers(self, query, limit=10):
+        """Ids of customers matching ``query`` by phone digits or by name."""
+        digits = phone_key(query)
+        name = name_key(query)
+        with self._lock:
+            if not name:
+                return self._first_ids(self._customers, limit)
+            if digits and len(digits) >= len(re.sub(r'[\s\-+()]', '', query)):
+                return self._phones.search(digits, limit)
+            return self._names.search(name, limit)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_reception_index(client_garage):
+    """Return the synced reception index for ``client_garage`` (instance or id)."""
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    with _indexes_lock:
+        index = _indexes.get(garage_id)
+        if index is None:
+            index = _indexes[garage_id] = ReceptionIndex(garage_id)
+    index.sync()
+    return index
+
+
+def invalidate_reception_index(client_garage):
+    """Force the next access to re-probe the database."""
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    index = _indexes.get(garage_id)
+    if index is not None:
+        index._last_probe = 0.0
@@ -0,0 +1,123 @@
+"""
+Daily sales rollup.
+
+DailySalesRollup keeps one row per garage, day and payment mode with the
+bill count and money totals of the counted bills (Completed and Credit).
+Bill writes apply the difference between a bill's old and new contribution
+with F() increments inside the bill's transaction. Summaries and reports
+then read a few rows per day instead of grouping the whole bill history.
+``rebuild`` recomputes the rows from the bills (see the
+rebuild_sales_rollup management command).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from garage.models import Bill, DailySalesRollup
+
+COUNTED_STATUSES = ('Completed', 'Credit')
+AMOUNTS = ('gross', 'discount', 'tax', 'credit', 'total')
+STATE_FIELDS = ('client_garage_id', 'status', 'total', 'tax', 'discount_type', 'discount_value', 'credit_amount', 'payment_mode', 'created_at')
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+
+def bill_state(bill_id, lock=True):
+    """The stored fields of a bill that feed the rollup, or None."""
+    bills = Bill.objects.filter(pk=bill_id)
+    if lock:
+        bills = bills.select_for_update()
+    return bills.values(*STATE_FIELDS).first()
+
+
+def state_of(bill):
+    return {field: getattr(bill, field) for field in STATE_FIELDS}
+
+
+def contribution(state):
+    """``((date, payment_mode), amounts)`` a bill adds to the rollup, or None."""
+    if not state or state['status'] not in COUNTED_STATUSES or not state['created_at']:
+        return None
+    total = Decimal(str(state['total'] or 0))
+    tax = Decimal(str(state['tax'] or 0))
+    value = Decimal(str(state['discount_value'] or 0))
+    # Bills store total = subtotal - discount + tax; recover the subtotal.
+    if state['discount_type'] == 'percentage':
+        gross = (total - tax) * 100 / (100 - value) if value < 100 else total - tax
+        discount = gross * value / 100
+    else:
+        gross = total - tax + value
+        discount = value
+    amounts = {
+        'gross': gross.quantize(CENT),
+        'discount': discount.quantize(CENT),
+        'tax': tax.quantize(CENT),
+        'credit': Decimal(str(state['credit_amount'] or 0)).quantize(CENT),
+        'total': total.quantize(CENT),
+    }
+    key = (timezone.localdate(state['created_at']), state['payment_mode'] or 'cash')
+    return key, amounts
+
+
+def _add(garage_id, key, amounts, count):
+    day, payment_mode = key
+    lookup = dict(client_garage_id=garage_id, date=day, payment_mode=payment_mode)
+    increments = dict(bill_count=F('bill_count') + count, **{name: F(name) + amounts[name] for name in AMOUNTS})
+    # UPDATE first: it sees rows other transactions committed, where a
+    # REPEATABLE READ get() after a failed insert would not.
+    if DailySalesRollup.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.create(bill_count=count, **amounts, **lookup)
+    except IntegrityError:
+        DailySalesRollup.objects.filter(**lookup).update(**increments)
+
+
+def record_change(before, after):
+    """
+    Move a bill's contribution from its ``before`` to its ``after`` state.
+
+    Either state may be None (new or deleted bill). Call inside the
+    transaction that writes the bill.
+    """
+    old = contribution(before)
+    new = contribution(after)
+    if old and new and old[0] == new[0] and before['client_garage_id'] == after['client_garage_id']:
+        delta = {name: new[1][name] - old[1][name] for name in AMOUNTS}
+        if any(delta.values()):
+            _add(after['client_garage_id'], new[0], delta, 0)
+        return
+    if old:
+        _add(before['client_garage_id'], old[0], {name: -old[1][name] for name in AMOUNTS}, -1)
+    if new:
+        _add(after['client_garage_id'], new[0], new[1], 1)
+
+
+def rebuild(client_garage=None):
+    """Recompute the rollup rows from the bills; returns the number of rows written."""
+    bills = Bill.objects.filter(status__in=COUNTED_STATUSES)
+    rollups = DailySalesRollup.objects.all()
+    if client_garage is not None:
+        bills = bills.filter(client_garage=client_garage)
+        rollups = rollups.filter(client_garage=client_garage)
+
+    totals = defaultdict(lambda: dict({name: ZERO for name in AMOUNTS}, bill_count=0))
+    for state in bills.values(*STATE_FIELDS).iterator(chunk_size=2000):
+        key, amounts = contribution(state)
+        row = totals[(state['client_garage_id'],) + key]
+        row['bill_count'] += 1
+        for name in AMOUNTS:
+            row[name] += amounts[name]
+
+    with transaction.atomic():
+        rollups.delete()
+        DailySalesRollup.objects.bulk_create([
+            DailySalesRollup(client_garage_id=garage_id, date=day, payment_mode=payment_mode, **values)
+            for (garage_id, day, payment_mode), values in totals.items()
+        ], batch_size=1000)
+    return len(totals)
@@ -0,0 +1,95 @@
+"""
+Per-garage, per-fiscal-year document numbers for bills, service orders and
+purchase orders.
+
+Numbers come from a DocumentSequence counter row. Each worker reserves a
+block of values with one locked UPDATE and hands them out from memory, so
+concurrent cashiers never race on ``ORDER BY id DESC`` and the counter row
+is only locked once per block. Unused values in a block are skipped when the
+process exits; numbers are unique and increasing, not gap-free.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from garage.models import ClientGarage, DocumentSequence
+
+logger = logging.getLogger(__name__)
+
+BILL = 'bill'
+SERVICE_ORDER = 'service_order'
+PURCHASE_ORDER = 'purchase_order'
+
+PREFIXES = {
+    BILL: 'B',
+    SERVICE_ORDER: 'ORD',
+    PURCHASE_ORDER: 'PO',
+}
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def _counter(garage_id, fiscal_year_id, doc_type):
+    lookup = dict(client_garage_id=garage_id, client_fiscal_year_id=fiscal_year_id, doc_type=doc_type)
+    sequence = DocumentSequence.objects.select_for_update().filter(**lookup).first()
+    if sequence is not None:
+        return sequence
+    # First number for this scope. Lock the garage row so two workers cannot
+    # both create the counter (the unique constraint does not cover a NULL
+    # fiscal year on MySQL).
+    ClientGarage.objects.select_for_update().filter(pk=garage_id).first()
+    sequence = DocumentSequence.objects.select_for_update().filter(**lookup).first()
+    if sequence is None:
+        try:
+            with transaction.atomic():
+                sequence = DocumentSequence.objects.create(**lookup)
+        except IntegrityError:
+            sequence = DocumentSequence.objects.select_for_update().get(**lookup)
+    return sequence
+
+
+def _reserve(garage_id, fiscal_year_id, doc_type, size):
+    """Claim ``size`` values from the counter; returns the first one."""
+    with transaction.atomic():
+        sequence = _counter(garage_id, fiscal_year_id, doc_type)
+        DocumentSequence.objects.filter(pk=sequence.pk).update(next_value=F('next_value') + size)
+    return sequence.next_value
+
+
+def format_number(doc_type, garage_id, fiscal_year_id, value):
+    scope = f"{garage_id}-{fiscal_year_id}" if fiscal_year_id else f"{garage_id}"
+    return f"{PREFIXES[doc_type]}{scope}-{str(value).zfill(4)}"
+
+
+def next_number(doc_type, client_garage, client_fiscal_year=None):
+    """
+    Return the next document number for ``client_garage``, e.g. ``B3-7-0042``.
+
+    Inside an open transaction only one value is reserved and nothing is
+    cached: the reservation rolls back together with the document, and a
+    cached block would then be handed out a second time by another worker.
+    Allocate numbers before entering ``transaction.atomic()`` to get the
+    block path.
+    """
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    fiscal_year_id = getattr(client_fiscal_year, 'pk', client_fiscal_year)
+
+    if connection.in_atomic_block:
+        value = _reserve(garage_id, fiscal_year_id, doc_type, 1)
+        return format_number(doc_type, garage_id, fiscal_year_id, value)
+
+    key = (garage_id, fiscal_year_id, doc_type)
+    with _blocks_lock:
+        block = _blocks.get(key)
+        if block is None or block[0] >= block[1]:
+            size = max(int(getattr(settings, 'DOCUMENT_SEQUENCE_BLOCK_SIZE', 10)), 1)
+            start = _reserve(garage_id, fiscal_year_id, doc_type, size)
+            block = _blocks[key] = [start, start + size]
+            logger.info(f"Reserved {doc_type} numbers {start}-{start + size - 1} for garage {garage_id}")
+        value = block[0]
+        block[0] += 1
+    return format_number(doc_type, garage_id, fiscal_year_id, value)
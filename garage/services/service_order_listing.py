@@ -0,0 +1,75 @@
+"""
+Service-order listing queries and serializer shared by get_service_orders
+and get_service_order.
+
+``service_order_queryset`` joins the vehicle with its company, model and
+type plus the customer. It prefetches the service items (with their
+service types) and the mechanic ids, and annotates the order's first bill
+id, so a page of orders costs the same four queries whatever its size.
+"""
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+
+from garage.models import Bill, ServiceOrder, ServiceOrderItem, User
+
+DEFAULT_PER_PAGE = 5
+MAX_PER_PAGE = 50
+
+# Keyset order matching the list's created_date sort, newest first.
+ORDER_KEYS = [('created_date', True), ('id', True)]
+
+
+def service_order_queryset(client_garage):
+    first_bill = Bill.objects.filter(service_order=OuterRef('pk')).order_by('pk').values('pk')[:1]
+    return ServiceOrder.objects.filter(client_garage=client_garage).select_related(
+        'vehicle__company', 'vehicle__model', 'vehicle__type', 'customer'
+    ).prefetch_related(
+        Prefetch('service_items', queryset=ServiceOrderItem.objects.select_related('service_type').order_by('id')),
+        Prefetch('mechanics', queryset=User.objects.only('id').order_by('id')),
+    ).annotate(bill_id=Subquery(first_bill))
+
+
+def filter_service_orders(orders, status_filter='all', search_query=''):
+    if status_filter != 'all':
+        orders = orders.filter(status__in=status_filter.split(','))
+    if search_query:
+        orders = orders.filter(
+            Q(vehicle__vehicle_number__icontains=search_query) |
+            Q(customer__name__icontains=search_query)
+        )
+    return orders
+
+
+def service_order_as_dict(order):
+    """Serialize an order from ``service_order_queryset`` without further queries."""
+    vehicle = order.vehicle
+    customer = order.customer
+    return {
+        'id': order.id,
+        'orderNo': order.order_no,
+        'vehicleNumber': vehicle.vehicle_number,
+        'customerId': customer.id if customer else None,
+        'customerName': customer.name if customer else 'Anonymous',
+        'phone': customer.phone if customer else '',
+        'company': vehicle.company.id if vehicle.company else None,
+        'companyName': vehicle.company.name if vehicle.company else '',
+        'model': vehicle.model.name if vehicle.model else '',
+        'modelId': vehicle.model.id if vehicle.model else None,
+        'type': vehicle.type.name if vehicle.type else '',
+        'vehicleTypeId': vehicle.type.id if vehicle.type else None,
+        'complaint': order.complaint,
+        'serviceType': [
+            {'name': item.service_type.name, 'price': float(item.price)}
+            for item in order.service_items.all()
+        ],
+        'mechanics': [mechanic.id for mechanic in order.mechanics.all()],
+        'status': order.status,
+        'priority': order.priority,
+        'entryTime': order.entry_time.strftime('%I:%M %p'),
+        'estimatedCompletion': order.estimated_completion.strftime('%I:%M %p'),
+        'createdDate': order.created_date.strftime('%Y-%m-%d'),
+        'progress': order.progress,
+        'totalSoFar': float(order.total_so_far),
+        'helmetGiven': order.helmet_given,
+        'keyGiven': order.key_given,
+        'billId': order.bill_id,
+    }
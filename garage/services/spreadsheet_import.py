@@ -0,0 +1,179 @@
+"""
+Spreadsheet import of the vehicle masters (companies, types, models).
+
+The workbook is opened in openpyxl's read_only mode and its rows are
+streamed, never loaded into memory as a whole. Company and type names are
+resolved from dicts loaded once per import. Names that already exist (or
+that appear earlier in the same file) are skipped. New rows are written
+with bulk_create in chunks of IMPORT_CHUNK_SIZE inside one transaction.
+Every row that was not imported is listed in the report with its sheet
+row number and the reason.
+"""
+import csv
+import io
+import zipfile
+
+import openpyxl
+from django.db import transaction
+from openpyxl.utils.exceptions import InvalidFileException
+
+from garage.models import VehicleCompany, VehicleModel, VehicleType
+from garage.services import vehicle_masters
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFileError(ValueError):
+    """The uploaded file is not a readable workbook."""
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _key(name):
+    return name.casefold()
+
+
+def read_rows(file):
+    """Yield ``(row_number, values)`` for every non-empty data row of the active sheet."""
+    try:
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError) as e:
+        raise ImportFileError(f"Could not read the workbook: {str(e)}")
+    try:
+        for row_number, values in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+            if any(_text(value) for value in values):
+                yield row_number, values
+    finally:
+        wb.close()
+
+
+def read_csv_rows(file):
+    """Like ``read_rows`` for a UTF-8 CSV file (the first row is the header)."""
+    text = io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', newline='')
+    try:
+        for row_number, values in enumerate(csv.reader(text), start=1):
+            if row_number > 1 and any(_text(value) for value in values):
+                yield row_number, values
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f"Could not read the CSV file: {str(e)}")
+    finally:
+        text.detach()
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors = []
+
+    def reject(self, row_number, message, duplicate=False):
+        if duplicate:
+            self.skipped += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'message': message})
+
+    def as_dict(self):
+        return {
+            'status': 'success',
+            'created': self.created,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.skipped + self.failed > len(self.errors),
+        }
+
+
+def _import(model, client_garage, file, build, report):
+    """Stream rows through ``build`` and bulk-create the objects it returns."""
+    name_length = model._meta.get_field('name').max_length
+    pending = []
+    with transaction.atomic():
+        for row_number, values in read_rows(file):
+            name = _text(values[0]) if values else ''
+            if not name:
+                report.reject(row_number, 'Name is required')
+                continue
+            if len(name) > name_length:
+                report.reject(row_number, f"Name is longer than {name_length} characters")
+                continue
+            obj = build(row_number, name, values)
+            if obj is None:
+                continue
+            pending.append(obj)
+            if len(pending) >= IMPORT_CHUNK_SIZE:
+                model.objects.bulk_create(pending)
+                report.created += len(pending)
+                pending = []
+        if pending:
+            model.objects.bulk_create(pending)
+            report.created += len(pending)
+    if report.created:
+        # bulk_create sends no post_save; expire the reference bundle here.
+        vehicle_masters.bump_version(client_garage.pk)
+    return report.as_dict()
+
+
+def _import_named(model, client_garage, file):
+    report = ImportReport()
+    seen = {_key(name) for name in model.objects.filter(client_garage=client_garage).values_list('name', flat=True)}
+
+    def build(row_number, name, values):
+        if _key(name) in seen:
+            report.reject(row_number, f"'{name}' already exists", duplicate=True)
+            return None
+        seen.add(_key(name))
+        return model(client_garage=client_garage, name=name, description=_text(values[1]) if len(values) > 1 else '')
+
+    return _import(model, client_garage, file, build, report)
+
+
+def import_companies(client_garage, file):
+    """Rows: Name, Description."""
+    return _import_named(VehicleCompany, client_garage, file)
+
+
+def import_vehicle_types(client_garage, file):
+    """Rows: Name, Description."""
+    return _import_named(VehicleType, client_garage, file)
+
+
+def import_models(client_garage, file):
+    """Rows: Name, Company, Vehicle Type, Description. Names are unique per company."""
+    report = ImportReport()
+    companies = {_key(name): pk for pk, name in VehicleCompany.objects.filter(client_garage=client_garage).values_list('id', 'name')}
+    vehicle_types = {_key(name): pk for pk, name in VehicleType.objects.filter(client_garage=client_garage).values_list('id', 'name')}
+    seen = {
+        (company_id, _key(name))
+        for company_id, name in VehicleModel.objects.filter(client_garage=client_garage).values_list('company_id', 'name')
+    }
+
+    def build(row_number, name, values):
+        company_name = _text(values[1]) if len(values) > 1 else ''
+        type_name = _text(values[2]) if len(values) > 2 else ''
+        company_id = companies.get(_key(company_name))
+        if company_id is None:
+            report.reject(row_number, f"Unknown company '{company_name}'")
+            return None
+        vehicle_type_id = vehicle_types.get(_key(type_name))
+        if vehicle_type_id is None:
+            report.reject(row_number, f"Unknown vehicle type '{type_name}'")
+            return None
+        if (company_id, _key(name)) in seen:
+            report.reject(row_number, f"'{name}' already exists for {company_name}", duplicate=True)
+            return None
+        seen.add((company_id, _key(name)))
+        return VehicleModel(
+            client_garage=client_garage,
+            name=name,
+            company_id=company_id,
+            vehicle_type_id=vehicle_type_id,
+            description=_text(values[3]) if len(values) > 3 else ''
+        )
+
+    return _import(VehicleModel, client_garage, file, build, report)
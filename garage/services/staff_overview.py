@@ -0,0 +1,59 @@
+"""
+Staff list with per-person order and attendance figures.
+
+Order counts (overall and completed today) are conditional Counts over the
+one service_orders join. Today's attendance status is a Subquery, and the
+in-progress order numbers come from a single Prefetch. A staff page
+therefore costs two queries whatever the head count, and the summary stats
+are computed from the same rows.
+"""
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+
+from garage.models import ServiceOrder, StaffAttendance, User
+
+STAFF_ROLES = ['staff', 'manager', 'cashier', 'mechanic']
+
+
+def staff_overview(client_garage, today, search_term=''):
+    staff = User.objects.filter(
+        client_garage=client_garage,
+        role__in=STAFF_ROLES
+    )
+    if search_term:
+        staff = staff.filter(
+            Q(username__icontains=search_term) |
+            Q(email__icontains=search_term) |
+            Q(role__icontains=search_term) |
+            Q(specialization__icontains=search_term)
+        )
+    return staff.annotate(
+        completed_orders=Count('service_orders', filter=Q(service_orders__status='completed')),
+        in_progress_orders=Count('service_orders', filter=Q(service_orders__status='in-progress')),
+        completed_today=Count('service_orders', filter=Q(service_orders__status='completed', service_orders__created_date=today)),
+        today_attendance=Subquery(
+            StaffAttendance.objects.filter(user=OuterRef('pk'), date=today).values('status')[:1]
+        ),
+    ).prefetch_related(
+        Prefetch(
+            'service_orders',
+            queryset=ServiceOrder.objects.filter(status='in-progress').only('id', 'order_no'),
+            to_attr='current_in_progress'
+        )
+    )
+
+
+def _low_performance(user):
+    completed, in_progress = user.completed_orders, user.in_progress_orders
+    return float(user.average_rating or 0.0) < 4.3 or (completed + in_progress > 0 and completed / (completed + in_progress) < 0.5)
+
+
+def staff_stats(users):
+    """Summary figures for the staff page, from the rows of ``staff_overview``."""
+    ratings = [user.average_rating for user in users if user.average_rating is not None]
+    return {
+        'active_staff': sum(1 for user in users if user.current_status == 'active'),
+        'in_progress': sum(user.in_progress_orders for user in users),
+        'completed_today': sum(user.completed_today for user in users),
+        'avg_rating': float(sum(ratings) / len(ratings)) if ratings else 0.0,
+        'low_performance': [user.username for user in users if _low_performance(user)],
+    }
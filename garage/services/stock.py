@@ -0,0 +1,160 @@
+"""
+Stock ledger.
+
+Every change to ``Part.in_stock`` goes through ``apply_movements``.
+- It moves the balances of any number of parts with one conditional
+  UPDATE of F() expressions, so concurrent sales cannot overwrite each
+  other.
+- It re-derives each part's low-stock / out-of-stock status against
+  min_stock, and refreshes the garage's LowStockAlert set for the parts
+  it touched (see garage.services.stock_alerts).
+- It appends one StockMovement row per part, carrying the signed change
+  and the resulting balance.
+
+The sum of a part's movements therefore always equals its in_stock.
+
+``stock_as_of`` answers "how many were in stock at the end of day D".
+It starts from the latest StockSnapshot on or before D, and adds the
+movements since that snapshot. Snapshots are written by the
+snapshot_stock management command.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from garage.models import Part, StockMovement, StockSnapshot
+from garage.services import stock_alerts
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InsufficientStockError(Exception):
+    def __init__(self, part):
+        self.part = part
+        super().__init__(f'Insufficient stock for part {part.name}')
+
+
+def stock_status(in_stock, min_stock):
+    return 'out-of-stock' if in_stock == 0 else 'low-stock' if in_stock <= min_stock else 'in-stock'
+
+
+def _status_case():
+    return Case(
+        When(in_stock=0, then=Value('out-of-stock')),
+        When(in_stock__lte=F('min_stock'), then=Value('low-stock')),
+        default=Value('in-stock'),
+    )
+
+
+def apply_movements(client_garage, changes, movement_type, reference='', require_stock=True):
+    """
+    Apply signed stock ``changes`` ({part_id: quantity}) and record them.
+
+    With ``require_stock`` a decrease that would take a part below zero
+    raises InsufficientStockError and nothing is changed (the caller's
+    transaction rolls back). Returns {part_id: balance after}.
+    """
+    changes = {part_id: quantity for part_id, quantity in changes.items() if quantity}
+    if not changes:
+        return {}
+
+    with transaction.atomic():
+        allowed = Q()
+        for part_id, quantity in changes.items():
+            if quantity < 0 and require_stock:
+                allowed |= Q(pk=part_id, in_stock__gte=-quantity)
+            else:
+                allowed |= Q(pk=part_id)
+        parts = Part.objects.filter(client_garage=client_garage)
+        updated = parts.filter(allowed).update(
+            in_stock=Case(*[When(pk=part_id, then=F('in_stock') + quantity) for part_id, quantity in changes.items()]),
+            last_movement=timezone.localdate(),
+            movement_type=movement_type,
+            updated_at=timezone.now()
+        )
+        if updated != len(changes):
+            available = dict(parts.filter(pk__in=changes).values_list('pk', 'in_stock'))
+            short = next(
+                (part_id for part_id, quantity in changes.items() if available.get(part_id, 0) + quantity < 0),
+                next(iter(changes))
+            )
+            raise InsufficientStockError(Part.objects.only('id', 'name').get(pk=short))
+
+        # A separate UPDATE: MySQL would evaluate the status against the new
+        # in_stock within one SET list, other backends against the old one.
+        parts.filter(pk__in=changes).update(status=_status_case())
+        balances = dict(parts.filter(pk__in=changes).values_list('pk', 'in_stock'))
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                client_garage=client_garage,
+                part_id=part_id,
+                movement_type=movement_type,
+                quantity=quantity,
+                balance_after=balances[part_id],
+                reference=reference
+            )
+            for part_id, quantity in changes.items()
+        ])
+        stock_alerts.refresh(client_garage, changes)
+    return balances
+
+
+def set_stock(part, quantity, movement_type='adjusted', reference=''):
+    """Bring ``part`` to an absolute ``quantity``, recording the difference."""
+    with transaction.atomic():
+        current = Part.objects.select_for_update().values_list('in_stock', flat=True).get(pk=part.pk)
+        balances = apply_movements(part.client_garage, {part.pk: quantity - current}, movement_type, reference, require_stock=False)
+        if not balances:
+            # Nothing moved, but a new part or a changed min_stock may still need an alert.
+            stock_alerts.refresh(part.client_garage, [part.pk])
+    part.in_stock = balances.get(part.pk, current)
+    part.status = stock_status(part.in_stock, part.min_stock)
+    return part.in_stock
+
+
+def _day_end(day):
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def stock_as_of(client_garage, day, parts=None):
+    """
+    {part_id: quantity in stock at the end of ``day``} in one query.
+
+    ``parts`` narrows the result to a Part queryset of the garage.
+    """
+    parts = (parts if parts is not None else Part.objects).filter(client_garage=client_garage)
+    latest = StockSnapshot.objects.filter(part=OuterRef('pk'), date__lte=day).order_by('-date')
+    since_snapshot = StockMovement.objects.filter(
+        part=OuterRef('pk'),
+        created_at__gte=OuterRef('snapshot_closes'),
+        created_at__lt=_day_end(day)
+    ).order_by().values('part').annotate(total=Sum('quantity')).values('total')
+    rows = parts.annotate(
+        snapshot_quantity=Coalesce(Subquery(latest.values('quantity')[:1]), Value(0), output_field=IntegerField()),
+        snapshot_closes=Coalesce(Subquery(latest.values('closes_at')[:1]), Value(EPOCH)),
+    ).annotate(
+        moved=Coalesce(Subquery(since_snapshot, output_field=IntegerField()), Value(0), output_field=IntegerField())
+    ).values_list('pk', 'snapshot_quantity', 'moved')
+    return {part_id: snapshot_quantity + moved for part_id, snapshot_quantity, moved in rows}
+
+
+def take_snapshots(day, client_garage=None):
+    """Record every part's closing balance for ``day`` (a past day); returns the number of snapshots."""
+    if day >= timezone.localdate():
+        raise ValueError('Snapshots can only be taken for days that have ended')
+    parts = Part.objects.all()
+    if client_garage is not None:
+        parts = parts.filter(client_garage=client_garage)
+    garages = dict(parts.values_list('pk', 'client_garage_id'))
+    closes_at = _day_end(day)
+    snapshots = []
+    for garage_id in set(garages.values()):
+        for part_id, quantity in stock_as_of(garage_id, day, parts).items():
+            snapshots.append(StockSnapshot(client_garage_id=garage_id, part_id=part_id, date=day, closes_at=closes_at, quantity=quantity))
+    with transaction.atomic():
+        StockSnapshot.objects.filter(part__in=parts, date=day).delete()
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+    return len(snapshots)
@@ -0,0 +1,116 @@
+"""
+Low-stock alerts.
+
+LowStockAlert holds one row per part at or below its min_stock. It is a
+small materialized set per garage, so the dashboard counts it instead of
+scanning Part. ``refresh`` re-checks only the parts passed to it.
+``garage.services.stock`` calls it for every part whose stock moves, so
+bills, purchase orders and inventory edits keep the set current.
+
+``reorder_suggestions`` sizes a purchase order from the recent sales
+velocity in the stock ledger.
+"""
+import math
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from garage.models import LowStockAlert, Part, StockMovement
+from garage.services import dashboard_metrics
+
+
+def refresh(client_garage, part_ids):
+    """Raise, update or clear the alerts of ``part_ids``; returns True when the set changed."""
+    part_ids = list(part_ids)
+    if not part_ids:
+        return False
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    low = list(
+        Part.objects.filter(client_garage_id=garage_id, pk__in=part_ids, in_stock__lte=F('min_stock'))
+        .values_list('pk', 'in_stock', 'min_stock')
+    )
+    alerts = LowStockAlert.objects.filter(client_garage_id=garage_id)
+    previous = dict(alerts.filter(part_id__in=part_ids).values_list('part_id', 'in_stock'))
+    cleared, _ = alerts.filter(part_id__in=part_ids).exclude(part_id__in=[row[0] for row in low]).delete()
+    if low:
+        now = timezone.now()
+        LowStockAlert.objects.bulk_create(
+            [
+                LowStockAlert(
+                    client_garage_id=garage_id,
+                    part_id=part_id,
+                    in_stock=in_stock,
+                    min_stock=min_stock,
+                    status='out-of-stock' if in_stock == 0 else 'low-stock',
+                    raised_at=now,
+                    updated_at=now
+                )
+                for part_id, in_stock, min_stock in low
+            ],
+            update_conflicts=True,
+            # MySQL upserts on any unique key and rejects an explicit target.
+            unique_fields=['part'] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=['in_stock', 'min_stock', 'status', 'updated_at']
+        )
+    changed = bool(cleared) or any(previous.get(part_id) != in_stock for part_id, in_stock, _ in low)
+    if changed:
+        dashboard_metrics.bump_version(garage_id)
+    return changed
+
+
+def low_stock_alerts(client_garage):
+    return list(
+        LowStockAlert.objects.filter(client_garage=client_garage)
+        .select_related('part')
+        .order_by('in_stock', '-raised_at')
+    )
+
+
+def alert_as_dict(alert):
+    return {
+        'id': alert.part_id,
+        'name': alert.part.name,
+        'code': alert.part.code,
+        'in_stock': alert.in_stock,
+        'min_stock': alert.min_stock,
+        'status': alert.status,
+        'raised_at': alert.raised_at.isoformat(),
+    }
+
+
+def reorder_suggestions(client_garage, days=30, cover_days=14):
+    """
+    Parts that are low now or will be within ``cover_days`` at the sales rate
+    of the last ``days`` days, with the quantity to order so that stock lasts
+    ``cover_days`` and still ends at min_stock.
+    """
+    since = timezone.now() - timedelta(days=days)
+    sold = dict(
+        StockMovement.objects.filter(client_garage=client_garage, movement_type='sold', created_at__gte=since)
+        .order_by().values('part').annotate(total=-Sum('quantity')).values_list('part', 'total')
+    )
+    alerted = set(LowStockAlert.objects.filter(client_garage=client_garage).values_list('part_id', flat=True))
+    parts = Part.objects.filter(client_garage=client_garage, pk__in=alerted | set(sold)).select_related('supplier').order_by('name')
+
+    suggestions = []
+    for part in parts:
+        daily = (sold.get(part.pk) or 0) / days
+        needed = math.ceil(daily * cover_days) + part.min_stock
+        if part.pk not in alerted and part.in_stock > needed:
+            continue
+        quantity = max(needed - part.in_stock, 0) or part.min_stock
+        suggestions.append({
+            'id': part.pk,
+            'name': part.name,
+            'code': part.code,
+            'in_stock': part.in_stock,
+            'min_stock': part.min_stock,
+            'daily_sales': round(daily, 2),
+            'days_left': round(part.in_stock / daily, 1) if daily else None,
+            'suggested_quantity': quantity,
+            'supplier': part.supplier.name if part.supplier else '',
+            'estimated_cost': float(part.purchase_price * quantity),
+        })
+    return sorted(suggestions, key=lambda row: (row['days_left'] is None, row['days_left'] or 0))
@@ -0,0 +1,173 @@
+"""
+Supplier ledger.
+
+``Supplier.current_credit`` is what the garage owes a supplier.
+``PurchaseOrder.amount_paid`` is how much of an order has been settled.
+Both change only here, in the transaction that records the credit purchase
+or the payment, with the supplier row locked.
+- Every change appends a SupplierLedgerEntry with the signed amount and the
+  running balance.
+- A payment made against an order settles that order first. Any excess, and
+  any payment made without an order, settles the supplier's oldest open
+  credit orders.
+
+``supplier_details`` serves the supplier page in a fixed number of queries,
+whatever the size of the history. It reads order items through one prefetch,
+the totals through one aggregate, and ``aging`` buckets the outstanding
+amounts by order age (0-30, 31-60, 61-90 and over 90 days).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Prefetch, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from garage.models import PurchaseOrder, PurchaseOrderItem, Supplier, SupplierLedgerEntry, SupplierPayment
+
+AGING_BUCKETS = [('0-30', 0, 30), ('31-60', 31, 60), ('61-90', 61, 90), ('90+', 91, None)]
+ORDERS_PER_PAGE = 50
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+class SupplierLedgerError(ValueError):
+    pass
+
+
+def _entry(supplier, entry_type, amount, balance, purchase_order=None, payment=None, day=None):
+    return SupplierLedgerEntry.objects.create(
+        client_garage_id=supplier.client_garage_id,
+        supplier=supplier,
+        purchase_order=purchase_order,
+        payment=payment,
+        entry_type=entry_type,
+        amount=amount,
+        balance_after=balance,
+        date=day or timezone.localdate()
+    )
+
+
+def _locked_supplier(supplier_id):
+    return Supplier.objects.select_for_update().get(pk=supplier_id)
+
+
+def record_purchase(purchase_order):
+    """
+    Book a new purchase order: a credit order is added to what the supplier
+    is owed, any other order is settled on the spot.
+    """
+    with transaction.atomic():
+        if purchase_order.payment_mode != 'credit':
+            PurchaseOrder.objects.filter(pk=purchase_order.pk).update(amount_paid=F('total'), updated_at=timezone.now())
+            purchase_order.amount_paid = purchase_order.total
+            return None
+        supplier = _locked_supplier(purchase_order.supplier_id)
+        balance = supplier.current_credit + purchase_order.total
+        Supplier.objects.filter(pk=supplier.pk).update(current_credit=balance, updated_at=timezone.now())
+        return _entry(supplier, 'purchase', purchase_order.total, balance, purchase_order=purchase_order, day=purchase_order.date)
+
+
+def _settle(purchase_order, amount, now):
+    paid = purchase_order.amount_paid + amount
+    PurchaseOrder.objects.filter(pk=purchase_order.pk).update(
+        amount_paid=paid,
+        status='paid' if paid >= purchase_order.total else 'partially_paid',
+        updated_at=now
+    )
+
+
+def record_payment(supplier, amount, purchase_order=None):
+    """Pay ``amount`` to ``supplier``; returns the SupplierPayment."""
+    amount = Decimal(str(amount))
+    if amount <= 0:
+        raise SupplierLedgerError('Payment amount must be positive')
+    with transaction.atomic():
+        supplier = _locked_supplier(supplier.pk)
+        if amount > supplier.current_credit:
+            raise SupplierLedgerError('Payment amount cannot exceed current credit')
+        now = timezone.now()
+        payment = SupplierPayment.objects.create(
+            client_garage_id=supplier.client_garage_id,
+            supplier=supplier,
+            purchase_order=purchase_order,
+            amount=amount,
+            payment_date=timezone.localdate()
+        )
+        balance = supplier.current_credit - amount
+        Supplier.objects.filter(pk=supplier.pk).update(current_credit=balance, updated_at=now)
+
+        remaining = amount
+        open_orders = PurchaseOrder.objects.filter(
+            supplier=supplier, payment_mode='credit', amount_paid__lt=F('total')
+        ).only('id', 'total', 'amount_paid')
+        if purchase_order is not None:
+            order = open_orders.filter(pk=purchase_order.pk).first()
+            if order is not None:
+                applied = min(order.total - order.amount_paid, remaining)
+                _settle(order, applied, now)
+                remaining -= applied
+            open_orders = open_orders.exclude(pk=purchase_order.pk)
+        # Whatever the chosen order does not absorb goes to the oldest open orders.
+        for order in open_orders.order_by('date', 'id').iterator(chunk_size=100):
+            if remaining <= 0:
+                break
+            applied = min(order.total - order.amount_paid, remaining)
+            _settle(order, applied, now)
+            remaining -= applied
+        _entry(supplier, 'payment', -amount, balance, purchase_order=purchase_order, payment=payment)
+    return payment
+
+
+def _outstanding():
+    return ExpressionWrapper(F('total') - F('amount_paid'), output_field=MONEY)
+
+
+def aging(purchase_orders, today=None):
+    """Outstanding amount of ``purchase_orders`` per age bucket, in one aggregate."""
+    today = today or timezone.localdate()
+    buckets = {}
+    for label, low, high in AGING_BUCKETS:
+        in_bucket = Q(date__lte=today - timedelta(days=low))
+        if high is not None:
+            in_bucket &= Q(date__gte=today - timedelta(days=high))
+        buckets[label] = Coalesce(Sum(_outstanding(), filter=in_bucket), Value(Decimal('0')), output_field=MONEY)
+    totals = purchase_orders.filter(amount_paid__lt=F('total')).aggregate(**buckets)
+    return {label: float(totals[label]) for label, _, _ in AGING_BUCKETS}
+
+
+def supplier_details(client_garage, supplier_id, page=1):
+    """Supplier, a page of its purchase orders with items, totals and aging."""
+    supplier = Supplier.objects.get(pk=supplier_id, client_garage=client_garage)
+    purchase_orders = PurchaseOrder.objects.filter(supplier=supplier, client_garage=client_garage)
+    summary = purchase_orders.aggregate(
+        total_purchases=Coalesce(Sum('total'), Value(Decimal('0')), output_field=MONEY),
+        outstanding=Coalesce(Sum(_outstanding()), Value(Decimal('0')), output_field=MONEY),
+        last_purchase=Max('date'),
+    )
+    total_paid = SupplierPayment.objects.filter(supplier=supplier, client_garage=client_garage).aggregate(
+        total=Coalesce(Sum('amount'), Value(Decimal('0')), output_field=MONEY)
+    )['total']
+
+    paginator = Paginator(purchase_orders.order_by('-date', '-id'), ORDERS_PER_PAGE)
+    page_obj = paginator.get_page(page)
+    orders = list(page_obj.object_list.prefetch_related(
+        Prefetch('items', queryset=PurchaseOrderItem.objects.select_related(
+            'part__vehicle_company', 'part__vehicle_type', 'part__vehicle_model'
+        ))
+    ))
+    return {
+        'supplier': supplier,
+        'purchase_orders': orders,
+        'summary': {
+            'total_purchases': float(summary['total_purchases']),
+            'total_paid': float(total_paid),
+            'outstanding_balance': float(summary['outstanding']),
+            'total_orders': paginator.count,
+        },
+        'last_purchase': summary['last_purchase'],
+        'aging': aging(purchase_orders),
+        'total_pages': paginator.num_pages,
+        'current_page': page_obj.number,
+    }
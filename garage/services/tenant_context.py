@@ -0,0 +1,101 @@
+"""
+Per-process cache of the tenant objects nearly every view needs: the
+user's ClientGarage, their ClientFiscalYear and the garage's TaxSetting.
+
+Entries live for TENANT_CONTEXT_TTL seconds (default 300). Each one is
+tagged with its garage's version number, kept in Django's cache so every
+process shares it. The signal handlers in garage/signals.py bump the
+version when the rows change, and every process then reloads on its next
+lookup.
+Callers always get a copy, so a view that edits and saves its garage cannot
+leak unsaved changes into another request.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from garage.models import ClientFiscalYear, ClientGarage, TaxSetting
+
+GARAGE = 'garage'
+FISCAL_YEAR = 'fiscal_year'
+TAX_SETTING = 'tax_setting'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _version_key(garage_id):
+    return f"tenant_context:version:{garage_id}"
+
+
+def bump_version(garage_id):
+    """Drop the cached garage, fiscal years and tax setting of a garage in every process."""
+    cache.set(_version_key(garage_id), time.time_ns(), None)
+
+
+def _cached(garage_id, key, loader):
+    now = time.monotonic()
+    version = cache.get(_version_key(garage_id), 0)
+    with _lock:
+        entry = _cache.get(key)
+    if entry is not None and entry[0] > now and entry[1] == version:
+        value = entry[2]
+    else:
+        value = loader()
+        with _lock:
+            _cache[key] = (now + getattr(settings, 'TENANT_CONTEXT_TTL', 300), version, value)
+    return copy.copy(value) if value is not None else None
+
+
+def cached_garage(garage_id):
+    return _cached(garage_id, (GARAGE, garage_id), lambda: ClientGarage.objects.filter(pk=garage_id).first())
+
+
+def cached_fiscal_year(garage_id, fiscal_year_id):
+    return _cached(garage_id, (FISCAL_YEAR, fiscal_year_id), lambda: ClientFiscalYear.objects.filter(pk=fiscal_year_id).first())
+
+
+def cached_tax_setting(garage_id):
+    return _cached(garage_id, (TAX_SETTING, garage_id), lambda: TaxSetting.objects.filter(client_garage_id=garage_id).first())
+
+
+def attach_tenant_context(request):
+    """Set request.garage, request.fiscal_year and request.tax_setting (None when unknown)."""
+    request.garage = request.fiscal_year = request.tax_setting = None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated or not user.client_garage_id:
+        return
+    request.garage = cached_garage(user.client_garage_id)
+    if request.garage is None:
+        return
+    request.tax_setting = cached_tax_setting(user.client_garage_id)
+    if user.client_fiscal_year_id:
+        request.fiscal_year = cached_fiscal_year(user.client_garage_id, user.client_fiscal_year_id)
+    # Prime the user's relations so request.user.client_garage and
+    # request.user.client_fiscal_year do not query again.
+    user.client_garage = request.garage
+    if request.fiscal_year is not None:
+        user.client_fiscal_year = request.fiscal_year
+
+
+def get_request_garage(request):
+    """
+    The request user's ClientGarage.
+
+    Replaces ``ClientGarage.objects.get(user=request.user)`` and raises
+    ClientGarage.DoesNotExist the same way when the user has no garage.
+    """
+    if not hasattr(request, 'garage'):
+        attach_tenant_context(request)
+    if request.garage is None:
+        raise ClientGarage.DoesNotExist('ClientGarage matching query does not exist.')
+    return request.garage
+
+
+def get_request_tax_setting(request):
+    if not hasattr(request, 'tax_setting'):
+        attach_tenant_context(request)
+    return request.tax_setting
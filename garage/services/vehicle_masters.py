@@ -0,0 +1,68 @@
+"""
+Vehicle-master reference bundle.
+
+The intake and inventory screens need every vehicle company, type and
+model of the garage. ``reference_bundle`` returns all three in one
+columnar payload (one list per field, so names are not repeated per row)
+together with an ETag. The ETag is derived from each table's latest
+``updated_at`` and row count; the count is there because a delete leaves
+the latest stamp unchanged.
+
+Bundles are cached per garage under a version key. The save, delete and
+upload paths bump the version (see garage/signals.py and
+garage.services.spreadsheet_import), so a bundle is rebuilt only after the
+masters change. Other processes pick up the change within
+VEHICLE_MASTERS_CACHE_TTL seconds (default 300).
+"""
+import hashlib
+import time as _time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.http import quote_etag
+
+from garage.models import VehicleCompany, VehicleModel, VehicleType
+
+
+def _version_key(garage_id):
+    return f"vehicle_masters:version:{garage_id}"
+
+
+def bump_version(garage_id):
+    """Drop the cached bundle of a garage."""
+    cache.set(_version_key(garage_id), _time.time_ns(), None)
+
+
+def _columns(rows, fields):
+    return {field: [row[i] for row in rows] for i, field in enumerate(fields)}
+
+
+def _build(garage_id):
+    stamps = []
+    for model in (VehicleCompany, VehicleType, VehicleModel):
+        state = model.objects.filter(client_garage_id=garage_id).aggregate(stamp=Max('updated_at'), count=Count('id'))
+        stamps.append(f"{state['stamp'].isoformat() if state['stamp'] else '-'}:{state['count']}")
+    version = hashlib.sha1('|'.join(stamps).encode()).hexdigest()[:16]
+
+    companies = VehicleCompany.objects.filter(client_garage_id=garage_id).order_by('name', 'id').values_list('id', 'name')
+    vehicle_types = VehicleType.objects.filter(client_garage_id=garage_id).order_by('name', 'id').values_list('id', 'name')
+    models = VehicleModel.objects.filter(client_garage_id=garage_id).order_by('name', 'id').values_list('id', 'name', 'company_id', 'vehicle_type_id')
+    return {
+        'version': version,
+        'companies': _columns(list(companies), ('id', 'name')),
+        'types': _columns(list(vehicle_types), ('id', 'name')),
+        'models': _columns(list(models), ('id', 'name', 'company', 'type')),
+    }
+
+
+def reference_bundle(client_garage):
+    """(etag, payload) of the garage's vehicle masters, served from cache when fresh."""
+    garage_id = getattr(client_garage, 'pk', client_garage)
+    version = cache.get(_version_key(garage_id), 0)
+    key = f"vehicle_masters:{garage_id}:{version}"
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = _build(garage_id)
+        cache.set(key, bundle, getattr(settings, 'VEHICLE_MASTERS_CACHE_TTL', 300))
+    return quote_etag(bundle['version']), bundle
@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from garage.models import Bill, ClientFiscalYear, ClientGarage, Customer, ServiceOrder, StaffAttendance, StaffPayroll, TaxSetting, User, Vehicle, VehicleCompany, VehicleModel, VehicleType
+from garage.services import dashboard_metrics, payroll, reception_index, tenant_context, vehicle_masters
+
+
+@receiver([post_save, post_delete], sender=ClientGarage)
+def drop_cached_garage(sender, instance, **kwargs):
+    tenant_context.bump_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ClientFiscalYear)
+def drop_cached_fiscal_years(sender, instance, **kwargs):
+    tenant_context.bump_version(instance.client_garage_id)
+
+
+@receiver([post_save, post_delete], sender=TaxSetting)
+def drop_cached_tax_setting(sender, instance, **kwargs):
+    tenant_context.bump_version(instance.client_garage_id)
+
+
+@receiver([post_save, post_delete], sender=Bill)
+@receiver([post_save, post_delete], sender=ServiceOrder)
+def expire_dashboard_metrics(sender, instance, **kwargs):
+    dashboard_metrics.bump_version(instance.client_garage_id)
+
+
+@receiver([post_save, post_delete], sender=StaffPayroll)
+@receiver([post_save, post_delete], sender=StaffAttendance)
+@receiver([post_save, post_delete], sender=User)
+def expire_payroll_statements(sender, instance, **kwargs):
+    if instance.client_garage_id:
+        payroll.bump_version(instance.client_garage_id)
+
+
+@receiver([post_save, post_delete], sender=Vehicle)
+@receiver([post_save, post_delete], sender=Customer)
+def resync_reception_index(sender, instance, **kwargs):
+    reception_index.invalidate_reception_index(instance.client_garage_id)
+
+
+@receiver([post_save, post_delete], sender=VehicleCompany)
+@receiver([post_save, post_delete], sender=VehicleType)
+@receiver([post_save, post_delete], sender=VehicleModel)
+def expire_vehicle_masters(sender, instance, **kwargs):
+    vehicle_masters.bump_version(instance.client_garage_id)
@@ -1,3 +1,129 @@
+import json
+from datetime import date, time, timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from garage.models import (
+    Bill, ClientFiscalYear, ClientGarage, Customer, Part, PartCategory, PurchaseOrder, ServiceOrder,
+    ServiceType, StaffAttendance, StaffPayroll, Supplier, User, Vehicle, VehicleCompany, VehicleModel, VehicleType
+)
+from garage.services.bill_listing import bill_queryset, filter_bills
+
+
+def _mysql_tables(node):
+    if isinstance(node, dict):
+        if isinstance(node.get('table'), dict):
+            yield node['table']
+        for value in node.values():
+            yield from _mysql_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_tables(value)
+
+
+def _mysql_flags(node, flag):
+    if isinstance(node, dict):
+        if node.get(flag):
+            yield flag
+        for value in node.values():
+            yield from _mysql_flags(value, flag)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_flags(value, flag)
+
+
+def query_plan(queryset):
+    """(index names the plan reads, sorts it does outside an index) for ``queryset``."""
+    if connection.vendor == 'mysql':
+        plan = json.loads(queryset.explain(format='json'))
+        indexes = [table.get('key') for table in _mysql_tables(plan) if table.get('key')]
+        sorts = list(_mysql_flags(plan, 'using_filesort')) + list(_mysql_flags(plan, 'using_temporary_table'))
+        return indexes, sorts
+    plan = queryset.explain()
+    if connection.vendor == 'postgresql':
+        indexes = [line.split(' using ', 1)[1].split()[0] for line in plan.splitlines() if 'Index' in line and ' using ' in line]
+        indexes += [line.split('Bitmap Index Scan on ', 1)[1].split()[0] for line in plan.splitlines() if 'Bitmap Index Scan on ' in line]
+        return indexes, [line.strip() for line in plan.splitlines() if line.strip().startswith(('Sort', '->  Sort'))]
+    # SQLite: "SEARCH garage_bill USING INDEX bill_garage_created (...)";
+    # a sort it cannot take from an index shows as "USE TEMP B-TREE".
+    indexes = [line.split('INDEX ', 1)[1].split()[0] for line in plan.splitlines() if 'USING INDEX ' in line or 'USING COVERING INDEX ' in line]
+    return indexes, [line.strip() for line in plan.splitlines() if 'USE TEMP B-TREE' in line]
+
+
+class QueryPlanTests(TestCase):
+    """The per-garage list queries must be served by their composite indexes, sorted included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        for n in range(3):
+            garage = ClientGarage.objects.create(name=f'Garage {n}')
+            fiscal_year = ClientFiscalYear.objects.create(
+                client_garage=garage, name=f'FY {n}', start_date=today, end_date=today + timedelta(days=365)
+            )
+            user = User.objects.create_user(f'admin{n}', f'admin{n}@example.com', 'secret', role='admin', client_garage=garage)
+            category = PartCategory.objects.create(client_garage=garage, name='General')
+            company = VehicleCompany.objects.create(client_garage=garage, name='Honda')
+            vehicle_type = VehicleType.objects.create(client_garage=garage, name='Bike')
+            model = VehicleModel.objects.create(client_garage=garage, name='Shine', company=company, vehicle_type=vehicle_type)
+            customer = Customer.objects.create(client_garage=garage, name=f'Customer {n}', phone=f'98000000{n}')
+            supplier = Supplier.objects.create(client_garage=garage, client_fiscal_year=fiscal_year, name=f'Supplier {n}', phone='1')
+            for i in range(20):
+                vehicle = Vehicle.objects.create(
+                    client_garage=garage, vehicle_number=f'BA {n} PA {i}', customer=customer,
+                    company=company, model=model, type=vehicle_type
+                )
+                order = ServiceOrder.objects.create(
+                    client_garage=garage, order_no=f'ORD{n}-{i}', vehicle=vehicle, customer=customer, complaint='Noise',
+                    entry_time=time(9), estimated_completion=time(10), created_date=today - timedelta(days=i)
+                )
+                Bill.objects.create(client_garage=garage, bill_no=f'B{n}-{i}', service_order=order, customer=customer, vehicle=vehicle)
+                Part.objects.create(
+                    client_garage=garage, client_fiscal_year=fiscal_year, code=f'P{n}-{i}', name=f'Part {i}',
+                    category=category, purchase_price=1, selling_price=2, in_stock=5
+                )
+                ServiceType.objects.create(client_garage=garage, name=f'Service {i}', category='General', base_price=1)
+                PurchaseOrder.objects.create(
+                    client_garage=garage, client_fiscal_year=fiscal_year, supplier=supplier, purchase_no=f'PO{n}-{i}',
+                    subtotal=1, tax=0, total=1, payment_mode='cash'
+                )
+                StaffAttendance.objects.create(user=user, client_garage=garage, date=today - timedelta(days=i))
+                StaffPayroll.objects.create(user=user, client_garage=garage, amount=1, payment_date=today - timedelta(days=i))
+        cls.garage = garage
+        cls.fiscal_year = fiscal_year
+
+    def assertUsesIndex(self, queryset, index_name):
+        indexes, sorts = query_plan(queryset)
+        self.assertIn(index_name, indexes, msg=str(queryset.query))
+        self.assertEqual(sorts, [], msg=str(queryset.query))
+
+    def test_bill_list(self):
+        self.assertUsesIndex(bill_queryset(self.garage).order_by('-created_at', '-id'), 'bill_garage_created')
+        self.assertUsesIndex(filter_bills(bill_queryset(self.garage), 'Pending').order_by('-created_at', '-id'), 'bill_garage_status_created')
+
+    def test_service_order_list(self):
+        orders = ServiceOrder.objects.filter(client_garage=self.garage)
+        self.assertUsesIndex(orders.order_by('-created_date', '-id'), 'so_garage_date')
+        self.assertUsesIndex(orders.filter(status='in-progress').order_by('-created_date', '-id'), 'so_garage_status_date')
+
+    def test_inventory_and_catalog(self):
+        parts = Part.objects.filter(client_garage=self.garage, client_fiscal_year=self.fiscal_year)
+        self.assertUsesIndex(parts.order_by('name', 'id'), 'part_garage_fy_name')
+        self.assertUsesIndex(Part.objects.filter(client_garage=self.garage, updated_at__gte=timezone.now() - timedelta(hours=1)), 'part_garage_updated')
+        self.assertUsesIndex(ServiceType.objects.filter(client_garage=self.garage, name='Service 1'), 'svc_garage_name')
+        self.assertUsesIndex(ServiceType.objects.filter(client_garage=self.garage, updated_at__gte=timezone.now() - timedelta(hours=1)), 'svc_garage_updated')
+
+    def test_suppliers_and_purchases(self):
+        self.assertUsesIndex(Supplier.objects.filter(client_garage=self.garage, client_fiscal_year=self.fiscal_year).order_by('name'), 'supplier_garage_fy_name')
+        self.assertUsesIndex(PurchaseOrder.objects.filter(client_garage=self.garage, status='pending').order_by('-date'), 'po_garage_status_date')
+
+    def test_customer_lookup(self):
+        self.assertUsesIndex(Customer.objects.filter(client_garage=self.garage, phone='980000002'), 'customer_garage_phone')
+        self.assertUsesIndex(Customer.objects.filter(client_garage=self.garage).order_by('name'), 'customer_garage_name')
 
-# Create your tests here.
+    def test_staff_attendance_and_payroll(self):
+        today = date.today()
+        self.assertUsesIndex(StaffAttendance.objects.filter(client_garage=self.garage, date=today), 'attendance_garage_date')
+        self.assertUsesIndex(StaffPayroll.objects.filter(client_garage=self.garage, payment_date__gte=today - timedelta(days=30)), 'payroll_garage_date')
@@ -2,13 +2,14 @@ from django.urls import path
 from . import views
 from garage.view.admin.add_vehicle_view import add_vehicle, assign_mechanic, get_service_orders, add_vehicle_and_order, get_vehicle_models,search_vehicle,search_customer, staff_list, update_service_order, get_service_order
 from garage.view.admin.pos_billing_view import pos_billing, get_tax_settings, get_daily_summary, generate_bill_pdf
-from garage.view.admin.inventory_management import inventory_management, get_vehicle_models_a, get_vehicle_types_a, get_vehicle_companies, search_items, save_inventory, get_inventory, make_supplier_payment,create_purchase_order,save_supplier, get_purchase_orders, get_suppliers, get_tax_settings, upload_part_image, get_supplier_details
+from garage.view.admin.inventory_management import inventory_management, get_vehicle_models_a, get_vehicle_types_a, get_vehicle_companies, search_items, save_inventory, get_inventory, make_supplier_payment,create_purchase_order,save_supplier, get_purchase_orders, get_suppliers, get_tax_settings, upload_part_image, get_supplier_details, get_stock_movements, get_stock_as_of, get_low_stock_alerts, get_reorder_suggestions, upload_purchase_invoice
 from garage.view.admin.staff_management_views import staff_management, get_attendance, generate_payroll_statement, get_payroll, save_payroll, delete_staff, save_staff, get_staff_list, save_attendance, toggle_attendance, get_payroll_excel_data
-from garage.view.admin.admin_report_views import admin_report_views
+from garage.view.admin.background_jobs_view import get_jobs, get_job, download_job_file
+from garage.view.admin.admin_report_views import admin_report_views, sales_report, export_bill_pdfs, bill_pdf_export_status, export_inventory, export_bills_table, export_service_orders
 from garage.view.admin.admin_setting import admin_setting_views, save_general_settings, save_fiscal_year,delete_fiscal_year, save_service_type,  save_user, delete_role, save_role, delete_part_category, save_part_category, delete_service_type,save_service_type,delete_fiscal_year,save_fiscal_year,save_general_settings, save_tax_settings, save_other_settings
-from garage.view.admin.upload import admin_upload, download_template,upload_models,upload_vehicle_types,upload_companies, export_models,export_vehicle_types, export_companies, delete_models,delete_vehicle_types, delete_companies,save_models,save_vehicle_types,save_companies, get_model,get_vehicle_type,get_company,get_company,get_models, get_vehicle_types, get_companies
-from garage.view.admin.pos_billing_view import generate_bill,save_bill, save_customer, get_bills, get_items, get_item, get_bill
-from garage.view.admin.dashboard_view import dashboard_view
+from garage.view.admin.upload import admin_upload, download_template,upload_models,upload_vehicle_types,upload_companies, export_models,export_vehicle_types, export_companies, delete_models,delete_vehicle_types, delete_companies,save_models,save_vehicle_types,save_companies, get_model,get_vehicle_type,get_company,get_company,get_models, get_vehicle_types, get_companies, get_vehicle_masters
+from garage.view.admin.pos_billing_view import generate_bill,save_bill, save_customer, get_bills, get_items, get_items_delta, get_item, get_bill, delete_bill
+from garage.view.admin.dashboard_view import dashboard_view, dashboard_metrics
 
 
 
@@ -18,6 +19,7 @@ urlpatterns = [
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('superuser/dashboard/', views.superuser_dashboard, name='superuser_dashboard'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/dashboard/metrics/', dashboard_metrics, name='dashboard_metrics'),
     path('staff/dashboard/', views.staff_dashboard, name='staff_dashboard'),
     path('superuser/add-user/', views.add_company_user, name='add_company_user'),
     path('superuser/settings/', views.superuser_setting, name='superuser_setting'),
@@ -34,6 +36,15 @@ urlpatterns = [
     path('admin/inventory-management/', inventory_management, name='inventory_management'),
     path('admin/staff-management/', staff_management, name='staff_management'),
     path('admin/admin-report/', admin_report_views, name='admin_report'),
+    path('admin/reports/sales/', sales_report, name='sales_report'),
+    path('admin/reports/bill-pdfs/', export_bill_pdfs, name='export_bill_pdfs'),
+    path('admin/reports/bill-pdfs/status/', bill_pdf_export_status, name='bill_pdf_export_status'),
+    path('admin/jobs/', get_jobs, name='get_jobs'),
+    path('admin/jobs/<int:job_id>/', get_job, name='get_job'),
+    path('admin/jobs/<int:job_id>/download/', download_job_file, name='download_job_file'),
+    path('admin/reports/export/inventory/', export_inventory, name='export_inventory'),
+    path('admin/reports/export/bills/', export_bills_table, name='export_bills'),
+    path('admin/reports/export/service-orders/', export_service_orders, name='export_service_orders'),
     path('admin/admin-setting/',admin_setting_views, name='admin_setting'),
     path('admin/admin-upload/', admin_upload, name='admin_upload'),
 
@@ -54,6 +65,7 @@ urlpatterns = [
     path('admin/get-companies/', get_companies, name='get_companies'),
     path('admin/get-vehicle-types/', get_vehicle_types, name='get_vehicle_types'),
     path('admin/get-models/', get_models, name='get_models'),
+    path('admin/vehicle-masters/', get_vehicle_masters, name='get_vehicle_masters'),
     path('admin/get-companies/<int:id>/', get_company, name='get_company'),
     path('admin/get-vehicle-types/<int:id>/', get_vehicle_type, name='get_vehicle_type'),
     path('admin/get-models/<int:id>/', get_model, name='get_model'),
@@ -88,9 +100,14 @@ urlpatterns = [
     path('admin/save-supplier/', save_supplier, name='save_supplier'),
     path('admin/get-purchase-orders/', get_purchase_orders, name='get_purchase_orders'),
     path('admin/create-purchase-order/', create_purchase_order, name='create_purchase_order'),
+    path('admin/upload-purchase-invoice/', upload_purchase_invoice, name='upload_purchase_invoice'),
     path('admin/make-supplier-payment/', make_supplier_payment, name='make_supplier_payment'),
     path('admin/get-inventory/', get_inventory, name='get_inventory'),
     path('admin/save-inventory/', save_inventory, name='save_inventory'),
+    path('admin/stock-movements/<int:part_id>/', get_stock_movements, name='get_stock_movements'),
+    path('admin/stock-as-of/', get_stock_as_of, name='get_stock_as_of'),
+    path('admin/low-stock-alerts/', get_low_stock_alerts, name='get_low_stock_alerts'),
+    path('admin/reorder-suggestions/', get_reorder_suggestions, name='get_reorder_suggestions'),
     path('admin/search-items/', search_items, name='search_items'),
     path('admin/get-vehicle-companies/', get_vehicle_companies, name='get_vehicle_companies'),
     path('admin/get-vehicle-types_a/', get_vehicle_types_a, name='get_vehicle_types_a'),
@@ -100,9 +117,11 @@ urlpatterns = [
     # New POS URLs
     path('pos/', pos_billing, name='pos_billing'),
     path('pos/get_items/', get_items, name='get_items'),
+    path('pos/get_items_delta/', get_items_delta, name='get_items_delta'),
     path('pos/get_item/', get_item, name='get_item'),
     path('pos/get_bills/', get_bills, name='get_bills'),
     path('pos/get_bill/', get_bill, name='get_bill'),
+    path('pos/delete_bill/', delete_bill, name='delete_bill'),
     path('pos/save_customer/', save_customer, name='save_customer'),
     path('pos/save_bill/', save_bill, name='save_bill'),
     path('pos/generate_bill/',generate_bill, name='generate_bill'),
@@ -1,16 +1,24 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Q
-from datetime import datetime, timedelta
+from django.db.models import Prefetch, Q
 from garage.models import (
-    ServiceOrderItem, User, ClientGarage, Customer, Vehicle, ServiceOrder, Bill,
+    User, ClientGarage, Customer, ServiceOrder, Bill,
     VehicleCompany, VehicleModel, VehicleType, ServiceType
 )
-from django.db import models
+from django.db import models, transaction
 import json
 import logging
 
+from garage.services import sales_rollup
+from garage.services.pagination import InvalidCursor, keyset_page, per_page_from, wants_cursor
+from garage.services.job_intake import IntakeError, create_job, update_job
+from garage.services.reception_index import get_reception_index
+from garage.services.service_order_listing import (
+    DEFAULT_PER_PAGE, MAX_PER_PAGE, ORDER_KEYS, filter_service_orders, service_order_as_dict, service_order_queryset
+)
+from garage.services.tenant_context import get_request_garage
+
 logger = logging.getLogger(__name__)
 
 @login_required
@@ -21,7 +29,7 @@ def add_vehicle(request):
         return redirect(f'/{request.user.role}/dashboard/')
     
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
         companies = VehicleCompany.objects.filter(client_garage=client_garage)
         vehicle_types = VehicleType.objects.filter(client_garage=client_garage)
@@ -49,14 +57,16 @@ def search_customer(request):
     query = request.GET.get('q', '')
     logger.info(f"User {request.user.username} searching customers with query: {query}")
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
-        customers = Customer.objects.filter(
-            client_garage=client_garage
-        ).filter(
-            Q(name__icontains=query) | Q(phone__icontains=query)
-        )[:10]
-        
+        customer_ids = get_reception_index(client_garage).search_customers(query)
+        recent_visits = Prefetch(
+            'serviceorder_set',
+            queryset=ServiceOrder.objects.order_by('-created_date', '-id').prefetch_related('service_type')[:5],
+            to_attr='recent_visits'
+        )
+        customers = Customer.objects.filter(id__in=customer_ids).prefetch_related(recent_visits).in_bulk()
+
         results = [
             {
                 'id': customer.id,
@@ -66,12 +76,12 @@ def search_customer(request):
                     {
                         'orderNo': order.order_no,
                         'date': order.created_date.strftime('%Y-%m-%d'),
-                        'service': ', '.join(order.service_type.values_list('name', flat=True))
+                        'service': ', '.join(service_type.name for service_type in order.service_type.all())
                     }
-                    for order in customer.serviceorder_set.all()[:5]
+                    for order in customer.recent_visits
                 ]
             }
-            for customer in customers
+            for customer in (customers[customer_id] for customer_id in customer_ids if customer_id in customers)
         ]
         logger.debug(f"Returning {len(results)} customer search results")
         return JsonResponse({'customers': results})
@@ -87,26 +97,9 @@ def search_vehicle(request):
     query = request.GET.get('q', '')
     logger.info(f"User {request.user.username} searching vehicles with query: {query}")
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
-        vehicles = Vehicle.objects.filter(
-            client_garage=client_garage,
-            vehicle_number__icontains=query
-        )[:10]
-        
-        results = [
-            {
-                'id': vehicle.id,
-                'vehicleNumber': vehicle.vehicle_number,
-                'company': vehicle.company.id if vehicle.company else None,
-                'model': vehicle.model.id if vehicle.model else None,
-                'type': vehicle.type.id if vehicle.type else None,
-                'customerId': vehicle.customer.id if vehicle.customer else None,
-                'customerName': vehicle.customer.name if vehicle.customer else 'Anonymous',
-                'phone': vehicle.customer.phone if vehicle.customer else ''
-            }
-            for vehicle in vehicles
-        ]
+        results = get_reception_index(client_garage).search_vehicles(query)
         logger.debug(f"Returning {len(results)} vehicle search results")
         return JsonResponse({'vehicles': results})
     except ClientGarage.DoesNotExist:
@@ -121,7 +114,7 @@ def get_vehicle_models(request):
     company_id = request.GET.get('company_id')
     logger.info(f"User {request.user.username} fetching vehicle models for company_id: {company_id}")
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
         models = VehicleModel.objects.filter(
             company_id=company_id,
@@ -147,153 +140,18 @@ def add_vehicle_and_order(request):
             data = json.loads(request.body.decode('utf-8'))
             logger.info(f"Parsed JSON data: {data}")
 
-            required_fields = {
-                'vehicleNumber': data.get('vehicleNumber'),
-                'company': data.get('company'),
-                'vehicleModel': data.get('vehicleModel'),
-                'complaint': data.get('complaint')
-            }
-            for field_name, value in required_fields.items():
-                if not value or (isinstance(value, str) and not value.strip()):
-                    logger.error(f"Missing or empty required field: {field_name}")
-                    return JsonResponse({'status': 'error', 'message': f'Missing or empty required field: {field_name}'}, status=400)
-
-            client_garage = ClientGarage.objects.get(user=request.user)
+            client_garage = get_request_garage(request)
             logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
 
-            customer_name = data.get('customerName', 'Anonymous').strip()
-            phone = data.get('phone', '') if data.get('phone') is not None else ''
-            customer = None
-            if customer_name != 'Anonymous' or phone:
-                customer, _ = Customer.objects.get_or_create(
-                    client_garage=client_garage,
-                    phone=phone if phone else None,
-                    defaults={'name': customer_name}
-                )
-                if not _ and (customer.name != customer_name or customer.phone != phone):
-                    customer.name = customer_name
-                    customer.phone = phone if phone else None
-                    customer.save()
-                    logger.info(f"Updated customer {customer_name} (ID: {customer.id}) with new details")
-
-            vehicle_number = required_fields['vehicleNumber'].strip().upper()
-            company_id = required_fields['company']
-            model_id = required_fields['vehicleModel']
-            vehicle_type_id = data.get('vehicleType')
-
-            try:
-                company = VehicleCompany.objects.get(id=company_id, client_garage=client_garage)
-                logger.info(f"Found VehicleCompany {company.name} (ID: {company_id})")
-            except VehicleCompany.DoesNotExist:
-                logger.error(f"Invalid company ID: {company_id}")
-                return JsonResponse({'status': 'error', 'message': 'Invalid vehicle company'}, status=400)
-
-            try:
-                model = VehicleModel.objects.get(id=model_id, client_garage=client_garage, company=company)
-                logger.info(f"Found VehicleModel {model.name} (ID: {model_id})")
-            except VehicleModel.DoesNotExist:
-                logger.error(f"Invalid model ID: {model_id}")
-                return JsonResponse({'status': 'error', 'message': 'Invalid vehicle model'}, status=400)
-
-            v_type = None
-            if vehicle_type_id:
-                try:
-                    v_type = VehicleType.objects.get(id=vehicle_type_id, client_garage=client_garage)
-                    logger.info(f"Found VehicleType (ID: {v_type.id})")
-                except VehicleType.DoesNotExist:
-                    logger.warning(f"VehicleType {vehicle_type_id} not found, proceeding without type")
-
-            vehicle, created = Vehicle.objects.get_or_create(
-                client_garage=client_garage,
-                vehicle_number=vehicle_number,
-                defaults={
-                    'customer': customer,
-                    'company': company,
-                    'model': model,
-                    'type': v_type
-                }
-            )
-            logger.info(f"Vehicle {vehicle_number} (ID: {vehicle.id}) {'created' if created else 'retrieved'}")
-
-            complaint = required_fields['complaint'].strip()
-            common_services = data.get('commonService', [])
-            mechanic_ids = data.get('mechanic_ids', [])
-            estimated_hours = int(data.get('estimatedTime', 1))
-            helmet_given = data.get('helmetGiven', False)
-            key_given = data.get('keyGiven', False)
-            logger.info(f"Creating service order with complaint: {complaint}, services: {common_services}, mechanic_ids: {mechanic_ids}")
-
-            last_order = ServiceOrder.objects.filter(client_garage=client_garage).order_by('-id').first()
-            order_no = f"ORD{str(last_order.id + 1 if last_order else 1).zfill(3)}"
-            logger.info(f"Generated order number: {order_no}")
-
-            estimated_completion = (datetime.now() + timedelta(hours=estimated_hours)).time()
-            service_order = ServiceOrder.objects.create(
-                client_garage=client_garage,
-                order_no=order_no,
-                vehicle=vehicle,
-                customer=customer,
-                complaint=complaint,
-                status='in-progress' if mechanic_ids else 'waiting-assignment',
-                priority=data.get('priority', 'normal'),
-                entry_time=datetime.now().time(),
-                estimated_completion=estimated_completion,
-                created_date=datetime.now().date(),
-                progress=0,
-                total_so_far=0,
-                helmet_given=helmet_given,
-                key_given=key_given
-            )
-            logger.info(f"Created ServiceOrder {order_no} (ID: {service_order.id})")
-
-            total = 0
-            bill_items = []
-            for service_name in common_services:
-                try:
-                    service_type = ServiceType.objects.get(client_garage=client_garage, name=service_name)
-                    ServiceOrderItem.objects.create(
-                        service_order=service_order,
-                        service_type=service_type,
-                        price=service_type.base_price
-                    )
-                    total += service_type.base_price
-                    bill_items.append({'name': service_name, 'price': float(service_type.base_price)})
-                    service_order.service_type.add(service_type)
-                    logger.info(f"Added ServiceOrderItem and ServiceType {service_name} (ID: {service_type.id}) to order {order_no}")
-                except ServiceType.DoesNotExist:
-                    logger.warning(f"ServiceType {service_name} not found for client_garage {client_garage.id}")
-                    continue
-
-            service_order.total_so_far = total
-            service_order.save()
-
-            for mechanic_id in mechanic_ids:
-                try:
-                    mechanic = User.objects.get(id=mechanic_id, client_garage=client_garage, is_superuser=False)
-                    service_order.mechanics.add(mechanic)
-                    logger.info(f"Assigned mechanic {mechanic.username} (ID: {mechanic_id}) to order {order_no}")
-                except User.DoesNotExist:
-                    logger.warning(f"Invalid or unauthorized mechanic ID {mechanic_id} for order {order_no}")
-
-            bill_no = f"B{str(datetime.now().timestamp()).replace('.', '')[-3:]}"
-            bill = Bill.objects.create(
-                client_garage=client_garage,
-                bill_no=bill_no,
-                service_order=service_order,
-                customer=customer,
-                vehicle=vehicle,
-                status='Generated (In Progress)' if mechanic_ids else 'Pending',
-                items=json.dumps(bill_items),
-                total=total
-            )
-            logger.info(f"Created Bill {bill_no} (ID: {bill.id}) for order {order_no}")
-
+            service_order, bill = create_job(client_garage, request.user.client_fiscal_year_id, data)
             return JsonResponse({
                 'status': 'success',
                 'order_no': service_order.order_no,
-                'bill_no': bill_no,
+                'bill_no': bill.bill_no,
                 'bill_id': bill.id
             })
+        except IntakeError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
         except ClientGarage.DoesNotExist:
             logger.error(f"No ClientGarage found for user {request.user.username}")
             return JsonResponse({'status': 'error', 'message': 'Client garage not found for this user'}, status=404)
@@ -309,64 +167,32 @@ def add_vehicle_and_order(request):
 def get_service_orders(request):
     logger.info(f"User {request.user.username} fetching service orders with status: {request.GET.get('status', 'all')}, query: {request.GET.get('q', '')}, page: {request.GET.get('page', 1)}")
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
         status_filter = request.GET.get('status', 'all')
         search_query = request.GET.get('q', '')
         page = int(request.GET.get('page', 1))
-        items_per_page = 5
+        items_per_page = per_page_from(request, DEFAULT_PER_PAGE, MAX_PER_PAGE)
         
-        orders = ServiceOrder.objects.filter(client_garage=client_garage).order_by('-created_date')
-        if status_filter != 'all':
-            status_list = status_filter.split(',')
-            orders = orders.filter(status__in=status_list)
-            logger.debug(f"Applied status filter: {status_list}")
-        if search_query:
-            orders = orders.filter(
-                Q(vehicle__vehicle_number__icontains=search_query) |
-                Q(customer__name__icontains=search_query)
-            )
-            logger.debug(f"Applied search query: {search_query}")
+        orders = filter_service_orders(
+            service_order_queryset(client_garage).order_by('-created_date', '-id'), status_filter, search_query
+        )
+        logger.debug(f"Applied status filter: {status_filter}, search query: {search_query}")
         
-        total = orders.count()
-        start = (page - 1) * items_per_page
-        end = start + items_per_page
-        paginated_orders = orders[start:end]
-        logger.debug(f"Fetched {total} orders, paginated from {start} to {end}")
+        cursor_meta = None
+        if wants_cursor(request):
+            paginated_orders, cursor_meta = keyset_page(request, orders, ORDER_KEYS, items_per_page)
+        else:
+            total = orders.count()
+            start = (page - 1) * items_per_page
+            end = start + items_per_page
+            paginated_orders = orders[start:end]
+            logger.debug(f"Fetched {total} orders, paginated from {start} to {end}")
         
-        results = [
-            {
-                'id': order.id,
-                'orderNo': order.order_no,
-                'vehicleNumber': order.vehicle.vehicle_number,
-                'customerId': order.customer.id if order.customer else None,
-                'customerName': order.customer.name if order.customer else 'Anonymous',
-                'phone': order.customer.phone if order.customer else '',
-                'company': order.vehicle.company.id if order.vehicle.company else None,
-                'companyName': order.vehicle.company.name if order.vehicle.company else '',
-                'model': order.vehicle.model.name if order.vehicle.model else '',
-                'modelId': order.vehicle.model.id if order.vehicle.model else None,
-                'type': order.vehicle.type.name if order.vehicle.type else '',
-                'vehicleTypeId': order.vehicle.type.id if order.vehicle.type else None,
-                'complaint': order.complaint,
-                'serviceType': [
-                    {'name': item.service_type.name, 'price': float(item.price)}
-                    for item in order.service_items.all()
-                ],
-                'mechanics': list(order.mechanics.values_list('id', flat=True)),  # Changed to IDs
-                'status': order.status,
-                'priority': order.priority,
-                'entryTime': order.entry_time.strftime('%I:%M %p'),
-                'estimatedCompletion': order.estimated_completion.strftime('%I:%M %p'),
-                'createdDate': order.created_date.strftime('%Y-%m-%d'),
-                'progress': order.progress,
-                'totalSoFar': float(order.total_so_far),
-                'helmetGiven': order.helmet_given,
-                'keyGiven': order.key_given,
-                'billId': Bill.objects.filter(service_order=order).first().id if Bill.objects.filter(service_order=order).exists() else None
-            }
-            for order in paginated_orders
-        ]
+        results = [service_order_as_dict(order) for order in paginated_orders]
+        if cursor_meta is not None:
+            logger.info(f"Returning {len(results)} service orders by cursor")
+            return JsonResponse({'orders': results, **cursor_meta})
         logger.info(f"Returning {len(results)} service orders for page {page}")
         return JsonResponse({
             'orders': results,
@@ -377,6 +203,8 @@ def get_service_orders(request):
     except ClientGarage.DoesNotExist:
         logger.error(f"No ClientGarage found for user {request.user.username}")
         return JsonResponse({'status': 'error', 'message': 'Client garage not found for this user'}, status=404)
+    except InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
         logger.error(f"Error in get_service_orders for user {request.user.username}: {str(e)}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -401,7 +229,7 @@ def assign_mechanic(request):
                 return JsonResponse({'status': 'error', 'message': 'Invalid order ID format'}, status=400)
 
             try:
-                client_garage = ClientGarage.objects.get(user=request.user)
+                client_garage = get_request_garage(request)
                 service_order = ServiceOrder.objects.get(id=order_id, client_garage=client_garage)
                 logger.info(f"Found ServiceOrder {service_order.order_no} (ID: {order_id}) for client_garage {client_garage.name}")
                 
@@ -435,10 +263,14 @@ def assign_mechanic(request):
                 logger.info(f"Updated order {service_order.order_no} status to {service_order.status}")
 
                 # Update bill status
-                bill = Bill.objects.filter(service_order=service_order).first()
+                with transaction.atomic():
+                    bill = Bill.objects.select_for_update().filter(service_order=service_order).order_by('pk').first()
+                    if bill:
+                        before = sales_rollup.state_of(bill)
+                        bill.status = 'Generated (In Progress)' if new_mechanic_ids else 'Pending'
+                        bill.save()
+                        sales_rollup.record_change(before, sales_rollup.state_of(bill))
                 if bill:
-                    bill.status = 'Generated (In Progress)' if new_mechanic_ids else 'Pending'
-                    bill.save()
                     logger.info(f"Updated bill {bill.bill_no} status to {bill.status}")
 
                 return JsonResponse({
@@ -466,41 +298,12 @@ def get_service_order(request):
     order_id = request.GET.get('order_id')
     logger.info(f"User {request.user.username} fetching service order {order_id}")
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
         try:
-            order = ServiceOrder.objects.get(id=order_id, client_garage=client_garage)
+            order = service_order_queryset(client_garage).get(id=order_id)
             logger.info(f"Found ServiceOrder {order.order_no} (ID: {order_id})")
-            result = {
-                'id': order.id,
-                'orderNo': order.order_no,
-                'vehicleNumber': order.vehicle.vehicle_number,
-                'customerId': order.customer.id if order.customer else None,
-                'customerName': order.customer.name if order.customer else 'Anonymous',
-                'phone': order.customer.phone if order.customer else '',
-                'company': order.vehicle.company.id if order.vehicle.company else None,
-                'companyName': order.vehicle.company.name if order.vehicle.company else '',
-                'model': order.vehicle.model.name if order.vehicle.model else '',
-                'modelId': order.vehicle.model.id if order.vehicle.model else None,
-                'type': order.vehicle.type.name if order.vehicle.type else '',
-                'vehicleTypeId': order.vehicle.type.id if order.vehicle.type else None,
-                'complaint': order.complaint,
-                'serviceType': [
-                    {'name': item.service_type.name, 'price': float(item.price)}
-                    for item in order.service_items.all()
-                ],
-                'mechanics': list(order.mechanics.values_list('id', flat=True)),  # Changed to IDs
-                'status': order.status,
-                'priority': order.priority,
-                'entryTime': order.entry_time.strftime('%I:%M %p'),
-                'estimatedCompletion': order.estimated_completion.strftime('%I:%M %p'),
-                'createdDate': order.created_date.strftime('%Y-%m-%d'),
-                'progress': order.progress,
-                'totalSoFar': float(order.total_so_far),
-                'helmetGiven': order.helmet_given,
-                'keyGiven': order.key_given,
-                'billId': Bill.objects.filter(service_order=order).first().id if Bill.objects.filter(service_order=order).exists() else None
-            }
+            result = service_order_as_dict(order)
             logger.debug(f"Returning service order details: {result}")
             return JsonResponse({'status': 'success', 'order': result})
         except ServiceOrder.DoesNotExist:
@@ -534,181 +337,24 @@ def update_service_order(request):
                 logger.error(f"Invalid order_id format: {order_id}, type: {type(order_id)}")
                 return JsonResponse({'status': 'error', 'message': 'Invalid order ID format'}, status=400)
 
-            required_fields = {
-                'vehicleNumber': data.get('vehicleNumber'),
-                'company': data.get('company'),
-                'vehicleModel': data.get('vehicleModel'),
-                'complaint': data.get('complaint')
-            }
-            for field_name, value in required_fields.items():
-                if not value or (isinstance(value, str) and not value.strip()):
-                    logger.error(f"Missing or empty required field: {field_name}")
-                    return JsonResponse({'status': 'error', 'message': f'Missing or empty required field: {field_name}'}, status=400)
-
-            client_garage = ClientGarage.objects.get(user=request.user)
+            client_garage = get_request_garage(request)
             logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
 
             try:
-                service_order = ServiceOrder.objects.get(id=order_id, client_garage=client_garage)
+                service_order = ServiceOrder.objects.select_related('client_garage').get(id=order_id, client_garage=client_garage)
                 logger.info(f"Found ServiceOrder {service_order.order_no} (ID: {order_id})")
             except ServiceOrder.DoesNotExist:
                 logger.error(f"ServiceOrder {order_id} not found for client_garage")
                 return JsonResponse({'status': 'error', 'message': 'Service order not found'}, status=404)
 
-            if service_order.status == 'completed':
-                logger.warning(f"Attempt to update completed order {service_order.order_no}")
-                return JsonResponse({'status': 'error', 'message': 'Cannot update completed order'}, status=400)
-
-            customer_name = data.get('customerName', 'Anonymous').strip()
-            phone = data.get('phone', '') if data.get('phone') is not None else ''
-            customer = None
-            if customer_name != 'Anonymous' or phone:
-                customer, _ = Customer.objects.get_or_create(
-                    client_garage=client_garage,
-                    phone=phone if phone else None,
-                    defaults={'name': customer_name}
-                )
-                if not _ and (customer.name != customer_name or customer.phone != phone):
-                    customer.name = customer_name
-                    customer.phone = phone if phone else None
-                    customer.save()
-                    logger.info(f"Updated customer {customer_name} (ID: {customer.id}) with new details")
-
-            vehicle_number = required_fields['vehicleNumber'].strip().upper()
-            company_id = required_fields['company']
-            model_id = required_fields['vehicleModel']
-            vehicle_type_id = data.get('vehicleType')
-
-            try:
-                company = VehicleCompany.objects.get(id=company_id, client_garage=client_garage)
-                logger.info(f"Found VehicleCompany {company.name} (ID: {company_id})")
-            except VehicleCompany.DoesNotExist:
-                logger.error(f"Invalid company ID: {company_id}")
-                return JsonResponse({'status': 'error', 'message': 'Invalid vehicle company'}, status=400)
-
-            try:
-                model = VehicleModel.objects.get(id=model_id, client_garage=client_garage, company=company)
-                logger.info(f"Found VehicleModel {model.name} (ID: {model_id})")
-            except VehicleModel.DoesNotExist:
-                logger.error(f"Invalid model ID: {model_id}")
-                return JsonResponse({'status': 'error', 'message': 'Invalid vehicle model'}, status=400)
-
-            v_type = None
-            if vehicle_type_id:
-                try:
-                    v_type = VehicleType.objects.get(id=vehicle_type_id, client_garage=client_garage)
-                    logger.info(f"Found VehicleType (ID: {v_type.id})")
-                except VehicleType.DoesNotExist:
-                    logger.warning(f"VehicleType {vehicle_type_id} not found, proceeding without type")
-
-            vehicle, created = Vehicle.objects.get_or_create(
-                client_garage=client_garage,
-                vehicle_number=vehicle_number,
-                defaults={
-                    'customer': customer,
-                    'company': company,
-                    'model': model,
-                    'type': v_type
-                }
-            )
-            if not created and (
-                vehicle.customer != customer or
-                vehicle.company != company or
-                vehicle.model != model or
-                vehicle.type != v_type
-            ):
-                vehicle.customer = customer
-                vehicle.company = company
-                vehicle.model = model
-                vehicle.type = v_type
-                vehicle.save()
-                logger.info(f"Updated vehicle {vehicle_number} (ID: {vehicle.id}) with new details")
-
-            service_order.vehicle = vehicle
-            service_order.customer = customer
-            service_order.complaint = required_fields['complaint'].strip()
-            service_order.priority = data.get('priority', 'normal')
-            service_order.helmet_given = data.get('helmetGiven', False)
-            service_order.key_given = data.get('keyGiven', False)
-            estimated_hours = int(data.get('estimatedTime', 1))
-            service_order.estimated_completion = (datetime.now() + timedelta(hours=estimated_hours)).time()
-
-            # Clear existing service items
-            service_order.service_items.all().delete()
-            service_order.service_type.clear()
-            logger.info(f"Cleared existing service items for order {service_order.order_no}")
-
-            # Add new service items
-            total = 0
-            bill_items = []
-            common_services = data.get('commonService', [])
-            for service_name in common_services:
-                try:
-                    service_type = ServiceType.objects.get(client_garage=client_garage, name=service_name)
-                    ServiceOrderItem.objects.create(
-                        service_order=service_order,
-                        service_type=service_type,
-                        price=service_type.base_price
-                    )
-                    total += service_type.base_price
-                    bill_items.append({'name': service_name, 'price': float(service_type.base_price)})
-                    service_order.service_type.add(service_type)
-                    logger.info(f"Added ServiceOrderItem and ServiceType {service_name} (ID: {service_type.id}) to order {service_order.order_no}")
-                except ServiceType.DoesNotExist:
-                    logger.warning(f"ServiceType {service_name} not found for client_garage {client_garage.id}")
-                    continue
-
-            service_order.total_so_far = total
-            # Update status based on mechanics
-            mechanic_ids = data.get('mechanic_ids', [])
-            service_order.status = 'in-progress' if mechanic_ids else 'waiting-assignment'
-
-            # Clear existing mechanics
-            service_order.mechanics.clear()
-            logger.info(f"Cleared existing mechanics for order {service_order.order_no}")
-
-            # Assign new mechanics
-            for mechanic_id in mechanic_ids:
-                try:
-                    mechanic = User.objects.get(id=mechanic_id, client_garage=client_garage, is_superuser=False)
-                    service_order.mechanics.add(mechanic)
-                    logger.info(f"Assigned mechanic {mechanic.username} (ID: {mechanic_id}) to order {service_order.order_no}")
-                except User.DoesNotExist:
-                    logger.warning(f"Invalid or unauthorized mechanic ID {mechanic_id} for order {service_order.order_no}")
-                    continue
-
-            service_order.save()
-            logger.info(f"Updated ServiceOrder {service_order.order_no} with new details")
-
-            # Update bill
-            bill = Bill.objects.filter(service_order=service_order).first()
-            if bill:
-                bill.customer = customer
-                bill.vehicle = vehicle
-                bill.status = 'Generated (In Progress)' if mechanic_ids else 'Pending'
-                bill.items = json.dumps(bill_items)
-                bill.total = total
-                bill.save()
-                logger.info(f"Updated bill {bill.bill_no} for order {service_order.order_no}")
-            else:
-                bill_no = f"B{str(datetime.now().timestamp()).replace('.', '')[-3:]}"
-                bill = Bill.objects.create(
-                    client_garage=client_garage,
-                    bill_no=bill_no,
-                    service_order=service_order,
-                    customer=customer,
-                    vehicle=vehicle,
-                    status='Generated (In Progress)' if mechanic_ids else 'Pending',
-                    items=json.dumps(bill_items),
-                    total=total
-                )
-                logger.info(f"Created new bill {bill_no} (ID: {bill.id}) for order {service_order.order_no}")
-
+            service_order, bill = update_job(service_order, request.user.client_fiscal_year_id, data)
             return JsonResponse({
                 'status': 'success',
                 'order_no': service_order.order_no,
                 'bill_id': bill.id
             })
+        except IntakeError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
         except ClientGarage.DoesNotExist:
             logger.error(f"No ClientGarage found for user {request.user.username}")
             return JsonResponse({'status': 'error', 'message': 'Client garage not found for this user'}, status=404)
@@ -726,7 +372,7 @@ def update_service_order(request):
 def staff_list(request):
     logger.info(f"User {request.user.username} fetching staff list")
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         logger.info(f"Found ClientGarage {client_garage.name} for user {request.user.username}")
         
         mechanics = User.objects.filter(
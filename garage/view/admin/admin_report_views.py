@@ -2,7 +2,7 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.views import View
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
@@ -16,12 +16,173 @@ from django.core.exceptions import ValidationError
 from django.contrib import messages
 import os
 import re
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
+from django.utils import timezone
 
-from garage.models import User, FinancialYear, SoftwareInfo, ClientGarage, ClientFiscalYear
+from garage.models import User, FinancialYear, SoftwareInfo, ClientGarage, ClientFiscalYear, DailySalesRollup
+from garage.services.exports import bills_export, export_format, export_response, parts_export, service_orders_export
+from garage.services.jobs import enqueue, queued_response, wants_background
+from garage.services.receipt_export import FORMATS, export_bills, export_progress, stream_merged_pdf, stream_zip
+from garage.services.sales_rollup import AMOUNTS
 
 @login_required
 def admin_report_views(request):
     if request.user.is_superuser or request.user.role != 'admin':
         return redirect(f'/{request.user.role}/dashboard/')
-    return render(request, 'admin/reports.html', {'user': request.user})
\ No newline at end of file
+    return render(request, 'admin/reports.html', {'user': request.user})
+
+@login_required
+def sales_report(request):
+    """Sales totals per day or month, read from the daily sales rollup."""
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    client_garage = request.user.client_garage
+    if not client_garage:
+        return JsonResponse({'error': 'Client garage not found'}, status=404)
+
+    try:
+        end_date = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else timezone.localdate()
+        start_date = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') else end_date - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+    group = request.GET.get('group', 'day')
+    if group not in ('day', 'month'):
+        return JsonResponse({'error': 'group must be day or month'}, status=400)
+
+    rows = DailySalesRollup.objects.filter(
+        client_garage=client_garage,
+        date__gte=start_date,
+        date__lte=end_date,
+        bill_count__gt=0
+    ).order_by('date', 'payment_mode').values('date', 'payment_mode', 'bill_count', *AMOUNTS)
+
+    periods = {}
+    totals = dict({name: 0.0 for name in AMOUNTS}, bill_count=0, payment_modes={})
+    for row in rows:
+        period = row['date'].strftime('%Y-%m' if group == 'month' else '%Y-%m-%d')
+        entry = periods.setdefault(period, dict({name: 0.0 for name in AMOUNTS}, period=period, bill_count=0, payment_modes={}))
+        for target in (entry, totals):
+            target['bill_count'] += row['bill_count']
+            for name in AMOUNTS:
+                target[name] += float(row[name])
+            target['payment_modes'][row['payment_mode']] = target['payment_modes'].get(row['payment_mode'], 0.0) + float(row['total'])
+
+    return JsonResponse({
+        'from': start_date.strftime('%Y-%m-%d'),
+        'to': end_date.strftime('%Y-%m-%d'),
+        'group': group,
+        'rows': list(periods.values()),
+        'totals': totals,
+    })
+
+
+@login_required
+def export_bill_pdfs(request):
+    """Stream the receipts of every bill in a date range as a zip or one merged PDF."""
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    client_garage = request.user.client_garage
+    if not client_garage:
+        return JsonResponse({'error': 'Client garage not found'}, status=404)
+
+    try:
+        end_date = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else timezone.localdate()
+        start_date = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') else end_date.replace(day=1)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'error': 'from must not be after to'}, status=400)
+    export_format = request.GET.get('format', 'zip')
+    if export_format not in FORMATS:
+        return JsonResponse({'error': 'format must be zip or pdf'}, status=400)
+    # The client may pick the id so it can poll before the download starts.
+    export_id = request.GET.get('export_id') or uuid.uuid4().hex
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', export_id):
+        return JsonResponse({'error': 'Invalid export_id'}, status=400)
+
+    if wants_background(request):
+        job = enqueue(
+            'export_bill_pdfs', client_garage, request.user,
+            **{'from': start_date.isoformat(), 'to': end_date.isoformat(), 'format': export_format}
+        )
+        return queued_response(job)
+
+    bills = export_bills(client_garage, start_date, end_date)
+    stream = stream_zip if export_format == 'zip' else stream_merged_pdf
+    response = StreamingHttpResponse(
+        stream(client_garage, bills, export_id),
+        content_type='application/zip' if export_format == 'zip' else 'application/pdf'
+    )
+    filename = f"bills_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Export-Id'] = export_id
+    return response
+
+
+@login_required
+def bill_pdf_export_status(request):
+    """Progress of a running or recent bill PDF export."""
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    client_garage = request.user.client_garage
+    if not client_garage:
+        return JsonResponse({'error': 'Client garage not found'}, status=404)
+
+    progress = export_progress(client_garage.pk, request.GET.get('export_id', ''))
+    if progress is None:
+        return JsonResponse({'error': 'Export not found'}, status=404)
+    return JsonResponse(dict(progress, export_id=request.GET['export_id']))
+
+
+def _export_dates(request):
+    """Optional ``from``/``to`` (YYYY-MM-DD) of an export; raises ValueError."""
+    start_date = datetime.strptime(request.GET['from'], '%Y-%m-%d').date() if request.GET.get('from') else None
+    end_date = datetime.strptime(request.GET['to'], '%Y-%m-%d').date() if request.GET.get('to') else None
+    return start_date, end_date
+
+
+def _export_view(request, build_spec, filename):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    client_garage = request.user.client_garage
+    if not client_garage:
+        return JsonResponse({'error': 'Client garage not found'}, status=404)
+    requested_format = export_format(request)
+    if requested_format is None:
+        return JsonResponse({'error': 'format must be csv or xlsx'}, status=400)
+    try:
+        start_date, end_date = _export_dates(request)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+    return export_response(build_spec(client_garage, start_date, end_date), requested_format, filename)
+
+
+@login_required
+def export_inventory(request):
+    """Parts of the current fiscal year as CSV or XLSX."""
+    return _export_view(
+        request,
+        lambda client_garage, start_date, end_date: parts_export(client_garage, request.user.client_fiscal_year),
+        'inventory'
+    )
+
+
+@login_required
+def export_bills_table(request):
+    """Bills created between ``from`` and ``to`` as CSV or XLSX."""
+    def build(client_garage, start_date, end_date):
+        start = timezone.make_aware(datetime.combine(start_date, datetime.min.time())) if start_date else None
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time())) if end_date else None
+        return bills_export(client_garage, start, end)
+    return _export_view(request, build, 'bills')
+
+
+@login_required
+def export_service_orders(request):
+    """Service orders dated between ``from`` and ``to`` as CSV or XLSX."""
+    return _export_view(
+        request,
+        lambda client_garage, start_date, end_date: service_orders_export(client_garage, start_date, end_date),
+        'service_orders'
+    )
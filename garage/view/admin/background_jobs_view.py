@@ -0,0 +1,43 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, JsonResponse
+import logging
+import os
+
+from garage.models import BackgroundJob
+from garage.services.jobs import job_as_dict, media_path
+
+logger = logging.getLogger(__name__)
+
+@login_required
+def get_jobs(request):
+    """The garage's 20 most recent background jobs."""
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    jobs = BackgroundJob.objects.filter(client_garage=request.user.client_garage).order_by('-created_at', '-id')[:20]
+    return JsonResponse({'jobs': [job_as_dict(job) for job in jobs]})
+
+@login_required
+def get_job(request, job_id):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    try:
+        job = BackgroundJob.objects.get(pk=job_id, client_garage=request.user.client_garage)
+    except BackgroundJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    data = job_as_dict(job)
+    if job.result_file:
+        data['download_url'] = f"/admin/jobs/{job.pk}/download/"
+    return JsonResponse(data)
+
+@login_required
+def download_job_file(request, job_id):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    try:
+        job = BackgroundJob.objects.get(pk=job_id, client_garage=request.user.client_garage, status='succeeded')
+    except BackgroundJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    if not job.result_file or not os.path.exists(media_path(job.result_file)):
+        logger.error(f"Result file of job {job.pk} is missing for user {request.user.username}")
+        return JsonResponse({'error': 'Job has no result file'}, status=404)
+    return FileResponse(open(media_path(job.result_file), 'rb'), as_attachment=True, filename=os.path.basename(job.result_file))
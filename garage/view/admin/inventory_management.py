@@ -2,13 +2,22 @@ from decimal import Decimal
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Sum, Count, Q
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch, Q
 from django.core.paginator import Paginator
-from garage.models import Supplier, PurchaseOrder, PurchaseOrderItem, SupplierPayment, Part, ClientGarage, ClientFiscalYear, TaxSetting, VehicleCompany, VehicleType, VehicleModel, PartCategory
-from django.utils import timezone
-from datetime import date, timedelta
+from garage.models import Supplier, PurchaseOrder, PurchaseOrderItem, Part, StockMovement, ClientGarage, ClientFiscalYear, VehicleCompany, VehicleType, VehicleModel, PartCategory
+from datetime import date
 import json
 import logging
+from garage.services.pagination import InvalidCursor, keyset_page, wants_cursor
+from garage.services.part_search import search_parts
+from garage.services.purchases import PurchaseError, clean_lines, read_invoice
+from garage.services.purchases import create_purchase_order as create_purchase
+from garage.services.spreadsheet_import import ImportFileError
+from garage.services.stock import set_stock, stock_as_of
+from garage.services.supplier_ledger import SupplierLedgerError, record_payment, supplier_details
+from garage.services.stock_alerts import alert_as_dict, low_stock_alerts, reorder_suggestions
+from garage.services.tenant_context import get_request_garage, get_request_tax_setting
 from django.views.decorators.http import require_http_methods
 
 from django.contrib.auth.decorators import login_required
@@ -19,6 +28,11 @@ from garage.models import VehicleType, ClientGarage
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Keyset order for cursor pagination of the name-sorted lists.
+NAME_KEYS = [('name', False), ('id', False)]
+# Inventory search pages through at most this many ranked matches.
+INVENTORY_SEARCH_LIMIT = 1000
+
 @login_required
 def inventory_management(request):
     if request.user.is_superuser or request.user.role != 'admin':
@@ -30,7 +44,7 @@ def get_tax_settings(request):
     if request.user.is_superuser or request.user.role != 'admin':
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     try:
-        tax_setting = TaxSetting.objects.filter(client_garage=request.user.client_garage).first()
+        tax_setting = get_request_tax_setting(request)
         if not tax_setting:
             return JsonResponse({'tax_rate': 13.0, 'include_in_bill': True}, status=200)
         return JsonResponse({
@@ -55,88 +69,63 @@ def create_purchase_order(request):
                 return JsonResponse({'error': 'Supplier, payment mode, and items are required'}, status=400)
             
             supplier = Supplier.objects.get(pk=supplier_id, client_garage=request.user.client_garage)
-            tax_setting = TaxSetting.objects.filter(client_garage=request.user.client_garage).first()
-            tax_rate = tax_setting.tax_rate / 100 if tax_setting and tax_setting.include_in_bill else 0
-            subtotal = sum(item['quantity'] * item['rate'] for item in items)
-            tax = subtotal * tax_rate
-            total = subtotal + tax
-            
-            if payment_mode == 'credit' and (supplier.current_credit + total) > supplier.credit_limit:
-                return JsonResponse({'error': 'Credit limit exceeded'}, status=400)
-            
-            purchase_no = f"PO{timezone.now().strftime('%Y%m%d%H%M%S')}"
-            due_date = None
-            if payment_mode == 'credit':
-                days = int(supplier.payment_terms.split('-')[0]) if supplier.payment_terms != 'immediate' else 0
-                due_date = date.today() + timedelta(days=days)
-            
-            purchase_order = PurchaseOrder.objects.create(
-                client_garage=request.user.client_garage,
-                client_fiscal_year=request.user.client_fiscal_year,
-                supplier=supplier,
-                purchase_no=purchase_no,
-                date=date.today(),
-                subtotal=subtotal,
-                tax=tax,
-                total=total,
-                payment_mode=payment_mode,
-                status='pending' if payment_mode == 'credit' else 'paid',
-                due_date=due_date
+            create_purchase(
+                request.user.client_garage,
+                request.user.client_fiscal_year,
+                supplier,
+                payment_mode,
+                clean_lines(items),
+                get_request_tax_setting(request)
             )
-            
-            for item in items:
-                part = Part.objects.filter(client_garage=request.user.client_garage, code=item['code']).first()
-                vehicle_company = VehicleCompany.objects.filter(client_garage=request.user.client_garage, name=item['vehicle_company']).first() if item.get('vehicle_company') else None
-                vehicle_type = VehicleType.objects.filter(client_garage=request.user.client_garage, name=item['vehicle_type']).first() if item.get('vehicle_type') else None
-                vehicle_model = VehicleModel.objects.filter(client_garage=request.user.client_garage, name=item['vehicle_model']).first() if item.get('vehicle_model') else None
-                if not part:
-                    part = Part.objects.create(
-                        client_garage=request.user.client_garage,
-                        client_fiscal_year=request.user.client_fiscal_year,
-                        code=item['code'] or f"PART{timezone.now().strftime('%Y%m%d%H%M%S')}",
-                        name=item['name'],
-                        category=PartCategory.objects.filter(client_garage=request.user.client_garage, name=supplier.category).first() or PartCategory.objects.filter(client_garage=request.user.client_garage).first(),
-                        supplier=supplier,
-                        purchase_price=item['rate'],
-                        selling_price=item['sellingPrice'],
-                        vehicle_company=vehicle_company,
-                        vehicle_type=vehicle_type,
-                        vehicle_model=vehicle_model,
-                        in_stock=item['quantity'],
-                        min_stock=5,
-                        status='in-stock' if item['quantity'] > 5 else 'low-stock'
-                    )
-                else:
-                    part.in_stock += item['quantity']
-                    part.vehicle_company = vehicle_company
-                    part.vehicle_type = vehicle_type
-                    part.vehicle_model = vehicle_model
-                    part.purchase_price = item['rate']
-                    part.selling_price = item['sellingPrice']
-                    part.last_movement = date.today()
-                    part.movement_type = 'added'
-                    part.status = 'out-of-stock' if part.in_stock == 0 else 'low-stock' if part.in_stock <= part.min_stock else 'in-stock'
-                    part.save()
-                
-                PurchaseOrderItem.objects.create(
-                    purchase_order=purchase_order,
-                    part=part,
-                    quantity=item['quantity'],
-                    rate=item['rate'],
-                    amount=item['quantity'] * item['rate']
-                )
-            
-            if payment_mode == 'credit':
-                supplier.current_credit += total
-                supplier.save()
-            
             return JsonResponse({'message': 'Purchase order created successfully'}, status=200)
         except Supplier.DoesNotExist:
             return JsonResponse({'error': 'Supplier not found'}, status=404)
+        except PurchaseError as e:
+            return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
+@login_required
+def upload_purchase_invoice(request):
+    """Create a purchase order from a supplier invoice spreadsheet (CSV or XLSX, columns as purchases.INVOICE_COLUMNS)."""
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=400)
+    supplier_id = request.POST.get('supplierId')
+    payment_mode = request.POST.get('paymentMode')
+    invoice = request.FILES.get('file')
+    if not all([supplier_id, payment_mode, invoice]):
+        return JsonResponse({'error': 'Supplier, payment mode, and invoice file are required'}, status=400)
+    try:
+        supplier = Supplier.objects.get(pk=supplier_id, client_garage=request.user.client_garage)
+        lines = read_invoice(invoice)
+        purchase_order = create_purchase(
+            request.user.client_garage,
+            request.user.client_fiscal_year,
+            supplier,
+            payment_mode,
+            lines,
+            get_request_tax_setting(request)
+        )
+        logger.info(f"User {request.user.username} imported {len(lines)} invoice lines into {purchase_order.purchase_no}")
+        return JsonResponse({
+            'message': 'Purchase order created successfully',
+            'purchase_no': purchase_order.purchase_no,
+            'lines': len(lines),
+            'total': float(purchase_order.total)
+        }, status=200)
+    except Supplier.DoesNotExist:
+        return JsonResponse({'error': 'Supplier not found'}, status=404)
+    except ImportFileError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except PurchaseError as e:
+        return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
+    except Exception as e:
+        logger.error(f"Error importing purchase invoice: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
 # Other views (unchanged)
 @login_required
 def get_suppliers(request):
@@ -152,10 +141,17 @@ def get_suppliers(request):
         client_fiscal_year=request.user.client_fiscal_year
     ).filter(
         Q(name__icontains=search_term) | Q(category__icontains=search_term) | Q(phone__icontains=search_term)
-    ).order_by('name')
+    ).annotate(last_purchase=Max('purchase_orders__date')).order_by('name')
     
-    paginator = Paginator(suppliers, per_page)
-    page_obj = paginator.get_page(page)
+    if wants_cursor(request):
+        try:
+            page_obj, cursor_meta = keyset_page(request, suppliers, NAME_KEYS, per_page)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    else:
+        paginator = Paginator(suppliers, per_page)
+        page_obj = paginator.get_page(page)
+        cursor_meta = {'total_pages': paginator.num_pages, 'current_page': page}
     
     return JsonResponse({
         'suppliers': [{
@@ -171,10 +167,9 @@ def get_suppliers(request):
             'paymentTerms': s.payment_terms,
             'category': s.category,
             'status': s.status,
-            'lastPurchase': s.purchase_orders.order_by('-date').first().date.strftime('%Y-%m-%d') if s.purchase_orders.exists() else ''
+            'lastPurchase': s.last_purchase.strftime('%Y-%m-%d') if s.last_purchase else ''
         } for s in page_obj],
-        'total_pages': paginator.num_pages,
-        'current_page': page
+        **cursor_meta
     }, status=200)
 
 @login_required
@@ -230,6 +225,8 @@ def get_purchase_orders(request):
     purchase_orders = PurchaseOrder.objects.filter(
         client_garage=request.user.client_garage,
         client_fiscal_year=request.user.client_fiscal_year
+    ).select_related('supplier').prefetch_related(
+        Prefetch('items', queryset=PurchaseOrderItem.objects.select_related('part'))
     ).order_by('-date')
     
     paginator = Paginator(purchase_orders, per_page)
@@ -273,39 +270,19 @@ def make_supplier_payment(request):
             if not supplier_id:
                 logger.warning("Supplier ID is missing in payment request")
                 return JsonResponse({'error': 'Supplier ID is required'}, status=400)
-            if amount <= 0:
-                logger.warning(f"Invalid payment amount: {amount}")
-                return JsonResponse({'error': 'Payment amount must be positive'}, status=400)
 
             supplier = Supplier.objects.get(pk=supplier_id, client_garage=request.user.client_garage)
-            if amount > supplier.current_credit:
-                logger.warning(f"Payment amount {amount} exceeds current credit {supplier.current_credit}")
-                return JsonResponse({'error': 'Payment amount cannot exceed current credit'}, status=400)
-
-            # Create payment record
-            payment = SupplierPayment.objects.create(
-                client_garage=request.user.client_garage,
-                supplier=supplier,
-                purchase_order=PurchaseOrder.objects.get(pk=purchase_order_id) if purchase_order_id else None,
-                amount=amount,
-                payment_date=timezone.now().date()
-            )
-
-            # Update supplier's current credit
-            supplier.current_credit -= amount
-            supplier.save()
-
-            # Update purchase order status if linked
-            if purchase_order_id:
-                po = PurchaseOrder.objects.get(pk=purchase_order_id, client_garage=request.user.client_garage)
-                total_paid = SupplierPayment.objects.filter(purchase_order=po).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-                po.status = 'paid' if total_paid >= po.total else 'partially_paid'
-                po.save()
-                logger.info(f"Updated purchase order {po.purchase_no}: status={po.status}, total_paid={total_paid}")
+            purchase_order = PurchaseOrder.objects.get(
+                pk=purchase_order_id, supplier=supplier, client_garage=request.user.client_garage
+            ) if purchase_order_id else None
+            record_payment(supplier, amount, purchase_order)
 
             logger.info(f"Payment of {amount} recorded for supplier {supplier.name} (ID: {supplier.id}) by user {request.user.username}")
             return JsonResponse({'message': 'Payment recorded successfully'}, status=200)
 
+        except SupplierLedgerError as e:
+            logger.warning(f"Rejected supplier payment: {str(e)}")
+            return JsonResponse({'error': str(e)}, status=400)
         except Supplier.DoesNotExist:
             logger.warning(f"Supplier ID {supplier_id} not found for client_garage {request.user.client_garage.id}")
             return JsonResponse({'error': 'Supplier not found'}, status=404)
@@ -334,11 +311,28 @@ def get_inventory(request):
     
     if category != 'all':
         parts = parts.filter(category__name=category)
+    ranked_ids = None
     if search_term:
-        parts = parts.filter(Q(name__icontains=search_term) | Q(code__icontains=search_term))
+        ranked_ids = search_parts(request.user.client_garage, search_term, limit=INVENTORY_SEARCH_LIMIT)
+        parts = parts.filter(id__in=ranked_ids)
     
-    paginator = Paginator(parts.order_by('name'), per_page)
-    page_obj = paginator.get_page(page)
+    if wants_cursor(request):
+        try:
+            page_obj, cursor_meta = keyset_page(request, parts, NAME_KEYS, per_page)
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    elif ranked_ids is not None:
+        # Best matches first: page through the ranked ids, then load the page.
+        matched = set(parts.values_list('id', flat=True))
+        paginator = Paginator([part_id for part_id in ranked_ids if part_id in matched], per_page)
+        page_ids = paginator.get_page(page).object_list
+        loaded = parts.in_bulk(page_ids)
+        page_obj = [loaded[part_id] for part_id in page_ids]
+        cursor_meta = {'total_pages': paginator.num_pages, 'current_page': page}
+    else:
+        paginator = Paginator(parts.order_by('name'), per_page)
+        page_obj = paginator.get_page(page)
+        cursor_meta = {'total_pages': paginator.num_pages, 'current_page': page}
     
     return JsonResponse({
         'parts': [{
@@ -359,8 +353,7 @@ def get_inventory(request):
             'status': p.status,
             'image': p.image.url if p.image else ''
         } for p in page_obj],
-        'total_pages': paginator.num_pages,
-        'current_page': page
+        **cursor_meta
     }, status=200)
 
 @login_required
@@ -405,10 +398,7 @@ def save_inventory(request):
             part.supplier = None  # Set supplier to None as per requirement
             part.purchase_price = float(data.get('purchasePrice', 0))
             part.selling_price = float(data.get('sellingPrice', 0))
-            part.in_stock = int(data.get('quantity', 0))
-            part.status = 'out-of-stock' if part.in_stock == 0 else 'in-stock'  # Simplified status without min_stock
-            part.last_movement = date.today()
-            part.movement_type = 'updated' if part_id else 'added'
+            quantity = int(data.get('quantity', 0))
 
             # Handle image upload
             if files and 'image' in files:
@@ -418,7 +408,18 @@ def save_inventory(request):
                     part.image.delete(save=False)
                 part.image = new_image
                 logger.info(f"User {request.user.username} uploaded image for Part {part.id} ({part.name})")
-            part.save()
+            with transaction.atomic():
+                if part.pk:
+                    # in_stock, status and the movement fields belong to the stock ledger
+                    part.save(update_fields=[
+                        'name', 'category', 'vehicle_company', 'vehicle_type', 'vehicle_model', 'supplier',
+                        'purchase_price', 'selling_price', 'image', 'updated_at'
+                    ])
+                else:
+                    part.in_stock = 0
+                    part.status = 'out-of-stock'
+                    part.save()
+                set_stock(part, quantity, 'adjusted' if part_id else 'added')
             
             return JsonResponse({
                 'message': 'Inventory item saved successfully',
@@ -439,10 +440,9 @@ def search_items(request):
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
     search_term = request.GET.get('term', '')
-    parts = Part.objects.filter(
-        client_garage=request.user.client_garage,
-        name__istartswith=search_term
-    )[:10]
+    part_ids = search_parts(request.user.client_garage, search_term, limit=10)
+    loaded = Part.objects.select_related('category', 'vehicle_company', 'vehicle_type', 'vehicle_model').in_bulk(part_ids)
+    parts = [loaded[part_id] for part_id in part_ids if part_id in loaded]
     
     return JsonResponse([{
         'id': p.id,
@@ -496,7 +496,7 @@ def get_vehicle_models_a(request):
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         company_id = request.GET.get('company_id')
         type_id = request.GET.get('type_id')
         
@@ -519,7 +519,7 @@ def get_vehicle_models_a(request):
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         company_id = request.GET.get('company_id')
         type_id = request.GET.get('type_id')
         
@@ -579,18 +579,8 @@ def get_supplier_details(request, supplier_id):
         return JsonResponse({'error': 'Unauthorized'}, status=403)
     
     try:
-        supplier = Supplier.objects.get(pk=supplier_id, client_garage=request.user.client_garage)
-        purchase_orders = PurchaseOrder.objects.filter(
-            supplier=supplier,
-            client_garage=request.user.client_garage
-        ).order_by('-date')
-        
-        total_purchases = purchase_orders.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-        total_paid = SupplierPayment.objects.filter(
-            supplier=supplier,
-            client_garage=request.user.client_garage
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-        
+        details = supplier_details(request.user.client_garage, supplier_id, request.GET.get('page', 1))
+        supplier = details['supplier']
         response_data = {
             'supplier': {
                 'id': supplier.id,
@@ -605,7 +595,7 @@ def get_supplier_details(request, supplier_id):
                 'current_credit': float(supplier.current_credit),
                 'payment_terms': supplier.payment_terms,
                 'status': supplier.status,
-                'last_purchase': supplier.purchase_orders.order_by('-date').first().date.strftime('%Y-%m-%d') if supplier.purchase_orders.exists() else ''
+                'last_purchase': details['last_purchase'].strftime('%Y-%m-%d') if details['last_purchase'] else ''
             },
             'purchase_orders': [{
                 'id': po.id,
@@ -614,6 +604,8 @@ def get_supplier_details(request, supplier_id):
                 'subtotal': float(po.subtotal),
                 'tax': float(po.tax),
                 'total': float(po.total),
+                'amount_paid': float(po.amount_paid),
+                'outstanding': float(po.total - po.amount_paid),
                 'payment_mode': po.payment_mode,
                 'status': po.status,
                 'due_date': po.due_date.strftime('%Y-%m-%d') if po.due_date else '',
@@ -627,13 +619,11 @@ def get_supplier_details(request, supplier_id):
                     'vehicle_type': item.part.vehicle_type.name if item.part.vehicle_type else '',
                     'vehicle_model': item.part.vehicle_model.name if item.part.vehicle_model else ''
                 } for item in po.items.all()]
-            } for po in purchase_orders],
-            'summary': {
-                'total_purchases': float(total_purchases),
-                'total_paid': float(total_paid),
-                'outstanding_balance': float(total_purchases - total_paid),
-                'total_orders': purchase_orders.count()
-            }
+            } for po in details['purchase_orders']],
+            'summary': details['summary'],
+            'aging': details['aging'],
+            'total_pages': details['total_pages'],
+            'current_page': details['current_page']
         }
         return JsonResponse(response_data, status=200)
     except Supplier.DoesNotExist:
@@ -641,4 +631,81 @@ def get_supplier_details(request, supplier_id):
         return JsonResponse({'error': 'Supplier not found'}, status=404)
     except Exception as e:
         logger.error(f"Error fetching supplier details: {str(e)}")
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+def get_stock_movements(request, part_id):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    try:
+        part = Part.objects.get(pk=part_id, client_garage=request.user.client_garage)
+        movements = StockMovement.objects.filter(part=part).order_by('-created_at', '-id')
+        paginator = Paginator(movements, 50)
+        page_obj = paginator.get_page(request.GET.get('page', 1))
+        return JsonResponse({
+            'part': {'id': part.id, 'name': part.name, 'code': part.code, 'in_stock': part.in_stock, 'status': part.status},
+            'movements': [{
+                'id': m.id,
+                'type': m.movement_type,
+                'quantity': m.quantity,
+                'balance_after': m.balance_after,
+                'reference': m.reference,
+                'created_at': m.created_at.isoformat()
+            } for m in page_obj],
+            'total_pages': paginator.num_pages,
+            'current_page': page_obj.number
+        }, status=200)
+    except Part.DoesNotExist:
+        return JsonResponse({'error': 'Part not found'}, status=404)
+    except Exception as e:
+        logger.error(f"Error fetching stock movements: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+def get_stock_as_of(request):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    try:
+        day = date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        return JsonResponse({'error': 'date must be YYYY-MM-DD'}, status=400)
+    try:
+        parts = Part.objects.all()
+        if request.GET.get('search'):
+            parts = parts.filter(id__in=search_parts(request.user.client_garage, request.GET['search'], limit=INVENTORY_SEARCH_LIMIT))
+        balances = stock_as_of(request.user.client_garage, day, parts)
+        names = dict(parts.filter(client_garage=request.user.client_garage).values_list('pk', 'name'))
+        return JsonResponse({
+            'date': day.isoformat(),
+            'items': [{'id': part_id, 'name': names[part_id], 'quantity': quantity} for part_id, quantity in sorted(balances.items())]
+        }, status=200)
+    except Exception as e:
+        logger.error(f"Error computing stock as of {day}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+def get_low_stock_alerts(request):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    alerts = low_stock_alerts(request.user.client_garage)
+    return JsonResponse({'alerts': [alert_as_dict(alert) for alert in alerts], 'count': len(alerts)}, status=200)
+
+
+@login_required
+def get_reorder_suggestions(request):
+    if request.user.is_superuser or request.user.role != 'admin':
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+    try:
+        days = max(1, int(request.GET.get('days', 30)))
+        cover_days = max(1, int(request.GET.get('cover_days', 14)))
+    except ValueError:
+        return JsonResponse({'error': 'days and cover_days must be whole numbers'}, status=400)
+    try:
+        suggestions = reorder_suggestions(request.user.client_garage, days, cover_days)
+        return JsonResponse({'days': days, 'cover_days': cover_days, 'suggestions': suggestions}, status=200)
+    except Exception as e:
+        logger.error(f"Error building reorder suggestions: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
@@ -3,16 +3,17 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
-from garage.models import ClientGarage, Customer, ServiceOrderItem, TaxSetting, Vehicle, Bill, BillItem, ServiceOrder, Part, PartCategory, ServiceType
+from garage.models import ClientGarage, Customer, DailySalesRollup, TaxSetting, Vehicle, Bill, ServiceOrder, Part, PartCategory, ServiceType
+from garage.services.bill_listing import BILL_KEYS, DEFAULT_PER_PAGE, MAX_PER_PAGE, bill_detail, bill_queryset, bill_summary, filter_bills, with_listing_relations
+from garage.services.catalog_index import get_catalog_index
+from garage.services.pagination import InvalidCursor, keyset_page, per_page_from, wants_cursor
+from garage.services.part_search import search_parts
+from garage.services.receipts import discard_receipts, get_receipt_pdf, receipt_bill_queryset
+from garage.services.sequences import BILL, next_number
+from garage.services.tenant_context import get_request_garage, get_request_tax_setting
+from garage.services.billing import InsufficientStockError, commit_bill, delete_bill_and_restock, merge_service_order_items
 import json
 import logging
-from django.db.models import Q
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import io
 import uuid
 
 logger = logging.getLogger(__name__)
@@ -20,43 +21,18 @@ logger = logging.getLogger(__name__)
 @login_required
 def get_items(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         search_query = request.GET.get('q', '')
-        
-        parts = Part.objects.filter(client_garage=client_garage)
-        if search_query:
-            parts = parts.filter(Q(name__icontains=search_query) | Q(code__icontains=search_query))
-        
-        services = ServiceType.objects.filter(client_garage=client_garage)
-        if search_query:
-            services = services.filter(Q(name__icontains=search_query))
-        
-        results = [
-            {
-                'id': part.id,
-                'code': part.code,
-                'name': part.name,
-                'price': float(part.selling_price),
-                'category': part.category.name if part.category else 'Uncategorized',
-                'inStock': part.in_stock,
-                'image': part.image.url if part.image else None,  # Include image URL or None
-                'isService': False
-            }
-            for part in parts
-        ] + [
-            {
-                'id': f"service-{service.id}",
-                'code': f"SVC-{service.id}",
-                'name': service.name,
-                'price': float(service.base_price),
-                'category': 'Service',
-                'inStock': 9999,
-                'image': None,  # Services have no image
-                'isService': True
-            }
-            for service in services
-        ]
-        
+        match = request.GET.get('match', 'substring')
+
+        index = get_catalog_index(client_garage)
+        if search_query.strip():
+            # Parts best match first (garage.services.part_search), then services.
+            part_ids = search_parts(client_garage, search_query, limit=None, prefix=match == 'prefix')
+            results = index.part_items(part_ids) + index.service_items(search_query, mode=match)
+        else:
+            results = index.search(search_query, mode=match)
+
         logger.info(f"Fetched {len(results)} items (parts and services) for user {request.user.username}")
         return JsonResponse({'items': results})
     except ClientGarage.DoesNotExist:
@@ -65,6 +41,26 @@ def get_items(request):
     except Exception as e:
         logger.error(f"Error in get_items for user {request.user.username}: {str(e)}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+@login_required
+def get_items_delta(request):
+    """Items changed since the client's last stamp, so the POS page can keep its own catalog copy."""
+    try:
+        client_garage = get_request_garage(request)
+        try:
+            since = float(request.GET.get('since') or 0)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid since stamp'}, status=400)
+
+        delta = get_catalog_index(client_garage).changes_since(since)
+        logger.info(f"Sent {len(delta['items'])} catalog changes since {since} to user {request.user.username}")
+        return JsonResponse(delta)
+    except ClientGarage.DoesNotExist:
+        logger.error(f"No ClientGarage found for user {request.user.username}")
+        return JsonResponse({'status': 'error', 'message': 'Client garage not found'}, status=404)
+    except Exception as e:
+        logger.error(f"Error in get_items_delta for user {request.user.username}: {str(e)}")
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     
 # Other views remain unchanged
 @login_required
@@ -74,7 +70,7 @@ def pos_billing(request):
         return redirect(f'/{request.user.role}/dashboard/')
     
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         initial_data = {}
         bill_id = request.GET.get('bill_id')
         vehicle_id = request.GET.get('vehicle_id')
@@ -193,7 +189,7 @@ def pos_billing(request):
 @login_required
 def get_item(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         item_id = request.GET.get('item_id')
         is_service = item_id.startswith('service-')
         if is_service:
@@ -227,71 +223,24 @@ def get_item(request):
 @login_required
 def get_bills(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         status_filter = request.GET.get('status', 'all')
         search_query = request.GET.get('q', '')
         page = int(request.GET.get('page', 1))
-        items_per_page = 10
+        items_per_page = per_page_from(request, DEFAULT_PER_PAGE, MAX_PER_PAGE)
         
-        bills = Bill.objects.filter(client_garage=client_garage).order_by('-created_at')
+        bills = filter_bills(bill_queryset(client_garage), status_filter, search_query).order_by('-created_at')
         
-        if status_filter != 'all':
-            statuses = status_filter.split(',')
-            normalized_statuses = [s if s != 'in-progress' else 'Generated (In Progress)' for s in statuses]
-            bills = bills.filter(Q(status__in=normalized_statuses))
-        
-        if search_query:
-            bills = bills.filter(
-                Q(bill_no__icontains=search_query) |
-                Q(customer__name__icontains=search_query) |
-                Q(vehicle__vehicle_number__icontains=search_query) |
-                Q(service_order__order_no__icontains=search_query)
-            )
+        if wants_cursor(request):
+            page_bills, meta = keyset_page(request, bills, BILL_KEYS, items_per_page)
+            results = [bill_summary(bill) for bill in page_bills]
+            logger.info(f"Fetched {len(results)} bills for user {request.user.username} by cursor")
+            return JsonResponse({'bills': results, **meta})
         
         total = bills.count()
         start = (page - 1) * items_per_page
         end = start + items_per_page
-        paginated_bills = bills[start:end]
-        
-        results = []
-        for bill in paginated_bills:
-            bill_items = [
-                {
-                    'id': f"service-{bi.service_type.id}" if bi.service_type else bi.item.id if bi.item else f"temp-{uuid.uuid4().hex[:8]}",
-                    'name': bi.name,
-                    'price': float(bi.price),
-                    'quantity': bi.quantity,
-                    'isService': bi.service_type is not None
-                }
-                for bi in bill.bill_items.all()
-            ]
-            # Add ServiceOrderItems if service_order exists
-            if bill.service_order:
-                service_order_items = ServiceOrderItem.objects.filter(service_order=bill.service_order)
-                for service_item in service_order_items:
-                    if not any(item['id'] == f"service-{service_item.service_type.id}" for item in bill_items):
-                        bill_items.append({
-                            'id': f"service-{service_item.service_type.id}",
-                            'name': service_item.service_type.name,
-                            'price': float(service_item.price),
-                            'quantity': 1,
-                            'isService': True
-                        })
-            
-            results.append({
-                'id': bill.id,
-                'bill_no': bill.bill_no,
-                'customer_id': bill.customer.id if bill.customer else None,
-                'customer_name': bill.customer.name if bill.customer else 'Anonymous',
-                'customer_phone': bill.customer.phone if bill.customer else '',
-                'vehicle_id': bill.vehicle.id if bill.vehicle else None,
-                'vehicle_number': bill.vehicle.vehicle_number if bill.vehicle else 'N/A',
-                'order_no': bill.service_order.order_no if bill.service_order else None,
-                'total': float(bill.total),
-                'status': 'in-progress' if bill.status == 'Generated (In Progress)' else bill.status.lower(),
-                'date': bill.created_at.strftime('%Y-%m-%d'),
-                'items': bill_items
-            })
+        results = [bill_summary(bill) for bill in bills[start:end]]
         
         logger.info(f"Fetched {len(results)} bills for user {request.user.username}, page {page}")
         return JsonResponse({
@@ -300,6 +249,8 @@ def get_bills(request):
             'page': page,
             'items_per_page': items_per_page
         })
+    except InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except Exception as e:
         logger.error(f"Error in get_bills for user {request.user.username}: {str(e)}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
@@ -310,7 +261,7 @@ def get_bills(request):
 def save_customer(request):
     try:
         data = json.loads(request.body)
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         name = data.get('name', 'Anonymous').strip()
         phone = data.get('phone', '').strip()
         vehicle_number = data.get('vehicle', '').strip()
@@ -354,7 +305,7 @@ def save_customer(request):
 @require_POST
 def save_bill(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         data = json.loads(request.body)
         bill_id = data.get('bill_id')
         customer_id = data.get('customer_id')
@@ -375,29 +326,16 @@ def save_bill(request):
         if bill_id:
             bill = Bill.objects.get(id=bill_id, client_garage=client_garage)
         else:
-            # Generate bill number (e.g., B01, B02) to match generate_bill format
-            last_bill = Bill.objects.filter(client_garage=client_garage).order_by('-id').first()
-            bill_no = f"B{str(last_bill.id + 1 if last_bill else 1).zfill(2)}"
             bill = Bill(
                 client_garage=client_garage,
-                bill_no=bill_no,
+                bill_no=next_number(BILL, client_garage, request.user.client_fiscal_year_id),
                 customer=customer,
                 vehicle=vehicle,
                 service_order=service_order
             )
 
         # Fetch service charges from ServiceOrderItem if service_order exists
-        if service_order:
-            service_order_items = ServiceOrderItem.objects.filter(service_order=service_order)
-            for service_item in service_order_items:
-                if not any(item.get('id') == f"service-{service_item.service_type.id}" for item in items):
-                    items.append({
-                        'id': f"service-{service_item.service_type.id}",
-                        'name': service_item.service_type.name,
-                        'price': float(service_item.price),
-                        'quantity': 1,
-                        'isService': True
-                    })
+        items = merge_service_order_items(service_order, items)
 
         bill.total = total
         bill.discount_type = discount['type']
@@ -406,47 +344,7 @@ def save_bill(request):
         bill.credit_amount = credit
         bill.payment_mode = payment_mode
         bill.status = status
-        bill.save()
-
-        bill.bill_items.all().delete()
-        for item in items:
-            part = None
-            service_type = None
-            if item.get('isService', False):
-                service_id = item['id'].replace('service-', '') if item.get('id') else None
-                if service_id:
-                    service_type = ServiceType.objects.filter(id=service_id, client_garage=client_garage).first()
-                if not service_type:
-                    service_type = ServiceType.objects.create(
-                        client_garage=client_garage,
-                        name=item['name'],
-                        category='Temporary',
-                        base_price=item['price']
-                    )
-            else:
-                part = Part.objects.filter(id=item['id'], client_garage=client_garage).first() if item.get('id') else None
-                if not part:
-                    continue
-            BillItem.objects.create(
-                bill=bill,
-                item=part,
-                service_type=service_type,
-                name=item['name'],
-                price=item['price'],
-                quantity=item['quantity']
-            )
-
-        bill.items = [
-            {
-                'id': f"service-{bi.service_type.id}" if bi.service_type else bi.item.id if bi.item else f"temp-{uuid.uuid4().hex[:8]}",
-                'name': bi.name,
-                'price': float(bi.price),
-                'quantity': bi.quantity,
-                'isService': bi.service_type is not None
-            }
-            for bi in bill.bill_items.all()
-        ]
-        bill.save()
+        commit_bill(bill, client_garage, items)
 
         return JsonResponse({'status': 'success', 'bill_id': bill.id})
     except Exception as e:
@@ -458,7 +356,8 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 from django.utils import timezone
-from garage.models import ClientGarage, Customer, Vehicle, ServiceOrder, ServiceOrderItem, ServiceType, Part, Bill, BillItem, TaxSetting
+from django.db import transaction
+from garage.models import ClientGarage, Customer, Vehicle, ServiceOrder, ServiceType, Part, Bill, TaxSetting
 import json
 import logging
 import uuid
@@ -469,7 +368,7 @@ logger = logging.getLogger(__name__)
 @require_POST
 def generate_bill(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         data = json.loads(request.body)
         
         # Extract and validate input data
@@ -494,36 +393,23 @@ def generate_bill(request):
         vehicle = Vehicle.objects.filter(id=vehicle_id, client_garage=client_garage).first() if vehicle_id else None
         service_order = ServiceOrder.objects.filter(order_no=order_no, client_garage=client_garage).first() if order_no else None
 
-        # Generate bill number (e.g., B01, B02)
-        last_bill = Bill.objects.filter(client_garage=client_garage).order_by('-id').first()
-        bill_no = f"B{str(last_bill.id + 1 if last_bill else 1).zfill(2)}"  # e.g., B01, B02
-
-        # Create or update bill
+        # Create or update bill; new bills take the next number from the
+        # garage's sequence before the transaction opens
         bill = Bill.objects.get(id=bill_id, client_garage=client_garage) if bill_id else Bill(
             client_garage=client_garage,
-            bill_no=bill_no,
+            bill_no=next_number(BILL, client_garage, request.user.client_fiscal_year_id),
             customer=customer,
             vehicle=vehicle,
             service_order=service_order
         )
 
         # Fetch service charges from ServiceOrderItem if service_order exists
-        if service_order:
-            service_order_items = ServiceOrderItem.objects.filter(service_order=service_order)
-            for service_item in service_order_items:
-                if not any(item.get('id') == f"service-{service_item.service_type.id}" for item in items):
-                    items.append({
-                        'id': f"service-{service_item.service_type.id}",
-                        'name': service_item.service_type.name,
-                        'price': float(service_item.price),
-                        'quantity': 1,
-                        'isService': True
-                    })
+        items = merge_service_order_items(service_order, items)
 
         # Calculate subtotal, discount, and tax
         subtotal = sum(float(item['price']) * int(item['quantity']) for item in items)
         discount_amount = (subtotal * float(discount['value']) / 100) if discount['type'] == 'percentage' else float(discount['value'])
-        tax_setting = TaxSetting.objects.filter(client_garage=client_garage).first()
+        tax_setting = get_request_tax_setting(request)
         tax_rate = float(tax_setting.tax_rate) if tax_setting else 13.0
         tax = (subtotal - discount_amount) * (tax_rate / 100)
 
@@ -541,68 +427,17 @@ def generate_bill(request):
         bill.credit_amount = float(credit)
         bill.payment_mode = payment_mode
         bill.status = status
-        bill.save()
-
-        # Update ServiceOrder status and clear mechanics if completed
-        if service_order and status == 'Completed':
-            service_order.status = 'completed'
-            service_order.updated_at = timezone.now()
-            service_order.mechanics.clear()  # Release mechanics
-            service_order.save()
-
-        # Clear existing bill items
-        bill.bill_items.all().delete()
-
-        # Save bill items
-        for item in items:
-            if not item.get('name') or not isinstance(item.get('price'), (int, float)) or not isinstance(item.get('quantity'), int):
-                logger.warning(f"Skipping invalid item: {item}")
-                continue
-            part = None
-            service_type = None
-            if item.get('isService', False):
-                service_id = item['id'].replace('service-', '') if item.get('id') else None
-                if service_id:
-                    service_type = ServiceType.objects.filter(id=service_id, client_garage=client_garage).first()
-                if not service_type:
-                    service_type = ServiceType.objects.create(
-                        client_garage=client_garage,
-                        name=item['name'],
-                        category='Temporary',
-                        base_price=float(item['price'])
-                    )
-            else:
-                part = Part.objects.filter(id=item['id'], client_garage=client_garage).first() if item.get('id') else None
-                if not part:
-                    logger.warning(f"Part not found for item ID {item.get('id')}")
-                    continue
-                # Update part stock
-                part.in_stock -= item['quantity']
-                if part.in_stock < 0:
-                    logger.error(f"Insufficient stock for part {part.name} (ID: {part.id})")
-                    return JsonResponse({'status': 'error', 'message': f'Insufficient stock for part {part.name}'}, status=400)
-                part.save()
-            BillItem.objects.create(
-                bill=bill,
-                item=part,
-                service_type=service_type,
-                name=item['name'],
-                price=float(item['price']),
-                quantity=int(item['quantity'])
-            )
 
-        # Update JSONField for compatibility
-        bill.items = [
-            {
-                'id': f"service-{bi.service_type.id}" if bi.service_type else bi.item.id if bi.item else f"temp-{uuid.uuid4().hex[:8]}",
-                'name': bi.name,
-                'price': float(bi.price),
-                'quantity': bi.quantity,
-                'isService': bi.service_type is not None
-            }
-            for bi in bill.bill_items.all()
-        ]
-        bill.save()
+        # Bill, lines, stock and order status commit together or not at all
+        with transaction.atomic():
+            commit_bill(bill, client_garage, items, decrement_stock=True, skip_invalid=True)
+
+            # Update ServiceOrder status and clear mechanics if completed
+            if service_order and status == 'Completed':
+                service_order.status = 'completed'
+                service_order.updated_at = timezone.now()
+                service_order.mechanics.clear()  # Release mechanics
+                service_order.save()
 
         logger.info(f"Generated bill {bill.bill_no} for user {request.user.username}")
         return JsonResponse({
@@ -629,6 +464,8 @@ def generate_bill(request):
     except ClientGarage.DoesNotExist:
         logger.error(f"No ClientGarage found for user {request.user.username}")
         return JsonResponse({'status': 'error', 'message': 'Client garage not found'}, status=404)
+    except InsufficientStockError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
     except json.JSONDecodeError:
         logger.error(f"Invalid JSON in generate_bill request for user {request.user.username}")
         return JsonResponse({'status': 'error', 'message': 'Invalid JSON data'}, status=400)
@@ -640,50 +477,8 @@ def generate_bill(request):
 def get_bill(request):
     try:
         bill_id = request.GET.get('bill_id')
-        bill = Bill.objects.get(id=bill_id, client_garage__user=request.user)
-        bill_items = [
-            {
-                'id': f"service-{bi.service_type.id}" if bi.service_type else bi.item.id if bi.item else f"temp-{uuid.uuid4().hex[:8]}",
-                'name': bi.name,
-                'price': float(bi.price),
-                'quantity': bi.quantity,
-                'isService': bi.service_type is not None,
-                'image': 'fa-tools' if bi.service_type else 'fa-cogs'
-            }
-            for bi in bill.bill_items.all()
-        ]
-        # Add ServiceOrderItems if service_order exists
-        if bill.service_order:
-            service_order_items = ServiceOrderItem.objects.filter(service_order=bill.service_order)
-            for service_item in service_order_items:
-                if not any(item['id'] == f"service-{service_item.service_type.id}" for item in bill_items):
-                    bill_items.append({
-                        'id': f"service-{service_item.service_type.id}",
-                        'name': service_item.service_type.name,
-                        'price': float(service_item.price),
-                        'quantity': 1,
-                        'isService': True,
-                        'image': 'fa-tools'
-                    })
-
-        return JsonResponse({
-            'id': bill.id,
-            'bill_no': bill.bill_no,
-            'order_no': bill.service_order.order_no if bill.service_order else None,
-            'customer_id': bill.customer.id if bill.customer else None,
-            'customer_name': bill.customer.name if bill.customer else 'Anonymous',
-            'customer_phone': bill.customer.phone if bill.customer else '',
-            'vehicle_id': bill.vehicle.id if bill.vehicle else None,
-            'vehicle_number': bill.vehicle.vehicle_number if bill.vehicle else '',
-            'items': bill_items,
-            'total': float(bill.total),
-            'discount_type': bill.discount_type,
-            'discount_value': float(bill.discount_value),
-            'tax': float(bill.tax),
-            'credit_amount': float(bill.credit_amount),
-            'payment_mode': bill.payment_mode,
-            'date': bill.created_at.strftime('%Y-%m-%d')
-        })
+        bill = with_listing_relations(Bill.objects.filter(client_garage__user=request.user)).get(id=bill_id)
+        return JsonResponse(bill_detail(bill))
     except Bill.DoesNotExist:
         logger.error(f"Bill {bill_id} not found for user {request.user.username}")
         return JsonResponse({'status': 'error', 'message': 'Bill not found'}, status=404)
@@ -697,18 +492,11 @@ def delete_bill(request):
     try:
         data = json.loads(request.body)
         bill_id = data.get('bill_id')
-        client_garage = ClientGarage.objects.get(user=request.user)
+        client_garage = get_request_garage(request)
         bill = get_object_or_404(Bill, id=bill_id, client_garage=client_garage)
         
-        # Restore stock for parts only
-        for bill_item in bill.bill_items.all():
-            if bill_item.item:  # Only restore stock for parts
-                part = bill_item.item
-                part.in_stock += bill_item.quantity
-                part.updated_at = timezone.now()
-                part.save()
-        
-        bill.delete()
+        discard_receipts(bill)
+        delete_bill_and_restock(bill)
         logger.info(f"Deleted bill {bill.bill_no} for user {request.user.username}")
         return JsonResponse({'status': 'success', 'message': 'Bill deleted successfully'})
     except ClientGarage.DoesNotExist:
@@ -724,144 +512,9 @@ def generate_bill_pdf(request):
         if not bill_id or not bill_id.isdigit():
             return JsonResponse({'status': 'error', 'message': 'Invalid bill ID'}, status=400)
         
-        client_garage = ClientGarage.objects.get(user=request.user)
-        bill = get_object_or_404(Bill, id=bill_id, client_garage=client_garage)
-        
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
-        elements = []
-        
-        # --- Define custom styles for a clean, attractive look ---
-        styles = getSampleStyleSheet()
-        
-        # Custom Colors
-        header_bg_color = colors.HexColor('#F0F0F0')
-        table_header_bg = colors.HexColor('#212529')
-        table_header_text = colors.white
-        
-        # FIX: Ensure all custom styles are defined here before use
-        header_style = ParagraphStyle(name='HeaderStyle', fontSize=18, fontName='Helvetica-Bold', alignment=1, spaceAfter=6, textColor=colors.HexColor('#333333'))
-        subheader_style = ParagraphStyle(name='SubheaderStyle', fontSize=10, fontName='Helvetica', alignment=1, spaceAfter=4, textColor=colors.HexColor('#666666'))
-        details_label_style = ParagraphStyle(name='DetailsLabelStyle', fontSize=9, fontName='Helvetica-Bold', leading=11)
-        details_value_style = ParagraphStyle(name='DetailsValueStyle', fontSize=9, fontName='Helvetica', leading=11)
-        table_header_style = ParagraphStyle(name='TableHeaderStyle', fontSize=9, fontName='Helvetica-Bold', leading=11, textColor=table_header_text, alignment=1)
-        footer_style = ParagraphStyle(name='FooterStyle', fontSize=8, fontName='Helvetica', alignment=1, spaceBefore=12, textColor=colors.HexColor('#666666'))
-        
-        # Use a consistent style for normal text
-        normal_style = ParagraphStyle(name='Normal', fontSize=9, leading=11, fontName='Helvetica')
-
-        # --- Document Layout ---
-
-        # Header: Garage details with a clean, centered look
-        elements.append(Paragraph(client_garage.name, header_style))
-        elements.append(Paragraph(client_garage.address or 'Kathmandu, Nepal', subheader_style))
-        if client_garage.contact:
-            elements.append(Paragraph(f"Contact: {client_garage.contact}", subheader_style))
-        if client_garage.email:
-            elements.append(Paragraph(f"Email: {client_garage.email}", subheader_style))
-        elements.append(Spacer(1, 0.2 * inch))
-
-        # Bill and Customer Details (two columns for better organization)
-        details_data = [
-            [
-                Paragraph(f"<b>Bill No:</b> {bill.bill_no}", normal_style), 
-                Paragraph(f"<b>Date:</b> {bill.created_at.strftime('%Y-%m-%d')}", normal_style)
-            ],
-            [
-                Paragraph(f"<b>Customer:</b> {bill.customer.name if bill.customer else 'Anonymous'}", normal_style), 
-                Paragraph(f"<b>Phone:</b> {bill.customer.phone if bill.customer and bill.customer.phone else ''}", normal_style)
-            ],
-            [
-                Paragraph(f"<b>Vehicle:</b> {bill.vehicle.vehicle_number if bill.vehicle and bill.vehicle.vehicle_number else ''}", normal_style),
-                Paragraph(f"<b>Order No:</b> {bill.service_order.order_no if bill.service_order else ''}", normal_style)
-            ]
-        ]
-        
-        details_table = Table(details_data, colWidths=[3.25*inch, 3.25*inch])
-        details_table.setStyle(TableStyle([
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ('BACKGROUND', (0, 0), (-1, -1), header_bg_color),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC'))
-        ]))
-        elements.append(details_table)
-        elements.append(Spacer(1, 0.2 * inch))
-
-        # Items Table (with enhanced styling)
-        data = [
-            [
-                Paragraph("<b>Item Description</b>", table_header_style), 
-                Paragraph("<b>Qty</b>", table_header_style), 
-                Paragraph("<b>Price</b>", table_header_style), 
-                Paragraph("<b>Total</b>", table_header_style)
-            ]
-        ]
-        
-        for bi in bill.bill_items.all():
-            data.append([
-                Paragraph(bi.name, normal_style),
-                Paragraph(str(bi.quantity), normal_style),
-                Paragraph(f"NPR {bi.price:.2f}", normal_style),
-                Paragraph(f"NPR {(bi.price * bi.quantity):.2f}", normal_style)
-            ])
-            
-        items_table = Table(data, colWidths=[3.5*inch, 0.8*inch, 1.2*inch, 1.2*inch])
-        items_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), table_header_bg),
-            ('TEXTCOLOR', (0, 0), (-1, 0), table_header_text),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ]))
-        elements.append(items_table)
-        elements.append(Spacer(1, 0.2 * inch))
-
-        # Summary Section (cleaner, two-column layout)
-        subtotal = sum(bi.price * bi.quantity for bi in bill.bill_items.all())
-        discount_amount = bill.discount_value if bill.discount_type == 'amount' else (subtotal * bill.discount_value / 100)
-        
-        summary_data = [
-            [Paragraph("<b>Subtotal:</b>", details_label_style), Paragraph(f"NPR {subtotal:.2f}", details_value_style)],
-            [Paragraph(f"<b>Discount ({'amount' if bill.discount_type == 'amount' else str(bill.discount_value) + '%'}):</b>", details_label_style), Paragraph(f"NPR {discount_amount:.2f}", details_value_style)],
-            [Paragraph("<b>VAT (13%):</b>", details_label_style), Paragraph(f"NPR {bill.tax:.2f}", details_value_style)],
-            [Paragraph("<b>Credit:</b>", details_label_style), Paragraph(f"NPR {bill.credit_amount:.2f}", details_value_style) if bill.credit_amount > 0 else ''],
-            [Paragraph("<b>Total:</b>", ParagraphStyle(name='TotalStyle', fontSize=11, fontName='Helvetica-Bold', leading=14, textColor=colors.HexColor('#000000'))), Paragraph(f"NPR {bill.total:.2f}", ParagraphStyle(name='TotalStyle', fontSize=11, fontName='Helvetica-Bold', leading=14, textColor=colors.HexColor('#000000')))],
-            [Paragraph("<b>Payment Mode:</b>", details_label_style), Paragraph(bill.payment_mode.upper(), details_value_style)]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[3.25*inch, 3.25*inch])
-        summary_table.setStyle(TableStyle([
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ('LINEBELOW', (0, -2), (-1, -2), 1, colors.black),
-            ('LEFTPADDING', (0, 0), (-1, -1), 0),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ]))
-        elements.append(summary_table)
-
-        # Footer
-        elements.append(Spacer(1, 0.5 * inch))
-        elements.append(Paragraph("Thank you for your business!", footer_style))
-        elements.append(Paragraph("This is a computer-generated invoice and does not require a signature.", footer_style))
-        
-        doc.build(elements)
-        
-        pdf = buffer.getvalue()
-        buffer.close()
+        client_garage = get_request_garage(request)
+        bill = get_object_or_404(receipt_bill_queryset(), id=bill_id, client_garage=client_garage)
+        pdf = get_receipt_pdf(bill, client_garage)
         
         response = HttpResponse(content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="bill_{bill.bill_no}.pdf"'
@@ -878,14 +531,13 @@ def generate_bill_pdf(request):
         logger.error(f"Error in generate_bill_pdf for user {request.user.username}: {str(e)}")
         return JsonResponse({'status': 'error', 'message': f'Failed to generate PDF: {str(e)}'}, status=500)
     
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
+from django.db.models import Sum
 
 @login_required
 def get_tax_settings(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
-        tax_setting = TaxSetting.objects.filter(client_garage=client_garage).first()
+        client_garage = get_request_garage(request)
+        tax_setting = get_request_tax_setting(request)
         if not tax_setting:
             tax_setting = TaxSetting.objects.create(
                 client_garage=client_garage,
@@ -903,14 +555,13 @@ def get_tax_settings(request):
         logger.error(f"Error getting tax settings for user {request.user.username}: {str(e)}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
+from django.db.models import Sum
 
 @login_required
 def get_tax_settings(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
-        tax_setting = TaxSetting.objects.filter(client_garage=client_garage).first()
+        client_garage = get_request_garage(request)
+        tax_setting = get_request_tax_setting(request)
         if not tax_setting:
             tax_setting = TaxSetting.objects.create(
                 client_garage=client_garage,
@@ -929,8 +580,7 @@ def get_tax_settings(request):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
+from django.db.models import Sum
 from django.http import JsonResponse
 import logging
 
@@ -939,16 +589,13 @@ logger = logging.getLogger(__name__)
 @login_required
 def get_daily_summary(request):
     try:
-        client_garage = ClientGarage.objects.get(user=request.user)
-        summary = Bill.objects.filter(
-            client_garage=client_garage,
-            status__in=['Completed', 'Credit']
-        ).annotate(
-            date=TruncDate('created_at')
+        client_garage = get_request_garage(request)
+        summary = DailySalesRollup.objects.filter(
+            client_garage=client_garage
         ).values('date').annotate(
-            total_bills=Count('id'),
-            total_amount=Sum('total')  # ✅ Fixed quote
-        ).order_by('-date')[:5]  # Last 5 days
+            total_bills=Sum('bill_count'),
+            total_amount=Sum('total')
+        ).filter(total_bills__gt=0).order_by('-date')[:5]  # Last 5 days
 
         return JsonResponse({
             'summary': [
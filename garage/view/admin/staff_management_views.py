@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Count, Avg, Q, Sum
+from django.http import JsonResponse
+from django.db.models import Sum
 from django.core.exceptions import ValidationError
 from django.contrib import messages
 from garage.models import User, ClientGarage, FinancialYear, ClientFiscalYear, ServiceOrder, StaffPayroll, StaffAttendance
@@ -10,10 +10,13 @@ import os
 from datetime import datetime, date, timedelta
 import json
 from decimal import Decimal
-import csv
 from io import StringIO
 import pandas as pd
 from django.utils import timezone
+from garage.services.exports import FORMATS as EXPORT_FORMATS, ExportSpec, export_response
+from garage.services.jobs import enqueue, queued_response, wants_background
+from garage.services.payroll import STATEMENT_HEADER, payroll_statement, statement_filename, statement_period
+from garage.services.staff_overview import staff_overview, staff_stats
 
 @login_required
 def staff_management(request):
@@ -40,60 +43,28 @@ def get_staff_list(request):
     if not client_garage:
         return JsonResponse({'error': 'No client garage associated'}, status=400)
 
-    search_term = request.GET.get('search', '')
-    staff = User.objects.filter(
-        client_garage=client_garage,
-        role__in=['staff', 'manager', 'cashier', 'mechanic']
-    ).annotate(
-        completed_orders=Count('service_orders', filter=Q(service_orders__status='completed')),
-        in_progress_orders=Count('service_orders', filter=Q(service_orders__status='in-progress'))
-    )
-
-    if search_term:
-        staff = staff.filter(
-            Q(username__icontains=search_term) |
-            Q(email__icontains=search_term) |
-            Q(role__icontains=search_term) |
-            Q(specialization__icontains=search_term)
-        )
-
-    staff_data = []
-    today = date.today()
-    for user in staff:
-        completed_today = user.service_orders.filter(
-            status='completed',
-            created_date=today
-        ).count()
-        # Get today's attendance status
-        attendance = StaffAttendance.objects.filter(user=user, date=today).first()
-        staff_data.append({
-            'id': user.id,
-            'name': user.username,
-            'email': user.email,
-            'phone': user.phone,
-            'role': user.role,
-            'experience': user.experience_level,
-            'specialization': user.specialization,
-            'status': user.current_status,
-            'current_orders': [so.order_no for so in user.service_orders.filter(status='in-progress')],
-            'completed_today': completed_today,
-            'completed_total': user.completed_orders,
-            'in_progress': user.in_progress_orders,
-            'rating': float(user.average_rating or 0.0),
-            'join_date': user.date_joined.strftime('%Y-%m-%d'),
-            'base_salary': float(user.base_salary or 0.0),
-            'previous_dues': float(user.previous_dues or 0.0),
-            'profile_image': user.profile_image.url if user.profile_image else None,
-            'today_attendance': attendance.status if attendance else 'absent'
-        })
-
-    stats = {
-        'active_staff': staff.filter(current_status='active').count(),
-        'in_progress': sum(s['in_progress'] for s in staff_data),
-        'completed_today': sum(s['completed_today'] for s in staff_data),
-        'avg_rating': float(staff.aggregate(avg_rating=Avg('average_rating'))['avg_rating'] or 0.0),
-        'low_performance': [s['name'] for s in staff_data if s['rating'] < 4.3 or (s['completed_total'] + s['in_progress'] > 0 and (s['completed_total'] / (s['completed_total'] + s['in_progress'])) < 0.5)],
-    }
+    users = list(staff_overview(client_garage, date.today(), request.GET.get('search', '')))
+    staff_data = [{
+        'id': user.id,
+        'name': user.username,
+        'email': user.email,
+        'phone': user.phone,
+        'role': user.role,
+        'experience': user.experience_level,
+        'specialization': user.specialization,
+        'status': user.current_status,
+        'current_orders': [so.order_no for so in user.current_in_progress],
+        'completed_today': user.completed_today,
+        'completed_total': user.completed_orders,
+        'in_progress': user.in_progress_orders,
+        'rating': float(user.average_rating or 0.0),
+        'join_date': user.date_joined.strftime('%Y-%m-%d'),
+        'base_salary': float(user.base_salary or 0.0),
+        'previous_dues': float(user.previous_dues or 0.0),
+        'profile_image': user.profile_image.url if user.profile_image else None,
+        'today_attendance': user.today_attendance or 'absent'
+    } for user in users]
+    stats = staff_stats(users)
 
     return JsonResponse({'staff': staff_data, 'stats': stats}, status=200)
 
@@ -303,51 +274,24 @@ def generate_payroll_statement(request):
     if request.method == 'POST':
         try:
             user_ids = json.loads(request.POST.get('user_ids', '[]'))
-            start_date_str = request.POST.get('start_date')
-            end_date_str = request.POST.get('end_date')
+            start_date, end_date = statement_period(request.POST.get('start_date'), request.POST.get('end_date'))
             client_garage = request.user.client_garage
-
-            # If no dates provided, use current month
-            if not start_date_str or not end_date_str:
-                today = date.today()
-                start_date = date(today.year, today.month, 1)
-                end_date = (start_date + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-            else:
-                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="payroll_statement_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.csv"'
-
-            writer = csv.writer(response)
-            writer.writerow(['Staff Name', 'Email', 'Role', 'Base Salary', 'Incentives', 'Payments', 'Dues', 'Attendance Days'])
-
-            for user_id in user_ids:
-                user = User.objects.get(pk=user_id, client_garage=client_garage)
-                payrolls = StaffPayroll.objects.filter(
-                    user=user,
-                    payment_date__range=[start_date, end_date]
+            requested_format = request.POST.get('format', 'csv')
+            if requested_format not in EXPORT_FORMATS:
+                return JsonResponse({'error': 'format must be csv or xlsx'}, status=400)
+
+            if wants_background(request):
+                job = enqueue(
+                    'payroll_statement', client_garage, request.user,
+                    user_ids=user_ids, start_date=start_date.isoformat(), end_date=end_date.isoformat(), format=requested_format
                 )
-                attendance = StaffAttendance.objects.filter(
-                    user=user,
-                    date__range=[start_date, end_date],
-                    status='present'
-                ).count()
-                total_incentives = payrolls.aggregate(total_incentives=Sum('incentives'))['total_incentives'] or 0
-                total_payments = payrolls.aggregate(total_amount=Sum('amount'))['total_amount'] or 0
-
-                writer.writerow([
-                    user.username,
-                    user.email,
-                    user.role,
-                    float(user.base_salary or 0),
-                    float(total_incentives),
-                    float(total_payments),
-                    float(user.previous_dues or 0),
-                    attendance
-                ])
-
-            return response
+                return queued_response(job)
+
+            rows = payroll_statement(client_garage, user_ids, start_date, end_date)
+            spec = ExportSpec(STATEMENT_HEADER, [[row[column] for column in STATEMENT_HEADER] for row in rows])
+            return export_response(spec, requested_format, statement_filename(start_date, end_date))
+        except User.DoesNotExist as e:
+            return JsonResponse({'error': str(e)}, status=404)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     return JsonResponse({'error': 'Invalid request method'}, status=400)
@@ -359,45 +303,11 @@ def get_payroll_excel_data(request):
     
     try:
         user_ids = json.loads(request.GET.get('user_ids', '[]'))
-        start_date_str = request.GET.get('start_date')
-        end_date_str = request.GET.get('end_date')
-        client_garage = request.user.client_garage
-
-        if not start_date_str or not end_date_str:
-            today = date.today()
-            start_date = date(today.year, today.month, 1)
-            end_date = (start_date + timedelta(days=31)).replace(day=1) - timedelta(days=1)
-        else:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-
-        payroll_data = []
-        for user_id in user_ids:
-            user = User.objects.get(pk=user_id, client_garage=client_garage)
-            payrolls = StaffPayroll.objects.filter(
-                user=user,
-                payment_date__range=[start_date, end_date]
-            )
-            attendance = StaffAttendance.objects.filter(
-                user=user,
-                date__range=[start_date, end_date],
-                status='present'
-            ).count()
-            total_incentives = payrolls.aggregate(total_incentives=Sum('incentives'))['total_incentives'] or 0
-            total_payments = payrolls.aggregate(total_amount=Sum('amount'))['total_amount'] or 0
-
-            payroll_data.append({
-                'Staff Name': user.username,
-                'Email': user.email,
-                'Role': user.role,
-                'Base Salary': float(user.base_salary or 0),
-                'Incentives': float(total_incentives),
-                'Payments': float(total_payments),
-                'Dues': float(user.previous_dues or 0),
-                'Attendance Days': attendance
-            })
-
+        start_date, end_date = statement_period(request.GET.get('start_date'), request.GET.get('end_date'))
+        payroll_data = payroll_statement(request.user.client_garage, user_ids, start_date, end_date)
         return JsonResponse({'payroll_data': payroll_data}, status=200)
+    except User.DoesNotExist as e:
+        return JsonResponse({'error': str(e)}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
@@ -1,8 +1,13 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from django.core.paginator import Paginator
 from garage.models import VehicleCompany, VehicleModel, VehicleType, ClientGarage
+from garage.services.exports import companies_export, export_format as export_format_from, export_response, models_export, vehicle_types_export
+from garage.services.jobs import enqueue, queued_response, save_upload, wants_background
+from garage.services.spreadsheet_import import ImportFileError, import_companies, import_models, import_vehicle_types
+from garage.services.vehicle_masters import reference_bundle
 import openpyxl
 from openpyxl.utils import get_column_letter
 from django.views.decorators.csrf import csrf_exempt
@@ -47,12 +52,24 @@ def get_vehicle_types(request):
 def get_models(request):
     page = int(request.GET.get('page', 1))
     per_page = int(request.GET.get('per_page', 5))
-    models = VehicleModel.objects.filter(client_garage=request.user.client_garage)
+    models = VehicleModel.objects.filter(client_garage=request.user.client_garage).select_related('company', 'vehicle_type')
     paginator = Paginator(models, per_page)
     page_obj = paginator.get_page(page)
     data = [{'id': m.id, 'name': m.name, 'company': m.company.id, 'company_name': m.company.name, 'vehicle_type': m.vehicle_type.id, 'vehicle_type_name': m.vehicle_type.name, 'description': m.description} for m in page_obj]
     return JsonResponse({'items': data, 'total': paginator.count})
 
+@login_required
+def get_vehicle_masters(request):
+    """Companies, types and models in one columnar payload; 304 when the client's ETag is current."""
+    etag, bundle = reference_bundle(request.user.client_garage)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(bundle)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @login_required
 def get_company(request, id):
     company = VehicleCompany.objects.get(id=id, client_garage=request.user.client_garage)
@@ -144,90 +161,51 @@ def delete_models(request, id):
     model.delete()
     return JsonResponse({'status': 'success'})
 
+def _export(request, spec, filename):
+    export_format = export_format_from(request)
+    if export_format is None:
+        return JsonResponse({'status': 'error', 'message': 'format must be csv or xlsx'}, status=400)
+    return export_response(spec, export_format, filename)
+
 @login_required
 def export_companies(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="companies.csv"'
-    writer = openpyxl.Workbook()
-    ws = writer.active
-    ws.append(['Name', 'Description'])
-    for company in VehicleCompany.objects.filter(client_garage=request.user.client_garage):
-        ws.append([company.name, company.description or ''])
-    writer.save(response)
-    return response
+    return _export(request, companies_export(request.user.client_garage), 'companies')
 
 @login_required
 def export_vehicle_types(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="vehicle_types.csv"'
-    writer = openpyxl.Workbook()
-    ws = writer.active
-    ws.append(['Name', 'Description'])
-    for vehicle_type in VehicleType.objects.filter(client_garage=request.user.client_garage):
-        ws.append([vehicle_type.name, vehicle_type.description or ''])
-    writer.save(response)
-    return response
+    return _export(request, vehicle_types_export(request.user.client_garage), 'vehicle_types')
 
 @login_required
 def export_models(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="models.csv"'
-    writer = openpyxl.Workbook()
-    ws = writer.active
-    ws.append(['Name', 'Company', 'Vehicle Type', 'Description'])
-    for model in VehicleModel.objects.filter(client_garage=request.user.client_garage):
-        ws.append([model.name, model.company.name, model.vehicle_type.name, model.description or ''])
-    writer.save(response)
-    return response
+    return _export(request, models_export(request.user.client_garage), 'models')
+
+def _run_import(request, importer, target):
+    file = request.FILES.get('file')
+    if not file:
+        return JsonResponse({'status': 'error', 'message': 'No file uploaded'}, status=400)
+    if wants_background(request):
+        upload = save_upload(file, request.user.client_garage)
+        job = enqueue('import_vehicle_masters', request.user.client_garage, request.user, cleanup=[upload], target=target, upload=upload)
+        return queued_response(job)
+    try:
+        return JsonResponse(importer(request.user.client_garage, file))
+    except ImportFileError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
 @csrf_exempt
 @login_required
 def upload_companies(request):
-    file = request.FILES['file']
-    wb = openpyxl.load_workbook(file)
-    ws = wb.active
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        VehicleCompany.objects.create(
-            client_garage=request.user.client_garage,
-            name=row[0],
-            description=row[1] if len(row) > 1 else ''
-        )
-    return JsonResponse({'status': 'success'})
+    return _run_import(request, import_companies, 'companies')
 
 @csrf_exempt
 @login_required
 def upload_vehicle_types(request):
-    file = request.FILES['file']
-    wb = openpyxl.load_workbook(file)
-    ws = wb.active
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        VehicleType.objects.create(
-            client_garage=request.user.client_garage,
-            name=row[0],
-            description=row[1] if len(row) > 1 else ''
-        )
-    return JsonResponse({'status': 'success'})
+    return _run_import(request, import_vehicle_types, 'vehicle_types')
 
 @csrf_exempt
 @login_required
 def upload_models(request):
-    file = request.FILES['file']
-    wb = openpyxl.load_workbook(file)
-    ws = wb.active
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        try:
-            company = VehicleCompany.objects.get(name=row[1], client_garage=request.user.client_garage)
-            vehicle_type = VehicleType.objects.get(name=row[2], client_garage=request.user.client_garage)
-            VehicleModel.objects.create(
-                client_garage=request.user.client_garage,
-                name=row[0],
-                company=company,
-                vehicle_type=vehicle_type,
-                description=row[3] if len(row) > 3 else ''
-            )
-        except (VehicleCompany.DoesNotExist, VehicleType.DoesNotExist):
-            continue
-    return JsonResponse({'status': 'success'})
+    return _run_import(request, import_models, 'models')
 
 @login_required
 def download_template(request, type):